@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Latency and throughput of lossy collectives. Run under mpirun, e.g.:
+
+    mpirun -n 8 python benchmarks/bench_collectives.py --output results.jsonl
+
+Sweeps operations, payload sizes, rank counts (sub-communicators of the first
+n ranks), numbers of dead ranks, numbers of silent ranks, and timeouts. Dead
+ranks drop out of the pool (the root learns about this in the warm-up
+sync_mask, so they are skipped). Silent ranks join the pool, but stop
+responding after the warm-up sync_mask: every operation waits out the timeout
+for them -- except sync_mask, which marks them as timed out in its first
+iteration.
+
+Each iteration is timed on every participating rank, and the latency of an
+iteration is the slowest rank's time. Results are written as JSON lines (one
+record per configuration) with percentiles in seconds, and throughput in
+bytes per second (payload bytes delivered to/from live ranks over the median
+latency). Use `compare.py` to compare two result files.
+
+Faults (see `lossy_mpi.faults`) are injected with `--faults policy.json`, or
+with the LOSSY_MPI_FAULTS environment variable.
+"""
+
+import json
+import sys
+from argparse import ArgumentParser
+from itertools import product
+from time import perf_counter
+
+from mpi4py import MPI
+
+from lossy_mpi import __version__
+from lossy_mpi.faults import FaultPolicy, FaultyComm
+from lossy_mpi.pool import Pool
+
+OPS = [
+    "gather", "Gather", "bcast", "Bcast", "Barrier", "sync_mask", "allgather",
+    "Alltoallv"
+]
+# peer-to-peer exchanges skip dead ranks on all ranks => they need the mask
+EXCHANGE_OPS = ["allgather", "Alltoallv"]
+PERCENTILES = [0, 50, 90, 99, 100]
+
+
+def percentile(values, q):
+    """
+    q-th percentile of (sorted) `values`, with linear interpolation
+    """
+    pos = (len(values) - 1)*q/100
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo])*(pos - lo)
+
+
+def make_op(op, pool, nbytes):
+    """
+    Closure executing one iteration of `op` with a payload of `nbytes`
+    """
+    root = pool.is_root
+    if op == "gather":
+        data = bytes(nbytes)
+        return lambda: pool.gather(data)
+    if op == "Gather":
+        sendbuf = bytearray(nbytes)
+        recvbuf = [bytearray(nbytes) for i in range(pool.size)]
+        return lambda: pool.Gather(sendbuf, recvbuf)
+    if op == "bcast":
+        data = bytes(nbytes) if root else None
+        return lambda: pool.bcast(data)
+    if op == "Bcast":
+        buf = bytearray(nbytes)
+        return lambda: pool.Bcast(buf)
+    if op == "Barrier":
+        return pool.Barrier
+    if op == "sync_mask":
+        return pool.sync_mask
+    if op == "allgather":
+        data = bytes(nbytes)
+        return lambda: pool.allgather(data)
+    if op == "Alltoallv":
+        sendbuf = [bytearray(nbytes) for i in range(pool.size)]
+        recvbuf = [bytearray(nbytes) for i in range(pool.size)]
+        return lambda: pool.Alltoallv(sendbuf, recvbuf)
+    raise RuntimeError(f"Invalid operation {op=}")
+
+
+def run_config(comm, op, nbytes, n_dead, n_silent, timeout, args):
+    """
+    Run one configuration on `comm` -- returns the per-iteration latencies on
+    the root (None on other ranks)
+    """
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    root = 0
+
+    pool = Pool(
+        FaultyComm.wrap(comm, args.policy), root, timeout, args.n_tries,
+        share_mask=op in EXCHANGE_OPS
+    )
+    pool.ready()
+
+    # the highest ranks are dead, the ones below them are silent
+    dead = rank >= size - n_dead
+    silent = not dead and rank >= size - n_dead - n_silent
+    if dead:
+        pool.drop()
+    pool.sync_mask()
+
+    times = list()
+    if not (dead or silent):
+        execute = make_op(op, pool, nbytes)
+        for i in range(args.warmup):
+            execute()
+        for i in range(args.repeat):
+            start = perf_counter()
+            execute()
+            times.append(perf_counter() - start)
+
+    # latency of an iteration: the slowest (participating) rank
+    all_times = comm.gather(times, root=root)
+    comm.Barrier()
+    if rank != root:
+        return None
+    return [max(t) for t in zip(*[t for t in all_times if len(t) > 0])]
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--ops", nargs="+", default=OPS, choices=OPS)
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=[8, 1024, 1 << 14],
+        help="payload sizes in bytes"
+    )
+    parser.add_argument(
+        "--ranks", nargs="+", type=int, default=None,
+        help="rank counts (default: all ranks)"
+    )
+    parser.add_argument("--dead", nargs="+", type=int, default=[0, 1])
+    parser.add_argument("--silent", nargs="+", type=int, default=[0])
+    parser.add_argument(
+        "--timeouts", nargs="+", type=float, default=[0.1],
+        help="pool timeouts in seconds"
+    )
+    parser.add_argument("--n-tries", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--output", default=None, help="JSON lines file")
+    parser.add_argument(
+        "--faults", default=None,
+        help="fault policy file (default: LOSSY_MPI_FAULTS)"
+    )
+    args = parser.parse_args()
+    if args.faults is not None:
+        args.policy = FaultPolicy.from_file(args.faults)
+    else:
+        args.policy = FaultPolicy.from_env()
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+
+    out = None
+    if rank == 0:
+        out = sys.stdout if args.output is None else open(args.output, "a")
+
+    ranks = args.ranks or [size]
+    for n_ranks, op, nbytes, n_dead, n_silent, timeout in product(
+        ranks, args.ops, args.sizes, args.dead, args.silent, args.timeouts
+    ):
+        # the root is always alive (and responsive)
+        if n_ranks > size or n_dead + n_silent >= n_ranks:
+            continue
+        # payload size is irrelevant for these
+        if op in ("Barrier", "sync_mask") and nbytes != args.sizes[0]:
+            continue
+
+        sub = comm.Split(0 if rank < n_ranks else MPI.UNDEFINED, key=rank)
+        if sub == MPI.COMM_NULL:
+            comm.Barrier()
+            continue
+        latencies = run_config(sub, op, nbytes, n_dead, n_silent, timeout, args)
+        sub.Free()
+        comm.Barrier()
+
+        if rank != 0:
+            continue
+        latencies.sort()
+        n_live = n_ranks - n_dead - n_silent
+        p50 = percentile(latencies, 50)
+        record = {
+            "version": __version__,
+            "mpi": MPI.Get_library_version().strip("\x00").splitlines()[0],
+            "op": op,
+            "nbytes": nbytes,
+            "ranks": n_ranks,
+            "dead": n_dead,
+            "silent": n_silent,
+            "timeout": timeout,
+            "n_tries": args.n_tries,
+            "faults": args.faults,
+            "repeat": args.repeat,
+            "mean": sum(latencies)/len(latencies),
+            "throughput": nbytes*(n_live - 1)/p50 if p50 > 0 else None,
+        }
+        for q in PERCENTILES:
+            record[f"p{q}"] = percentile(latencies, q)
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+
+    if out is not None and out is not sys.stdout:
+        out.close()
+
+
+if __name__ == "__main__":
+    main()
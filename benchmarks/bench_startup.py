@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Startup time of lossy_mpi on every rank. Run under mpirun, e.g.:
+
+    mpirun -n 64 python benchmarks/bench_startup.py --output startup.jsonl
+
+Times (on every rank) importing lossy_mpi, importing mpi4py (which initializes
+MPI), importing the pool, and constructing (and readying) pools. Results are
+written as one JSON line: the percentiles (over ranks, in seconds) of each
+phase, and the slowest rank of each phase.
+"""
+
+from time import perf_counter
+
+# imports are timed before anything else is imported
+start = perf_counter()
+import lossy_mpi  # noqa: E402
+t_import = perf_counter() - start
+
+start = perf_counter()
+from mpi4py import MPI  # noqa: E402
+t_mpi = perf_counter() - start
+
+start = perf_counter()
+from lossy_mpi.pool import Pool  # noqa: E402
+t_pool_import = perf_counter() - start
+
+import json  # noqa: E402
+import sys  # noqa: E402
+from argparse import ArgumentParser  # noqa: E402
+
+PERCENTILES = [0, 50, 90, 99, 100]
+
+
+def percentile(values, q):
+    """
+    q-th percentile of (sorted) `values`, with linear interpolation
+    """
+    pos = (len(values) - 1)*q/100
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo])*(pos - lo)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--pools", type=int, default=10, help="pools to construct per rank"
+    )
+    parser.add_argument("--timeout", type=float, default=0.1)
+    parser.add_argument("--n-tries", type=int, default=10)
+    parser.add_argument("--output", default=None, help="JSON lines file")
+    args = parser.parse_args()
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+
+    # construction time per pool (the first one includes one-time setup)
+    times = list()
+    for i in range(args.pools):
+        start = perf_counter()
+        pool = Pool(comm, 0, args.timeout, args.n_tries)
+        pool.ready()
+        times.append(perf_counter() - start)
+    phases = {
+        "import": t_import,
+        "import_mpi": t_mpi,
+        "import_pool": t_pool_import,
+        "first_init": times[0],
+        "init": sorted(times)[len(times)//2],
+    }
+
+    all_phases = comm.gather(phases, root=0)
+    if rank != 0:
+        return
+
+    record = {
+        "version": lossy_mpi.__version__,
+        "mpi": MPI.Get_library_version().strip("\x00").splitlines()[0],
+        "ranks": size,
+        "pools": args.pools,
+    }
+    for phase in phases:
+        values = sorted(p[phase] for p in all_phases)
+        for q in PERCENTILES:
+            record[f"{phase}_p{q}"] = percentile(values, q)
+        record[f"{phase}_slowest"] = max(
+            range(size), key=lambda i: all_phases[i][phase]
+        )
+
+    out = sys.stdout if args.output is None else open(args.output, "a")
+    out.write(json.dumps(record) + "\n")
+    if out is not sys.stdout:
+        out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compare two result files of `bench_collectives.py`, e.g. of two releases:
+
+    python benchmarks/compare.py baseline.jsonl candidate.jsonl
+
+Prints the ratio (candidate/baseline) of a percentile for every configuration
+present in both files -- ratios above 1 are slowdowns.
+"""
+
+import json
+from argparse import ArgumentParser
+
+KEYS = ["op", "nbytes", "ranks", "dead", "silent", "timeout", "n_tries", "faults"]
+
+
+def load(path):
+    """
+    {configuration: record} of a result file -- later records of the same
+    configuration replace earlier ones
+    """
+    records = dict()
+    with open(path) as f:
+        for line in f:
+            if line.strip() == "":
+                continue
+            record = json.loads(line)
+            records[tuple(record.get(k) for k in KEYS)] = record
+    return records
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--percentile", default="p50")
+    parser.add_argument(
+        "--threshold", type=float, default=0.0,
+        help="only show ratios that differ from 1 by at least this"
+    )
+    args = parser.parse_args()
+
+    baseline = load(args.baseline)
+    candidate = load(args.candidate)
+
+    print("\t".join(KEYS + ["baseline", "candidate", "ratio"]))
+    for key in sorted(set(baseline) & set(candidate), key=str):
+        old = baseline[key][args.percentile]
+        new = candidate[key][args.percentile]
+        ratio = new/old if old > 0 else float("inf")
+        if abs(ratio - 1) < args.threshold:
+            continue
+        print("\t".join(
+            [str(k) for k in key] + [f"{old:.6g}", f"{new:.6g}", f"{ratio:.3f}"]
+        ))
+
+
+if __name__ == "__main__":
+    main()
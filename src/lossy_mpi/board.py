@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from array import array
+
+from mpi4py import MPI
+
+from . import getLogger
+
+LOGGER = getLogger(__name__)
+
+# status value of a rank that has not posted yet
+EMPTY = -1
+
+
+class StatusBoard(object):
+    def __init__(self, comm, root, initial=EMPTY):
+        """
+        RMA window (exposed at `root`) holding the latest status, and a
+        heartbeat counter, of every rank of `comm` -- followed by the root's
+        mask. Ranks post their status with a single (passive target)
+        accumulate, so the root reads the board from local memory, without
+        messages and without waiting for anyone. All updates are element-wise
+        atomic (`MPI.REPLACE`/`MPI.NO_OP` accumulates), so readers never see
+        partially written entries. The root's mask starts out as `initial`.
+        """
+        self._comm = comm
+        self._root = root
+        self._rank = comm.Get_rank()
+        self._size = comm.Get_size()
+        self._heartbeat = 0
+
+        # int64 layout: (status, heartbeat) of every rank, then the root's mask
+        n = 3*self._size
+        nbytes = 8*n if self._rank == root else 0
+        self._win = MPI.Win.Allocate(nbytes, 8, comm=comm)
+
+        # passive target epoch for the lifetime of the window
+        self._win.Lock_all()
+        if self._rank == root:
+            init = array("q", [EMPTY, 0]*self._size + [initial]*self._size)
+            self._win.Accumulate(init, root, op=MPI.REPLACE)
+            self._win.Flush(root)
+        comm.Barrier()
+
+        LOGGER.debug("Initialized status board at root=%s", root, comm=comm)
+
+    @property
+    def comm(self):
+        return self._comm
+
+    @property
+    def root(self):
+        return self._root
+
+    @property
+    def heartbeat(self):
+        """
+        Number of times this rank has posted its status
+        """
+        return self._heartbeat
+
+    def _get(self, offset, count):
+        # the origin buffer is ignored by NO_OP (but has to match the result)
+        buf = array("q", bytes(8*count))
+        self._win.Get_accumulate(
+            buf, buf, self._root, target=(offset, count, MPI.INT64_T),
+            op=MPI.NO_OP
+        )
+        self._win.Flush(self._root)
+        return buf.tolist()
+
+    def _put(self, offset, values):
+        buf = array("q", values)
+        self._win.Accumulate(
+            buf, self._root, target=(offset, len(buf), MPI.INT64_T),
+            op=MPI.REPLACE
+        )
+        self._win.Flush(self._root)
+
+    def post(self, status):
+        """
+        Post this rank's `status` (an int), and advance its heartbeat
+        """
+        self._heartbeat += 1
+        self._put(2*self._rank, [status, self._heartbeat])
+
+    def read(self):
+        """
+        Latest (status, heartbeat) of every rank, as two lists -- the status of
+        ranks that have not posted yet is `EMPTY`. A local read on the root.
+        """
+        entries = self._get(0, 2*self._size)
+        return entries[0::2], entries[1::2]
+
+    def publish(self, mask):
+        """
+        Write the root's `mask` (ints) to the board
+        """
+        assert self._rank == self._root, "only the root publishes its mask"
+        self._put(2*self._size, mask)
+
+    def mask(self):
+        """
+        Latest mask published by the root
+        """
+        return self._get(2*self._size, self._size)
+
+    def free(self):
+        self._win.Unlock_all()
+        self._win.Free()
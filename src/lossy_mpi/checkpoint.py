@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import struct
+from os import fspath, fsync, path, replace
+from pickle import dumps, loads, HIGHEST_PROTOCOL
+from zlib import crc32
+
+from . import getLogger
+
+LOGGER = getLogger(__name__)
+
+# checkpoint files are append-only logs of records: header (magic, version,
+# transaction counter, mask size, results size, crc32 of mask and results),
+# mask (one byte per rank), pickled results. The latest complete record wins.
+MAGIC = b"LMPC"
+HEADER = struct.Struct("<4sHqqqI")
+VERSION = 1
+
+# once a file holds this many records (worth of bytes), it is compacted
+COMPACT_RECORDS = 16
+
+
+def write_checkpoint(file_name, txn_ct, mask, results=None, sync=False):
+    """
+    Append a checkpoint record (the transaction counter `txn_ct`, `mask` as
+    bytes, and any picklable `results`) to `file_name`. If `sync` is set, the
+    record is flushed to disk before returning.
+    """
+    file_name = fspath(file_name)
+    payload = dumps(results, protocol=HIGHEST_PROTOCOL)
+    body = bytes(mask) + payload
+    record = HEADER.pack(
+        MAGIC, VERSION, txn_ct, len(mask), len(payload), crc32(body)
+    ) + body
+
+    size = path.getsize(file_name) if path.exists(file_name) else 0
+    if size > COMPACT_RECORDS*len(record):
+        # rewrite the log with only the latest record (atomically)
+        LOGGER.debug("Compacting checkpoint file %s", file_name)
+        _write(file_name + ".tmp", "wb", record, sync)
+        replace(file_name + ".tmp", file_name)
+        return
+    _write(file_name, "ab", record, sync)
+
+
+def _write(file_name, mode, record, sync):
+    with open(file_name, mode) as f:
+        f.write(record)
+        if sync:
+            f.flush()
+            fsync(f.fileno())
+
+
+def read_checkpoint(file_name):
+    """
+    Latest complete checkpoint in `file_name`: (transaction counter, mask as
+    bytes, results) -- None if there is none. A record that was only partly
+    written (e.g. the job died while checkpointing) is ignored.
+    """
+    if not path.exists(file_name):
+        return None
+    with open(file_name, "rb") as f:
+        data = memoryview(f.read())
+
+    latest = None
+    pos = 0
+    while pos + HEADER.size <= len(data):
+        magic, version, txn_ct, n_mask, n_payload, crc = HEADER.unpack_from(
+            data, pos
+        )
+        start = pos + HEADER.size
+        stop = start + n_mask + n_payload
+        if magic != MAGIC or version != VERSION or stop > len(data):
+            break
+        body = data[start:stop]
+        if crc32(body) != crc:
+            break
+        latest = (txn_ct, bytes(body[:n_mask]), body[n_mask:])
+        pos = stop
+
+    if latest is None:
+        return None
+    if pos < len(data):
+        LOGGER.info("Ignoring incomplete checkpoint record in %s", file_name)
+    txn_ct, mask, payload = latest
+    return txn_ct, mask, loads(payload)
@@ -1,14 +1,25 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+from collections import deque
 from enum import auto, unique
-from time import sleep
+from logging import DEBUG
+from math import ceil
+from threading import local
+from time import monotonic, sleep
 from mpi4py import MPI
 
 from . import AutoEnum, getLogger
+from .metrics import Metrics
+from .store import MessageStore
+from .stragglers import StragglerDetector
+from .trace import Event, Tracer
 
 LOGGER = getLogger(__name__)
 
+# leftover requests (that timed out) are tested once there are this many
+LEFTOVER_LIMIT = 64
+
 
 @unique
 class OperatorMode(AutoEnum):
@@ -28,8 +39,45 @@ class OperatorMode(AutoEnum):
         raise RuntimeError(f"Invalid Mode {op=}")
 
 
+class ChunkHeader(object):
+    def __init__(self, nbytes):
+        """
+        Sent (in LOWER mode) in place of a message that is too large to send
+        in one piece: the (pickled) message follows in chunks
+        """
+        self.nbytes = nbytes
+
+
+class TransactionState(object):
+    def __init__(self, rejected_capacity, tag_window):
+        """
+        State of the transaction in progress (and left over by earlier ones)
+        """
+        # used by deferred requests: requests are a list of (key, val) tuples,
+        # messages are a {key: vaule} dict
+        self.deferred_req = list()
+        self.deferred_msg = dict()
+        # messages that completed a request of a different transaction (i.e.
+        # with a mismatched tag) are kept for their own transaction
+        self.rejected = MessageStore(rejected_capacity, window=tag_window)
+        # requests that timed out, but were not cancelled -- they are tested
+        # from time to time, and cancelled once their tag is about to be
+        # reused (see `reap_leftovers`)
+        self.leftover_req = list()
+        self.leftover_limit = LEFTOVER_LIMIT
+
+
+class ThreadTransactionState(local, TransactionState):
+    """
+    `TransactionState` of each thread
+    """
+
+
 class TimeoutComm(object):
-    def __init__(self, comm, timeout, n_tries):
+    def __init__(self, comm, timeout, n_tries, chunk_nbytes=None,
+                 chunk_threshold=1 << 14, chunks_in_flight=4, metrics=False,
+                 trace=None, stragglers=False,
+                 rejected_capacity=1024, tag_window=None, threads=False):
         # Assumption: com, rank, size, and root do not change
         self._comm = comm
         self._size = comm.Get_size()
@@ -38,13 +86,53 @@ class TimeoutComm(object):
         self._timeout = timeout
         self._n_tries = n_tries
 
-        # used by deferred requests: requests are a list of (key, val) tuples,
-        # messages are a {key: vaule} dict
-        self._deferred_req = list()
-        self._rejected_req = list()
-        self._deferred_msg = dict()
+        # simulated communicators (see `sim`) bring their own virtual clock
+        self._sleep = getattr(comm, "sleep", sleep)
+        self._monotonic = getattr(comm, "monotonic", monotonic)
+
+        # debug logging is checked once: hot paths log only if this is set
+        # (and not at all when running with `python -O`)
+        self._debug = LOGGER.isEnabledFor(DEBUG)
+
+        # large messages are sent in chunks of chunk_nbytes (if set): the
+        # timeout applies to the gap between chunks rather than to the whole
+        # message. The threshold defaults to half of mpi4py's default irecv
+        # buffer size
+        self._chunk_nbytes = chunk_nbytes
+        self._chunk_threshold = chunk_threshold
+        self._chunks_in_flight = chunks_in_flight
+
+        # per-transaction counters (if enabled) -- when disabled, the hot path
+        # only checks for None
+        self._metrics = Metrics(self._size) if metrics else None
+
+        # event trace (`trace.Tracer`) -- defaults to the one requested by the
+        # LOSSY_MPI_TRACE environment variable (if any)
+        if trace is None:
+            trace = Tracer.from_env(self._rank, clock=self._monotonic)
+        self._tracer = trace
+
+        # response times per rank (if enabled): how long each rank kept this
+        # rank waiting. Waits shorter than one polling interval are noise.
+        self._stragglers = None
+        if stragglers:
+            self._stragglers = StragglerDetector(
+                self._size, min_delay=timeout/n_tries
+            )
+
+        # deferred requests, rejected messages, etc. -- if `threads` is set,
+        # every thread has its own (see `TransactionState`)
+        self._state = self._new_state(threads, rejected_capacity, tag_window)
+
+        LOGGER.debug(
+            "Initialized Timeout Communicator with timeout=%s and n_tries=%s",
+            timeout, n_tries
+        )
 
-        LOGGER.debug(f"Initialized Timeout Communicator with {timeout=} and {n_tries=}")
+    def _new_state(self, threads, *args):
+        if threads:
+            return ThreadTransactionState(*args)
+        return TransactionState(*args)
 
     @property
     def comm(self):
@@ -66,80 +154,422 @@ class TimeoutComm(object):
     def n_tries(self):
         return self._n_tries
 
+    @property
+    def metrics(self):
+        """
+        Per-transaction counters (`Metrics`), or None if disabled
+        """
+        return self._metrics
+
+    @property
+    def tracer(self):
+        """
+        Event trace (`trace.Tracer`), or None if disabled
+        """
+        return self._tracer
+
+    @property
+    def straggler_detector(self):
+        """
+        Response times per rank (`StragglerDetector`), or None if disabled
+        """
+        return self._stragglers
+
+    @property
+    def chunk_nbytes(self):
+        return self._chunk_nbytes
+
+    @property
+    def chunk_threshold(self):
+        return self._chunk_threshold
+
+    @property
+    def chunks_in_flight(self):
+        return self._chunks_in_flight
+
+    def use_chunks(self, nbytes):
+        """
+        True if a message of $nbytes needs to be sent in chunks
+        """
+        if self._chunk_nbytes is None:
+            return False
+        return nbytes > self._chunk_threshold
+
+    def _chunks(self, nbytes):
+        """
+        (start, stop) byte ranges of the chunks of a message of $nbytes
+        """
+        return [
+            (i, min(i + self._chunk_nbytes, nbytes))
+            for i in range(0, nbytes, self._chunk_nbytes)
+        ]
+
     @property
     def deferred_req(self):
         """
         List of deferred MPI requeses together with each request's index. After
         collection, responses (messages) are stored in `deferred_msg[index]`.
         """
-        return self._deferred_req
+        return self._state.deferred_req
 
     @property
     def deferred_msg(self):
         """
         Dictionary (key=idx) of deferred MPI messages
         """
-        return self._deferred_msg
+        return self._state.deferred_msg
+
+    @property
+    def rejected(self):
+        """
+        Store (`MessageStore`) of messages with mismatched tags
+        """
+        return self._state.rejected
 
-    def push_req(self, idx, req):
+    def push_req(self, idx, req, tag=-1):
         """
         Add MPI request to `deferred_req`. Messages -- once collected -- will be
-        stored in `deferred_msg[idx]`.
+        stored in `deferred_msg[idx]`. $tag is only used by the trace.
         """
-        LOGGER.debug(f"Appending request to index {idx=}", comm=self)
-        self._deferred_req.append((idx, req))
+        if __debug__ and self._debug:
+            LOGGER.debug(f"Appending request to index {idx=}", comm=self)
+        if self._tracer is not None:
+            self._tracer.record(Event.POST, tag, idx)
+        self._state.deferred_req.append((idx, req))
 
-    def safe_collect_deferred_req(self, failover, tag):
+    def safe_collect_deferred_req(self, failover, tag, timeout=None,
+                                  cancel=False, timeouts=None):
         """
         Collect (with timeout) all deferred requests, and then delete that list.
         Messages are collected with a timeout. If a request times out, $failover
-        is stored in its place.
+        is stored in its place (and the request is cancelled if $cancel is set
+        -- only use this if all deferred requests are receives). $timeouts
+        overrides the timeout of individual requests (see `safe_req_wait`).
+        """
+        if __debug__ and self._debug:
+            LOGGER.debug("Collecting deferred requests", comm=self)
+        state = self._state
+        state.deferred_msg = dict()
+        self.safe_req_wait(
+            state.deferred_msg, failover, state.deferred_req, tag, timeout=timeout,
+            cancel=cancel, timeouts=timeouts
+        )
+        state.deferred_req = list()
+
+    def _n_tries_for(self, timeout):
+        """
+        Number of tries (at the usual polling interval) corresponding to
+        $timeout -- None corresponds to the communicator's timeout
+        """
+        if timeout is None:
+            return self.n_tries
+        return ceil(self.n_tries * timeout / self.timeout)
+
+    def safe_req_waitall(self, data, failover, reqs, tag, timeout=None,
+                         cancel=False):
+        """
+        Collect data from reqs -- if timed out, place $failover in its place.
+        Unlike `safe_req_wait`, all requests share the same timeout (rather
+        than waiting for each request in turn). If $cancel is set, requests
+        that timed out are cancelled (only use this for receives).
+        """
+        if __debug__ and self._debug:
+            LOGGER.debug("Entering safe waitall", comm=self)
+
+        n_tries = self._n_tries_for(timeout)
+        pending = list()
+        for i, req in reqs:
+            # Default to failover
+            data[i] = failover
+            pending.append((i, req))
+
+        try_ct = 0
+        while True:
+            remaining = list()
+            for i, req in pending:
+                status = MPI.Status()
+                flag, message = req.test(status)
+                if not flag:
+                    remaining.append((i, req))
+                elif status.Get_tag() == tag:
+                    data[i] = message
+                    if self._metrics is not None:
+                        self._metrics.response(status.Get_source(), status.Get_count())
+                    if self._tracer is not None:
+                        self._tracer.record(Event.COMPLETE, tag, status.Get_source())
+            pending = remaining
+
+            if len(pending) == 0:
+                return
+            try_ct += 1
+            if try_ct > n_tries:
+                break
+            self._sleep(self.timeout / self.n_tries)
+
+        if __debug__ and self._debug:
+            LOGGER.debug(f"Timed out: {[i for i, _ in pending]}", comm=self)
+        if self._metrics is not None:
+            for _ in pending:
+                self._metrics.timeout()
+        if self._tracer is not None:
+            for i, _ in pending:
+                self._tracer.record(Event.TIMEOUT, tag, i)
+        if cancel:
+            for i, req in pending:
+                req.Cancel()
+                req.Wait()
+        else:
+            for i, req in pending:
+                self._leave(req)
+
+    def _leave(self, req):
+        state = self._state
+        state.leftover_req.append(req)
+        if len(state.leftover_req) > state.leftover_limit:
+            self.reap_leftovers()
+            state.leftover_limit = max(LEFTOVER_LIMIT, 2*len(state.leftover_req))
+
+    def reap_leftovers(self, cancel=False):
+        """
+        Test requests that timed out earlier (without being cancelled): late
+        messages that completed them are discarded. If $cancel is set, the
+        remaining requests are cancelled (e.g. before their tags are reused).
+        """
+        remaining = list()
+        n_late = 0
+        state = self._state
+        for req in state.leftover_req:
+            if req.Test():
+                n_late += 1
+                continue
+            if cancel:
+                req.Cancel()
+                # cancelled receives complete right away, sends might not
+                if req.Test():
+                    continue
+            remaining.append(req)
+        state.leftover_req = remaining
+        if n_late > 0 and __debug__ and self._debug:
+            LOGGER.debug(f"Discarded {n_late} late messages", comm=self)
+
+    def safe_shm_wait(self, shm, slot, buf, tag, timeout=None, source=-1):
+        """
+        Copy the data of transaction $tag in $slot of the shared window $shm
+        into $buf (if $buf is None, only wait for the data to be ready).
+        Returns False if the data did not arrive in time. $source is the rank
+        that writes to $slot (only used by the metrics, trace, and straggler
+        detector).
+        """
+        if __debug__ and self._debug:
+            LOGGER.debug(f"Waiting for shared window {slot=}, {tag=}", comm=self)
+        n_tries = self._n_tries_for(timeout)
+        if self._stragglers is not None:
+            start = self._monotonic()
+        try_ct = 0
+        while True:
+            if buf is None and shm.poll(slot, tag):
+                if self._metrics is not None:
+                    self._metrics.response(source, 0)
+                if self._tracer is not None:
+                    self._tracer.record(Event.COMPLETE, tag, source)
+                if self._stragglers is not None:
+                    self._stragglers.record(source, self._monotonic() - start)
+                return True
+            if buf is not None and shm.get(slot, buf, tag):
+                if self._metrics is not None:
+                    self._metrics.response(source, memoryview(buf).nbytes)
+                if self._tracer is not None:
+                    self._tracer.record(Event.COMPLETE, tag, source)
+                if self._stragglers is not None:
+                    self._stragglers.record(source, self._monotonic() - start)
+                return True
+            try_ct += 1
+            if try_ct > n_tries:
+                if self._metrics is not None:
+                    self._metrics.timeout()
+                if self._tracer is not None:
+                    self._tracer.record(Event.TIMEOUT, tag, source)
+                return False
+            self._sleep(self.timeout / self.n_tries)
+
+    def safe_send_chunked(self, buf, dests, tag):
+        """
+        Send $buf to all $dests in chunks, with at most `chunks_in_flight`
+        chunks in flight per destination. Destinations progress independently
+        of each other: a destination that does not complete a chunk within the
+        timeout (i.e. the timeout applies to the gap between chunks) is
+        dropped. Returns the destinations that received all chunks.
+        """
+        if __debug__ and self._debug:
+            LOGGER.debug(f"Sending chunked message to {len(dests)} ranks", comm=self)
+        mem = memoryview(buf).cast("B")
+        chunks = self._chunks(mem.nbytes)
+        # {dest: [index of next chunk, requests in flight, time of last progress]}
+        state = {i: [0, deque(), self._monotonic()] for i in dests}
+        done = list()
+        while len(state) > 0:
+            progress = False
+            for i in list(state):
+                nxt, reqs, last = state[i]
+                while len(reqs) > 0 and reqs[0].Test():
+                    reqs.popleft()
+                    state[i][2] = last = self._monotonic()
+                    progress = True
+                while nxt < len(chunks) and len(reqs) < self.chunks_in_flight:
+                    start, stop = chunks[nxt]
+                    reqs.append(self.comm.Isend(mem[start:stop], dest=i, tag=tag))
+                    state[i][0] = nxt = nxt + 1
+                    progress = True
+
+                if nxt == len(chunks) and len(reqs) == 0:
+                    done.append(i)
+                    del state[i]
+                elif self._monotonic() - last > self.timeout:
+                    LOGGER.info("Dropping destination i=%s", i, comm=self)
+                    del state[i]
+                    if self._metrics is not None:
+                        self._metrics.timeout()
+                    if self._tracer is not None:
+                        self._tracer.record(Event.TIMEOUT, tag, i)
+
+            if not progress:
+                self._sleep(self.timeout / self.n_tries)
+
+        return done
+
+    def safe_recv_chunked(self, buf, source, tag, timeout=None):
+        """
+        Receive $buf from $source in chunks, with at most `chunks_in_flight`
+        chunks posted at a time. The timeout applies to each chunk ($timeout
+        overrides it for the first chunk). Returns False if a chunk timed out
+        (outstanding receives are cancelled).
         """
-        LOGGER.debug("Collecting deferred requests", comm=self)
-        self._deferred_msg = dict()
-        self.safe_req_wait(self._deferred_msg, failover, self._deferred_req, tag)
-        self._deferred_req = list()
-        # "Rescue" requests that don't have matching tags
-        for r in self._rejected_req:
-            LOGGER.debug(f"Rejected: {r=}", comm=self)
-            self._deferred_req.append(r)
-        self._rejected_req = list()
+        if __debug__ and self._debug:
+            LOGGER.debug(f"Receiving chunked message from {source=}", comm=self)
+        mem = memoryview(buf).cast("B")
+        chunks = deque(self._chunks(mem.nbytes))
+        pending = deque()
+        first = True
+        while len(chunks) > 0 or len(pending) > 0:
+            while len(chunks) > 0 and len(pending) < self.chunks_in_flight:
+                start, stop = chunks.popleft()
+                pending.append(
+                    self.comm.Irecv(mem[start:stop], source=source, tag=tag)
+                )
+            data = dict()
+            self.safe_req_wait(
+                data, False, [(0, pending.popleft())], tag,
+                timeout=timeout if first else None, cancel=True
+            )
+            first = False
+            if data[0] is False:
+                LOGGER.info("Chunk from source=%s timed out", source, comm=self)
+                for req in pending:
+                    req.Cancel()
+                    req.Wait()
+                return False
+
+        return True
 
-    def safe_req_wait(self, data, failover, reqs, tag):
+    def safe_req_wait(self, data, failover, reqs, tag, timeout=None,
+                      cancel=False, timeouts=None):
         """
-        Collect data from reqs -- if timed out, place $failover in its place
+        Collect data from reqs -- if timed out, place $failover in its place.
+        Setting $timeout overrides the communicator's timeout for this call
+        only (the polling interval stays the same). If $cancel is set,
+        requests that timed out are cancelled (only use this for receives --
+        e.g. so that late messages don't overwrite the receive buffer).
+        $timeouts ({idx: timeout}) overrides the timeout of individual
+        requests. Requests are waited for in turn: the straggler detector (if
+        enabled) records how long each response kept this rank waiting.
+        Messages with a mismatched tag are stored (see `rejected`) -- they
+        complete the request with the same key in their own transaction (if it
+        is collected before the store evicts them). Stored messages of earlier
+        transactions are evicted.
         """
-        LOGGER.debug("Entering safe wait", comm=self)
+        if __debug__ and self._debug:
+            LOGGER.debug("Entering safe wait", comm=self)
+
+        n_tries = self._n_tries_for(timeout)
+        rejected = self._state.rejected
+        if len(rejected) > 0:
+            rejected.evict(tag)
 
         for i, req in reqs:
             # Default to failover
             data[i] = failover
+            # a message of this transaction might have arrived out of order
+            if len(rejected) > 0:
+                found, message = rejected.pop(tag, i)
+                if found:
+                    data[i] = message
+                    if cancel:
+                        req.Cancel()
+                        req.Wait()
+                    continue
             # try n_tries many times to get a response, if none is received in
             # $timeout seconds, the failover value is not overwritten
             try_ct = 0
+            max_tries = n_tries
+            if timeouts is not None and i in timeouts:
+                max_tries = self._n_tries_for(timeouts[i])
+            if self._stragglers is not None:
+                start = self._monotonic()
             while True:
                 status = MPI.Status()
                 flag, message = req.test(status)
-                LOGGER.debug(f"Looking for message {i=}: {flag=} {tag=}", comm=self)
+                if __debug__ and self._debug:
+                    LOGGER.debug(f"Looking for message {i=}: {flag=} {tag=}", comm=self)
                 if flag and (status.Get_tag() == tag):
-                    LOGGER.debug(
-                        f"Tag match for: {flag=} {status.tag=}, {tag=}", comm=self
-                    )
+                    if __debug__ and self._debug:
+                        LOGGER.debug(
+                            f"Tag match for: {flag=} {status.tag=}, {tag=}", comm=self
+                        )
                     data[i] = message
+                    if self._metrics is not None:
+                        self._metrics.response(status.Get_source(), status.Get_count())
+                    if self._tracer is not None:
+                        self._tracer.record(Event.COMPLETE, tag, status.Get_source())
+                    if self._stragglers is not None:
+                        self._stragglers.record(
+                            status.Get_source(), self._monotonic() - start
+                        )
                     break
                 elif flag and (status.Get_tag() != tag):
                     # Ignore send req's
                     if status.count == 0:
                         break
-                    LOGGER.debug(
-                        f"Tag mismatch for: {flag=} {status.tag=}, {tag=}", comm=self
+                    if __debug__ and self._debug:
+                        LOGGER.debug(
+                            f"Tag mismatch for: {flag=} {status.tag=}, {tag=}",
+                            comm=self
+                        )
+                    LOGGER.info(
+                        "Rejected message: tag=%s, source=%s",
+                        status.Get_tag(), status.Get_source(), comm=self
                     )
-                    if (i, req) not in self._rejected_req:
-                        LOGGER.info(f"{req=}")
-                        self._rejected_req.append((i, req))
+                    rejected.put(
+                        status.Get_tag(), status.Get_source(), i, message,
+                        current=tag
+                    )
+                    if self._metrics is not None:
+                        self._metrics.rejected()
+                    if self._tracer is not None:
+                        self._tracer.record(Event.REJECTED, tag, i)
+                    break
                 else:
                     try_ct += 1
-                    if try_ct > self.n_tries:
+                    if try_ct > max_tries:
+                        if self._metrics is not None:
+                            self._metrics.timeout()
+                        if self._tracer is not None:
+                            self._tracer.record(Event.TIMEOUT, tag, i)
+                        if cancel:
+                            req.Cancel()
+                            req.Wait()
+                        else:
+                            self._leave(req)
                         break
-                    LOGGER.debug(f"Sleeping for message {i=}", comm=self)
-                    sleep(self.timeout / self.n_tries)
+                    if __debug__ and self._debug:
+                        LOGGER.debug(f"Sleeping for message {i=}", comm=self)
+                    self._sleep(self.timeout / self.n_tries)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import lzma
+import zlib
+from enum import auto, unique
+
+from . import AutoEnum
+
+# lz4 is optional
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+
+@unique
+class Codec(AutoEnum):
+    NONE = auto()
+    ZLIB = auto()
+    LZMA = auto()
+    LZ4 = auto()
+
+    @classmethod
+    def available(cls):
+        """
+        Codecs that can be used in this environment
+        """
+        return [i for i in cls if i != cls.LZ4 or lz4_frame is not None]
+
+
+class CompressionStats(object):
+    def __init__(self, tag, nbytes, wire_nbytes, seconds):
+        """
+        Compression statistics of one transaction (as seen by one rank):
+        `nbytes` of payload were sent (or received) as `wire_nbytes`, and
+        compressing (or decompressing) took `seconds`
+        """
+        self.tag = tag
+        self.nbytes = nbytes
+        self.wire_nbytes = wire_nbytes
+        self.seconds = seconds
+
+    @property
+    def ratio(self):
+        if self.wire_nbytes == 0:
+            return 1.0
+        return self.nbytes / self.wire_nbytes
+
+    def __repr__(self):
+        return (
+            f"CompressionStats(tag={self.tag}, nbytes={self.nbytes}, "
+            f"wire_nbytes={self.wire_nbytes}, seconds={self.seconds})"
+        )
+
+
+class Compressor(object):
+    def __init__(self, codec=Codec.ZLIB, threshold=1 << 10, level=None):
+        """
+        Compresses payloads of at least `threshold` bytes with `codec` (at
+        `level`, if set). Encoded payloads start with a one-byte header naming
+        the codec that was used -- payloads that are too small, or that don't
+        get any smaller, are sent as they are (with codec NONE).
+        """
+        if codec not in Codec.available():
+            raise RuntimeError(f"Codec not available: {codec=}")
+        self._codec = codec
+        self._threshold = threshold
+        self._level = level
+
+    @property
+    def codec(self):
+        return self._codec
+
+    @property
+    def threshold(self):
+        return self._threshold
+
+    def _compress(self, data):
+        if self._codec == Codec.ZLIB:
+            return zlib.compress(data, -1 if self._level is None else self._level)
+        if self._codec == Codec.LZMA:
+            return lzma.compress(data, preset=self._level)
+        if self._codec == Codec.LZ4:
+            return lz4_frame.compress(data, compression_level=self._level or 0)
+        return data
+
+    @staticmethod
+    def _decompressor(codec):
+        """
+        Streaming decompressor for `codec` -- these stop at the end of the
+        compressed data, so trailing bytes (e.g. from an oversized receive
+        buffer) are ignored
+        """
+        if codec == Codec.ZLIB:
+            return zlib.decompressobj()
+        if codec == Codec.LZMA:
+            return lzma.LZMADecompressor()
+        if codec == Codec.LZ4:
+            return lz4_frame.LZ4FrameDecompressor()
+        raise RuntimeError(f"Invalid codec {codec=}")
+
+    def encode(self, buf):
+        """
+        Encode `buf` (any bytes-like object): header byte, followed by the
+        (compressed) data
+        """
+        data = memoryview(buf).cast("B")
+        codec = Codec.NONE
+        if data.nbytes >= self._threshold:
+            compressed = self._compress(data)
+            if len(compressed) < data.nbytes:
+                codec = self._codec
+                data = compressed
+        return bytes([codec.value]) + data
+
+    def _decode(self, buf, nbytes):
+        """
+        Decode `buf` -- returns the (first `nbytes` of the) decoded data, and
+        the number of bytes of `buf` that were used
+        """
+        mem = memoryview(buf).cast("B")
+        codec = Codec(mem[0])
+        if codec == Codec.NONE:
+            if nbytes is None:
+                return bytes(mem[1:]), mem.nbytes
+            return mem[1:1 + nbytes], 1 + nbytes
+        if lz4_frame is None and codec == Codec.LZ4:
+            raise RuntimeError("Received LZ4 payload, but lz4 is not installed")
+        decompressor = self._decompressor(codec)
+        data = decompressor.decompress(mem[1:])
+        return data[:nbytes], mem.nbytes - len(decompressor.unused_data)
+
+    def decode(self, buf):
+        """
+        Decode `buf` (as returned by `encode`)
+        """
+        data, _ = self._decode(buf, None)
+        return data
+
+    def decode_into(self, buf, dst):
+        """
+        Decode `buf` into the bytes-like object `dst` -- `buf` can be longer
+        than the encoded data. Returns the length of the encoded data.
+        """
+        out = memoryview(dst).cast("B")
+        data, used = self._decode(buf, out.nbytes)
+        out[:] = data
+        return used
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+class PerRank(object):
+    def __init__(self, values):
+        """
+        Failover values of every rank: rank `i` gets `values[i]`. (Plain
+        sequences are a single failover value, e.g. the fill value of a row in
+        buffer mode.)
+        """
+        self._values = values
+
+    @property
+    def values(self):
+        return self._values
+
+    def __call__(self, rank):
+        return self._values[rank]
+
+
+def value(failover, rank):
+    """
+    Failover value of `rank` -- callables (e.g. `PerRank`) are factories
+    `(rank) -> value`, so that ranks don't share mutable failover values
+    """
+    if callable(failover):
+        return failover(rank)
+    return failover
+
+
+def fill(recvbuf, ranks, failover):
+    """
+    Assign the failover values of `ranks` to `recvbuf[i]`. Rows of numpy
+    arrays are filled by a single (vectorized) assignment -- unless `failover`
+    is a factory (the numpy values of `PerRank` are indexed at once, too).
+    """
+    if len(ranks) == 0:
+        return
+    if getattr(recvbuf, "ndim", 0) > 0:
+        if isinstance(failover, PerRank) and hasattr(failover.values, "ndim"):
+            recvbuf[ranks] = failover.values[ranks]
+            return
+        if not callable(failover):
+            recvbuf[ranks] = failover
+            return
+    for i in ranks:
+        recvbuf[i] = value(failover, i)
@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+from heapq import heappop, heappush
+from itertools import count
+from os import environ, path
+from pickle import dumps, HIGHEST_PROTOCOL
+from random import Random
+from time import monotonic, sleep
+
+from mpi4py import MPI
+
+from . import getLogger
+
+LOGGER = getLogger(__name__)
+
+
+class FaultPolicy(object):
+    def __init__(self, seed=0, delay=0.0, jitter=0.0, drop=0.0, reorder=0.0,
+                 ranks=None, freeze=None, crash=None):
+        """
+        Faults injected by `FaultyComm` into messages sent by `ranks` (all
+        ranks if None):
+            `delay`, `jitter`: messages are held back for `delay` seconds,
+                               plus up to `jitter` seconds (uniformly)
+            `drop`: probability that a message is lost
+            `reorder`: probability that a message is held back for another
+                       `jitter` (at least `delay`) seconds -- so that later
+                       messages overtake it
+            `freeze`: list of {"rank", "at", "duration"}: the rank stops (in
+                      its next MPI call) for `duration` seconds once `at`
+                      seconds have passed since the communicator was wrapped
+            `crash`: list of {"rank", "at"}: the rank's messages are all lost
+                     after `at` seconds
+        Random decisions are seeded by `seed` and the rank.
+        """
+        self.seed = seed
+        self.delay = delay
+        self.jitter = jitter
+        self.drop = drop
+        self.reorder = reorder
+        self.ranks = None if ranks is None else set(ranks)
+        self.freeze = list() if freeze is None else list(freeze)
+        self.crash = list() if crash is None else list(crash)
+
+    @classmethod
+    def from_dict(cls, policy):
+        return cls(**policy)
+
+    @classmethod
+    def from_file(cls, file_name):
+        with open(file_name) as f:
+            return cls.from_dict(json.load(f))
+
+    @classmethod
+    def from_env(cls, var="LOSSY_MPI_FAULTS"):
+        """
+        Policy from the environment variable `var` -- either the path to a JSON
+        file, or inline JSON. Returns None if `var` is not set.
+        """
+        value = environ.get(var, "").strip()
+        if value == "":
+            return None
+        if path.isfile(value):
+            return cls.from_file(value)
+        return cls.from_dict(json.loads(value))
+
+    def applies_to(self, rank):
+        return self.ranks is None or rank in self.ranks
+
+
+class _FaultState(object):
+    def __init__(self, policy, rank):
+        """
+        Fault state of one rank, shared by all communicators derived from the
+        wrapped communicator
+        """
+        self.policy = policy
+        self.rank = rank
+        self.random = Random(policy.seed*1_000_003 + rank)
+        self.start = monotonic()
+        self.freeze = [f for f in policy.freeze if f["rank"] == rank]
+        self.crash_at = min(
+            (c["at"] for c in policy.crash if c["rank"] == rank), default=None
+        )
+        # delayed sends: heap of (release time, seq, comm, request)
+        self.pending = list()
+        self.seq = count()
+
+    def elapsed(self):
+        return monotonic() - self.start
+
+
+class _Request(object):
+    def __init__(self, state, req=None):
+        """
+        Proxy for an MPI request -- testing it posts delayed sends that are
+        due. Delayed sends don't have a request (`req`) until they are posted.
+        """
+        self._state = state
+        self._req = req
+        self.dropped = False
+        self.cancelled = False
+
+    def _fill_status(self, status):
+        if status is not None:
+            status.Set_source(MPI.ANY_SOURCE)
+            status.Set_tag(MPI.ANY_TAG)
+            status.Set_elements(MPI.BYTE, 0)
+            status.Set_cancelled(self.cancelled)
+
+    def test(self, status=None):
+        _progress(self._state)
+        if self.dropped or self.cancelled:
+            self._fill_status(status)
+            return True, None
+        if self._req is None:
+            return False, None
+        return self._req.test(status)
+
+    def Test(self, status=None):
+        flag, _ = self.test(status)
+        return flag
+
+    def Wait(self, status=None):
+        while True:
+            flag, msg = self.test(status)
+            if flag:
+                return msg
+            sleep(1e-4)
+
+    def wait(self, status=None):
+        return self.Wait(status)
+
+    def Cancel(self):
+        if self._req is None:
+            # not posted yet => never will be
+            self.cancelled = True
+        elif not (self.dropped or self.cancelled):
+            self._req.Cancel()
+
+
+def _progress(state):
+    """
+    Apply freezes that are due, and post delayed sends that are due
+    """
+    if len(state.freeze) > 0:
+        elapsed = state.elapsed()
+        for f in list(state.freeze):
+            if elapsed >= f["at"]:
+                state.freeze.remove(f)
+                LOGGER.info("Freezing rank %s for %ss", state.rank, f["duration"])
+                sleep(f["duration"])
+
+    now = monotonic()
+    while len(state.pending) > 0 and state.pending[0][0] <= now:
+        _, _, send, req = heappop(state.pending)
+        if not req.cancelled:
+            req._req = send()
+
+
+class FaultyComm(object):
+    def __init__(self, comm, policy, state=None):
+        """
+        Proxy of `comm` that injects faults (see `FaultPolicy`) into the
+        messages that this rank sends. Everything that isn't a point-to-point
+        operation is forwarded to `comm` (communicators derived by `Split` and
+        `Split_type` are wrapped as well). Delayed messages are posted by the
+        next call into the proxy (e.g. when testing any request) once they
+        are due.
+        """
+        self._comm = comm
+        self._policy = policy
+        if state is None:
+            state = _FaultState(policy, comm.Get_rank())
+        self._state = state
+        self._active = policy.applies_to(comm.Get_rank())
+
+    @classmethod
+    def wrap(cls, comm, policy=None):
+        """
+        Wrap `comm` if there is a `policy` (which defaults to the one in the
+        LOSSY_MPI_FAULTS environment variable) -- otherwise return `comm`
+        """
+        if policy is None:
+            policy = FaultPolicy.from_env()
+        if policy is None:
+            return comm
+        return cls(comm, policy)
+
+    def __getattr__(self, name):
+        return getattr(self._comm, name)
+
+    @property
+    def comm(self):
+        return self._comm
+
+    def drain(self):
+        """
+        Wait until all delayed messages have been posted
+        """
+        while len(self._state.pending) > 0:
+            _progress(self._state)
+            sleep(1e-3)
+
+    def _derived(self, comm):
+        if comm == MPI.COMM_NULL:
+            return comm
+        return FaultyComm(comm, self._policy, state=self._state)
+
+    def Split(self, *args, **kwargs):
+        return self._derived(self._comm.Split(*args, **kwargs))
+
+    def Split_type(self, *args, **kwargs):
+        return self._derived(self._comm.Split_type(*args, **kwargs))
+
+    def _send(self, send):
+        """
+        Post (`send()`), delay or drop a message
+        """
+        state = self._state
+        _progress(state)
+        req = _Request(state)
+
+        crashed = state.crash_at is not None and state.elapsed() >= state.crash_at
+        if not self._active and not crashed:
+            req._req = send()
+            return req
+
+        policy = self._policy
+        rng = state.random
+        if crashed or (policy.drop > 0 and rng.random() < policy.drop):
+            req.dropped = True
+            return req
+
+        delay = policy.delay
+        if policy.jitter > 0:
+            delay += rng.uniform(0, policy.jitter)
+        if policy.reorder > 0 and rng.random() < policy.reorder:
+            delay += max(policy.delay, rng.uniform(0, policy.jitter))
+        if delay <= 0:
+            req._req = send()
+            return req
+
+        heappush(state.pending, (monotonic() + delay, next(state.seq), send, req))
+        return req
+
+    def isend(self, obj, dest, tag=0):
+        # pickle now, so that later changes to obj don't leak into the message
+        data = dumps(obj, protocol=HIGHEST_PROTOCOL)
+        return self._send(lambda: self._comm.Isend(data, dest=dest, tag=tag))
+
+    def Isend(self, buf, dest, tag=0):
+        data = bytes(memoryview(buf).cast("B"))
+        return self._send(lambda: self._comm.Isend(data, dest=dest, tag=tag))
+
+    def irecv(self, *args, **kwargs):
+        _progress(self._state)
+        return _Request(self._state, self._comm.irecv(*args, **kwargs))
+
+    def Irecv(self, *args, **kwargs):
+        _progress(self._state)
+        return _Request(self._state, self._comm.Irecv(*args, **kwargs))
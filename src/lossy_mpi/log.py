@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+from logging import LoggerAdapter, basicConfig
+from os import environ
+
+# imported (and configured) when the first logger is created -- see
+# `lossy_mpi.getLogger`
+FORMAT = "[%(levelname)8s | %(filename)s:%(lineno)s - %(module)s.%(funcName)s() ] %(message)s"
+basicConfig(format=FORMAT, level=environ.get("LOSSY_MPI_LOG", "INFO").upper())
+
+# Logging on hot paths: pools check the DEBUG level once (when they are
+# constructed), and guard debug messages with `if __debug__ and self._debug` --
+# so they cost a single attribute lookup when DEBUG is disabled, and are
+# compiled out entirely when running with `python -O` ("fast" mode). Elsewhere,
+# messages are formatted lazily (`LOGGER.debug("... %s", arg)`).
+
+
+class MPIStyleAdapter(LoggerAdapter):
+    # def __init__(self, logger, extra=None):
+    #     super().__init__(logger, extra)
+
+    def process(self, msg, kwargs):
+        # only called for enabled levels => the rank is formatted lazily
+        comm = kwargs.pop("comm", None)
+        if comm is not None:
+            msg = f"comm.rank={comm.rank} > {msg}"
+        return msg, kwargs
+
+
+def getLogger(name):
+    return MPIStyleAdapter(logging.getLogger(name), None)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from array import array
+from enum import auto, unique
+from time import perf_counter
+
+from . import AutoEnum
+
+
+@unique
+class Op(AutoEnum):
+    GATHER = auto()
+    BCAST = auto()
+    BARRIER = auto()
+    ALLGATHER = auto()
+    ALLTOALL = auto()
+
+
+# latency histograms have log2 buckets (in microseconds): bucket i counts
+# latencies in [2**(i-1), 2**i) us -- the last bucket also counts anything
+# longer
+N_BUCKETS = 32
+
+
+class Metrics(object):
+    def __init__(self, size, capacity=1024):
+        """
+        Per-transaction counters of a communicator with `size` ranks. All
+        counters live in preallocated arrays: totals per operation type (`Op`),
+        response times per rank, latency histograms per operation type, and a
+        ring buffer with the latest `capacity` transactions.
+        """
+        n_ops = len(Op)
+        self._size = size
+        self._capacity = capacity
+
+        # totals per operation type
+        self._transactions = array("q", [0]*n_ops)
+        self._wall_time = array("d", [0]*n_ops)
+        self._timeouts = array("q", [0]*n_ops)
+        self._rejected = array("q", [0]*n_ops)
+        self._nbytes = array("q", [0]*n_ops)
+        self._histogram = array("q", [0]*(n_ops*N_BUCKETS))
+
+        # response times per (source) rank
+        self._responses = array("q", [0]*size)
+        self._response_time = array("d", [0]*size)
+
+        # ring buffer of the latest transactions
+        self._txn_ct = 0
+        self._txn_tag = array("q", [0]*capacity)
+        self._txn_op = array("b", [0]*capacity)
+        self._txn_wall_time = array("d", [0]*capacity)
+        self._txn_timeouts = array("q", [0]*capacity)
+        self._txn_rejected = array("q", [0]*capacity)
+        self._txn_nbytes = array("q", [0]*capacity)
+
+        # current transaction
+        self._op = 0
+        self._tag = 0
+        self._start = 0.0
+        self._cur_timeouts = 0
+        self._cur_rejected = 0
+        self._cur_nbytes = 0
+
+    def begin(self, op, tag):
+        """
+        Start timing transaction `tag` of type `op`
+        """
+        self._op = op.value
+        self._tag = tag
+        self._cur_timeouts = 0
+        self._cur_rejected = 0
+        self._cur_nbytes = 0
+        self._start = perf_counter()
+
+    def response(self, source, nbytes):
+        """
+        Record that `nbytes` arrived from rank `source`
+        """
+        latency = perf_counter() - self._start
+        self._cur_nbytes += nbytes
+        if 0 <= source < self._size:
+            self._responses[source] += 1
+            self._response_time[source] += latency
+        bucket = min(int(latency*1e6).bit_length(), N_BUCKETS - 1)
+        self._histogram[self._op*N_BUCKETS + bucket] += 1
+
+    def timeout(self):
+        self._cur_timeouts += 1
+
+    def rejected(self):
+        self._cur_rejected += 1
+
+    def end(self):
+        """
+        Finish the current transaction, and add it to the totals
+        """
+        wall_time = perf_counter() - self._start
+        op = self._op
+        self._transactions[op] += 1
+        self._wall_time[op] += wall_time
+        self._timeouts[op] += self._cur_timeouts
+        self._rejected[op] += self._cur_rejected
+        self._nbytes[op] += self._cur_nbytes
+
+        idx = self._txn_ct % self._capacity
+        self._txn_tag[idx] = self._tag
+        self._txn_op[idx] = op
+        self._txn_wall_time[idx] = wall_time
+        self._txn_timeouts[idx] = self._cur_timeouts
+        self._txn_rejected[idx] = self._cur_rejected
+        self._txn_nbytes[idx] = self._cur_nbytes
+        self._txn_ct += 1
+
+    def snapshot(self):
+        """
+        Copy of all counters (as plain python objects): totals and latency
+        histograms per operation type, response times per rank, and the
+        latest transactions (oldest first)
+        """
+        ops = dict()
+        for op in Op:
+            i = op.value
+            ops[op.name.lower()] = {
+                "transactions": self._transactions[i],
+                "wall_time": self._wall_time[i],
+                "timeouts": self._timeouts[i],
+                "rejected": self._rejected[i],
+                "nbytes": self._nbytes[i],
+                "latency_histogram": self._histogram[
+                    i*N_BUCKETS:(i + 1)*N_BUCKETS
+                ].tolist(),
+            }
+
+        n = min(self._txn_ct, self._capacity)
+        first = self._txn_ct - n
+        transactions = list()
+        for j in range(first, self._txn_ct):
+            idx = j % self._capacity
+            transactions.append({
+                "tag": self._txn_tag[idx],
+                "op": Op(self._txn_op[idx]).name.lower(),
+                "wall_time": self._txn_wall_time[idx],
+                "timeouts": self._txn_timeouts[idx],
+                "rejected": self._txn_rejected[idx],
+                "nbytes": self._txn_nbytes[idx],
+            })
+
+        return {
+            "ops": ops,
+            "ranks": {
+                "responses": self._responses.tolist(),
+                "response_time": self._response_time.tolist(),
+            },
+            "transactions": transactions,
+        }
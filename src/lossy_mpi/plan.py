@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from array import array
+
+from mpi4py import MPI
+
+from . import getLogger
+from .failover import fill
+from .metrics import Op
+from .trace import Event
+
+LOGGER = getLogger(__name__)
+
+
+def _struct(header, buf):
+    """
+    Datatype (relative to MPI.BOTTOM) of the `header` followed by `buf` --
+    so that both are sent as one message, without copying
+    """
+    nbytes = memoryview(buf).nbytes
+    return MPI.Datatype.Create_struct(
+        [1, nbytes], [MPI.Get_address(header), MPI.Get_address(buf)],
+        [MPI.INT64_T, MPI.BYTE]
+    ).Commit()
+
+
+class GatherPlan(object):
+    def __init__(self, pool, sendbuf, recvbuf, failover=None):
+        """
+        Repeated UPPER mode gather of `sendbuf` into `recvbuf` (see
+        `Pool.gather_plan`). Persistent requests (and their datatypes) are set
+        up once, using a tag that is reserved for the plan (until it is
+        freed). Every message carries the tag of its transaction in a header,
+        so that late messages of earlier runs are recognized (and their
+        receive is restarted).
+        """
+        assert not pool.is_hierarchical, "plans are not node-aware"
+        self._pool = pool
+        self._sendbuf = sendbuf
+        self._recvbuf = recvbuf
+        self._failover = failover
+        self._tag = pool.tags.reserve()
+        comm = pool.comm
+
+        self._types = list()
+        self._headers = dict()
+        self._reqs = dict()
+        if pool.is_root:
+            for i in range(pool.size):
+                if i == pool.root:
+                    continue
+                header = array("q", [-1])
+                dtype = _struct(header, recvbuf[i])
+                self._headers[i] = header
+                self._types.append(dtype)
+                self._reqs[i] = comm.Recv_init(
+                    [MPI.BOTTOM, 1, dtype], source=i, tag=self._tag
+                )
+        else:
+            header = array("q", [-1])
+            dtype = _struct(header, sendbuf)
+            self._headers[pool.root] = header
+            self._types.append(dtype)
+            self._reqs[pool.root] = comm.Send_init(
+                [MPI.BOTTOM, 1, dtype], dest=pool.root, tag=self._tag
+            )
+        # a send that is still in flight when the next run starts
+        self._send_active = False
+
+        # live ranks (and their requests) -- rebuilt when the mask changes
+        self._mask = None
+        self._live = list()
+        self._live_reqs = list()
+
+        # ranks that timed out in the last run
+        self._missed = list()
+
+        LOGGER.debug("Initialized gather plan with tag=%s", self._tag, comm=pool)
+
+    @property
+    def tag(self):
+        return self._tag
+
+    @property
+    def missed(self):
+        """
+        Ranks that timed out in the latest run (only known to the root)
+        """
+        return self._missed
+
+    def _update_live(self):
+        from .pool import Status
+
+        mask = tuple(self._pool.mask)
+        if mask == self._mask:
+            return
+        self._mask = mask
+        self._live = [i for i in self._reqs if not Status.is_dead(mask[i])]
+        self._live_reqs = [self._reqs[i] for i in self._live]
+
+    def run(self):
+        """
+        Gather (one transaction): start all persistent requests, and test them
+        until the pool's timeout. Rows of ranks that time out are set to the
+        plan's failover value (if it isn't None).
+        """
+        pool = self._pool
+        tag = pool.next_tag()
+        metrics = pool.metrics
+        tracer = pool.tracer
+        if metrics is not None:
+            metrics.begin(Op.GATHER, tag)
+        if tracer is not None:
+            tracer.record(Event.BEGIN, tag, Op.GATHER.value)
+
+        if pool.is_root:
+            self._recv(tag)
+        else:
+            self._send(tag)
+
+        if metrics is not None:
+            metrics.end()
+        if tracer is not None:
+            tracer.record(Event.END, tag, Op.GATHER.value)
+
+    def _send(self, tag):
+        pool = self._pool
+        req = self._reqs[pool.root]
+        if self._send_active and not req.Test():
+            # the header and buffer are still in use
+            LOGGER.info("Previous send is still in flight, skipping", comm=pool)
+            return
+        self._headers[pool.root][0] = tag
+        req.Start()
+        self._send_active = True
+        for _ in range(pool.n_tries + 1):
+            if req.Test():
+                self._send_active = False
+                return
+            pool._sleep(pool.timeout/pool.n_tries)
+
+    def _recv(self, tag):
+        pool = self._pool
+        recvbuf = self._recvbuf
+        recvbuf[pool.root] = self._sendbuf
+        self._update_live()
+        live = self._live
+        reqs = self._live_reqs
+        headers = self._headers
+        metrics = pool.metrics
+
+        MPI.Prequest.Startall(reqs)
+        pending = len(reqs)
+        try_ct = 0
+        while pending > 0:
+            done = MPI.Request.Testsome(reqs)
+            if done is not None:
+                for k in done:
+                    i = live[k]
+                    if headers[i][0] == tag:
+                        pending -= 1
+                        if metrics is not None:
+                            metrics.response(i, memoryview(recvbuf[i]).nbytes)
+                    else:
+                        # late message of an earlier run
+                        reqs[k].Start()
+            if pending == 0:
+                break
+            try_ct += 1
+            if try_ct > pool.n_tries:
+                break
+            pool._sleep(pool.timeout/pool.n_tries)
+
+        self._missed = list()
+        if pending == 0:
+            return
+        for i, req in zip(live, reqs):
+            if headers[i][0] == tag:
+                continue
+            # the late message will be matched by a later run's receive
+            req.Cancel()
+            req.Wait()
+            if headers[i][0] == tag:
+                continue
+            self._missed.append(i)
+            if metrics is not None:
+                metrics.timeout()
+        if self._failover is not None:
+            fill(recvbuf, self._missed, self._failover)
+        LOGGER.info("Timed out: %s", self._missed, comm=pool)
+
+    def free(self):
+        """
+        Free the plan's requests and datatypes (outstanding requests are
+        cancelled)
+        """
+        for req in self._reqs.values():
+            if not req.Test():
+                req.Cancel()
+                req.Wait()
+            req.Free()
+        for dtype in self._types:
+            dtype.Free()
+        self._pool.tags.release(self._tag)
+        self._reqs = dict()
+        self._types = list()
+        self._live = list()
+        self._live_reqs = list()
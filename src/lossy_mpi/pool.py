@@ -1,10 +1,28 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+from array import array
+from collections import deque
+from contextlib import contextmanager, nullcontext
 from enum import auto, unique
+from itertools import takewhile
+from threading import Lock, local
+from mpi4py import MPI
+from pickle import dumps, loads, HIGHEST_PROTOCOL
+from time import perf_counter
 
-from . import AutoEnum, getLogger, Singleton
-from .comms import OperatorMode, TimeoutComm
+from . import AutoEnum, getLogger
+from .board import StatusBoard
+from .checkpoint import read_checkpoint, write_checkpoint
+from .comms import ChunkHeader, OperatorMode, TimeoutComm, TransactionState
+from .compression import CompressionStats
+from .failover import fill, value
+from .metrics import Op
+from .plan import GatherPlan
+from .shm import SharedWindow
+from .tags import TagAllocator
+from .threads import SerializedComm, needs_serialization
+from .trace import Event
 
 LOGGER = getLogger(__name__)
 
@@ -36,24 +54,201 @@ class Status(AutoEnum):
         return False
 
 
+class PoolState(TransactionState):
+    def __init__(self, *args):
+        """
+        `TransactionState` of a pool: the channel (see `Pool.context`) and tag
+        epoch of the latest transaction, and the ranks it missed
+        """
+        super().__init__(*args)
+        self.channel = 0
+        self.epoch = 0
+        # ranks that missed the last barrier (as far as this rank knows), and
+        # ranks whose data the root did not get in the last gather
+        self.barrier_missed = list()
+        self.gather_missed = list()
+
+
+class ThreadPoolState(local, PoolState):
+    """
+    `PoolState` of each thread
+    """
+
+
 class Pool(TimeoutComm):
-    def __init__(self, comm, root, timeout, n_tries):
+    def __init__(self, comm, root, timeout, n_tries, hierarchical=False,
+                 node_comm=None, share_mask=False, shm_nbytes=None,
+                 chunk_nbytes=None, chunk_threshold=1 << 14, chunks_in_flight=4,
+                 compressor=None, metrics=False, trace=None, stragglers=True,
+                 rejected_capacity=1024, tag_window=None, threads=None,
+                 serialize=None, status_board=False):
         # Start everything in an uninitialized state
         self._status = Status.UNINIT
 
+        # transactions use tags in a range of the communicator's tag space
+        # that is not used by other pools (on the same communicator) -- split
+        # into one channel per thread (if `threads` is set)
+        tags = TagAllocator(comm, window=tag_window, channels=threads or 1)
+
+        # thread-safe mode: unless MPI supports MPI_THREAD_MULTIPLE, threads
+        # take turns calling MPI (see `SerializedComm`)
+        if threads is not None:
+            assert not metrics, "metrics are not thread-safe"
+            assert not hierarchical and node_comm is None, \
+                "node-aware pools are not thread-safe"
+            assert shm_nbytes is None, "shared windows are not thread-safe"
+            assert not status_board, "the status board is not thread-safe"
+            if serialize is None:
+                serialize = needs_serialization()
+            if serialize:
+                comm = SerializedComm(comm)
+
         # Assumption: com, rank, size, and root do not change
-        super().__init__(comm, timeout, n_tries)
+        super().__init__(
+            comm, timeout, n_tries, chunk_nbytes=chunk_nbytes,
+            chunk_threshold=chunk_threshold, chunks_in_flight=chunks_in_flight,
+            metrics=metrics, trace=trace, stragglers=stragglers,
+            rejected_capacity=rejected_capacity,
+            tag_window=tags.channel_window, threads=threads is not None
+        )
+        self._tags = tags
+        self._threads = threads
 
         self._root = root
         self._is_root = self.rank == root
 
         # tag messages by transaction count => ensure that messages are read in
-        # the order that they arrive in
+        # the order that they arrive in (transaction IDs are unbounded, their
+        # tags wrap around within the pool's tag window). Channels other than
+        # the first one count their transactions separately.
         self._txn_ct = 0;
+        self._channel_txn = [0]*(threads or 1)
+        # threads allocate tags (of the first channel) atomically, and claim
+        # their channels
+        self._txn_lock = Lock() if threads is not None else nullcontext()
+        self._claimed = set()
+
+        # only the root needs the mask up front -- other ranks allocate it
+        # when they first use it (see `mask`), so that constructing a pool is
+        # O(1) on them
+        self._mask = [Status.UNINIT]*self.size if self._is_root else None
+
+        # if set, sync_mask shares the root's mask with all ranks -- a rank
+        # that did not receive the latest mask (e.g. because the root marked it
+        # as timed out) knows that its mask is stale
+        self._share_mask = share_mask
+        self._mask_stale = False
+
+        # shortened gather timeouts of demoted stragglers: {rank: timeout}
+        self._rank_timeouts = dict()
+
+        # network messages are compressed by the compressor (if set) -- the
+        # statistics of the latest transactions are kept
+        self._compressor = compressor
+        self._compression_stats = deque(maxlen=1024)
+
+        # communicators created by this pool (freed by `free`)
+        self._derived_comms = list()
+
+        # child pools created by `split`/`create_group` (freed by `free`), and
+        # the groups of the latest split: {root of the child: ranks of the
+        # child} (in this pool's ranks)
+        self._children = list()
+        self._groups = dict()
+
+        # node-aware mode: ranks are grouped into (shared-memory) nodes, only
+        # the node leaders talk to the root
+        self._node_pool = None
+        self._leader_pool = None
+        if hierarchical or node_comm is not None:
+            self._init_hierarchy(node_comm)
+
+        # shared memory data path for buffer-mode transactions between ranks
+        # on the root's node: {global rank: slot in the shared window}
+        self._shm = None
+        self._shm_slots = dict()
+        if shm_nbytes is not None:
+            self._init_shm(shm_nbytes)
+
+        # one-sided status board: ranks post their status to an RMA window at
+        # the root, instead of sending it in a gather (see `sync_mask`)
+        self._board = None
+        if status_board:
+            assert not self.is_hierarchical, \
+                "node-aware pools don't support the status board"
+            self._board = StatusBoard(
+                self.comm, root, initial=Status.UNINIT.value
+            )
+
+        LOGGER.debug("Initialized pool at root=%s", root, comm=self)
 
-        self._mask = [Status.UNINIT for i in range(self.size)]
+    def _init_shm(self, shm_nbytes):
+        """
+        Allocate a shared window (with `shm_nbytes` per rank) on the root's
+        node. Ranks on other nodes don't participate. In node-aware mode, the
+        window is allocated on the node pool's communicator.
+        """
+        if self.is_hierarchical:
+            shm_comm = self._node_pool.comm
+            node_ranks = self._node_ranks
+        else:
+            # the root has to be the first rank on its node => it owns slot 0
+            key = 0 if self.is_root else 1
+            shm_comm = self.comm.Split_type(MPI.COMM_TYPE_SHARED, key=key)
+            self._derived_comms.append(shm_comm)
+            node_ranks = shm_comm.allgather(self.rank)
+
+        if self.root not in node_ranks:
+            return
+
+        self._shm = SharedWindow(shm_comm, shm_nbytes)
+        self._shm_slots = {j: i for i, j in enumerate(node_ranks)}
 
-        LOGGER.debug(f"Initialized pool at {root=}", comm=self)
+    def _init_hierarchy(self, node_comm):
+        """
+        Split the pool into node-local pools, and a pool of node leaders. The
+        root is always the leader of its node (and the root of the leader
+        pool). If `node_comm` is None, nodes are determined by
+        `Split_type(COMM_TYPE_SHARED)`.
+        """
+        # the root has to be the first rank on its node
+        key = 0 if self.is_root else 1
+        if node_comm is None:
+            node_comm = self.comm.Split_type(MPI.COMM_TYPE_SHARED, key=key)
+        else:
+            node_comm = node_comm.Split(0, key=key)
+        self._derived_comms.append(node_comm)
+
+        chunking = dict(
+            chunk_nbytes=self.chunk_nbytes, chunk_threshold=self.chunk_threshold,
+            chunks_in_flight=self.chunks_in_flight, compressor=self.compressor,
+            metrics=self.metrics is not None, trace=self.tracer,
+            stragglers=self.straggler_detector is not None,
+            rejected_capacity=self.rejected.capacity
+        )
+        self._node_pool = Pool(
+            node_comm, 0, self.timeout, self.n_tries, share_mask=True, **chunking
+        )
+        is_leader = self._node_pool.is_root
+        # non-leaders get COMM_NULL (which must not be freed)
+        leader_comm = self.comm.Split(0 if is_leader else MPI.UNDEFINED, key=key)
+        if is_leader:
+            self._derived_comms.append(leader_comm)
+        # leaders might have to wait out a timeout on their node before
+        # responding => the leader pool waits for up to two timeouts
+        if is_leader:
+            self._leader_pool = Pool(
+                leader_comm, 0, 2*self.timeout, self.n_tries, share_mask=True,
+                **chunking
+            )
+
+        # global ranks of the node's ranks (ordered by node rank), and the same
+        # for every node (ordered by leader rank)
+        self._node_ranks = node_comm.allgather(self.rank)
+        if is_leader:
+            self._all_node_ranks = leader_comm.allgather(self._node_ranks)
+
+        LOGGER.debug("Initialized node with ranks: %s", self._node_ranks, comm=self)
 
     @property
     def status(self):
@@ -69,42 +264,264 @@ class Pool(TimeoutComm):
 
     @property
     def mask(self):
+        """
+        Status of all ranks. This is only up to date on the root -- unless
+        `share_mask` is set (and not in node-aware mode, where other ranks only
+        keep the masks of their node and leader pools).
+        """
+        if self._mask is None:
+            self._mask = [Status.UNINIT]*self.size
         return self._mask
 
+    @property
+    def share_mask(self):
+        """
+        True if `sync_mask` shares the root's mask with all ranks
+        """
+        return self._share_mask
+
+    @property
+    def compressor(self):
+        return self._compressor
+
+    @property
+    def compression_stats(self):
+        """
+        Compression statistics (`CompressionStats`) of the latest transactions
+        on this rank, oldest first -- one entry per transaction tag. In
+        node-aware mode, the node and leader pools keep their own statistics.
+        """
+        return list(self._compression_stats)
+
+    @property
+    def board(self):
+        """
+        The pool's `StatusBoard` (None unless created with `status_board`) --
+        any rank can `read` it to find dead peers
+        """
+        return self._board
+
+    @property
+    def is_hierarchical(self):
+        return self._node_pool is not None
+
+    @property
+    def is_leader(self):
+        """
+        True if this rank is the leader of its node (in node-aware mode)
+        """
+        return self._leader_pool is not None
+
+    @property
+    def barrier_missed(self):
+        """
+        Ranks that missed (i.e. timed out during) the last barrier. The root
+        knows about all of them, other ranks only about those below them in
+        the barrier's tree.
+        """
+        return self._state.barrier_missed
+
+    @property
+    def gather_missed(self):
+        """
+        Ranks whose data the root did not get in the last gather (dead ranks
+        and timeouts) -- only known to the root
+        """
+        return self._state.gather_missed
+
+    def _new_state(self, threads, *args):
+        if threads:
+            return ThreadPoolState(*args)
+        return PoolState(*args)
+
     @property
     def transaction_counter(self):
-        return self._txn_ct
+        """
+        Transaction ID of the next transaction (of the calling thread's
+        channel)
+        """
+        channel = self._state.channel
+        if channel == 0:
+            return self._txn_ct
+        return self._channel_txn[channel]
+
+    @property
+    def tags(self):
+        """
+        Tag allocator (`TagAllocator`) that maps transaction IDs to tags
+        """
+        return self._tags
+
+    @property
+    def epoch(self):
+        """
+        Tag epoch of the latest transaction (of the calling thread)
+        """
+        return self._state.epoch
+
+    @property
+    def threads(self):
+        """
+        Number of transaction channels (None unless the pool is thread-safe)
+        """
+        return self._threads
+
+    @contextmanager
+    def context(self, channel):
+        """
+        Run the calling thread's transactions on `channel` (one of `threads`)
+        -- every channel counts its transactions (and allocates their tags)
+        separately. Threads that run transactions at the same time need to use
+        different channels, and the threads that run matching transactions on
+        other ranks need to use the same channel. Threads that don't enter a
+        context share the first channel.
+        """
+        assert self._threads is not None, "the pool is not thread-safe"
+        assert 0 <= channel < self._threads, f"invalid {channel=}"
+        with self._txn_lock:
+            assert channel not in self._claimed, f"{channel=} is in use"
+            self._claimed.add(channel)
+        state = self._state
+        previous = state.channel
+        state.channel = channel
+        try:
+            yield self
+        finally:
+            state.channel = previous
+            with self._txn_lock:
+                self._claimed.discard(channel)
 
     def next_tag(self):
-        # use txn_ct as tag and increment
-        tag = self._txn_ct;
-        self._txn_ct += 1
+        # use (the tag of) txn_ct as tag and increment
+        state = self._state
+        channel = state.channel
+        if channel == 0:
+            with self._txn_lock:
+                txn = self._txn_ct;
+                self._txn_ct += 1
+        else:
+            # channels are only used by one thread at a time
+            txn = self._channel_txn[channel]
+            self._channel_txn[channel] = txn + 1
+        tag = self._tags.tag(txn, channel)
+        epoch = self._tags.epoch(txn)
+        if epoch != state.epoch:
+            # tags are reused from now on => requests that are still waiting
+            # for earlier transactions must not match this epoch's messages
+            LOGGER.debug("Entering tag epoch %s", epoch, comm=self)
+            state.epoch = epoch
+            self.reap_leftovers(cancel=True)
         return tag
 
     def advance_transaction_counter(self, val):
         assert val > 0
-        self._txn_ct += val;
+        channel = self._state.channel
+        if channel == 0:
+            with self._txn_lock:
+                self._txn_ct += val;
+        else:
+            self._channel_txn[channel] += val
 
     def ready(self):
         self._status = Status.READY
+        if self.is_hierarchical:
+            self._node_pool.ready()
 
     def drop(self):
         self._status = Status.DONE
+        if self.is_hierarchical:
+            self._node_pool.drop()
+
+    def _record_compression(self, tag, nbytes, wire_nbytes, seconds):
+        """
+        Add to the compression statistics of transaction `tag`
+        """
+        if len(self._compression_stats) > 0:
+            stats = self._compression_stats[-1]
+            if stats.tag == tag:
+                stats.nbytes += nbytes
+                stats.wire_nbytes += wire_nbytes
+                stats.seconds += seconds
+                return
+        self._compression_stats.append(
+            CompressionStats(tag, nbytes, wire_nbytes, seconds)
+        )
+
+    def _encode(self, tag, buf):
+        """
+        Compress `buf` for transaction `tag`
+        """
+        start = perf_counter()
+        data = self._compressor.encode(buf)
+        self._record_compression(
+            tag, memoryview(buf).nbytes, len(data), perf_counter() - start
+        )
+        return data
+
+    def _decode(self, tag, buf):
+        """
+        Decompress `buf` received in transaction `tag`
+        """
+        start = perf_counter()
+        data = self._compressor.decode(buf)
+        self._record_compression(tag, len(data), len(buf), perf_counter() - start)
+        return data
+
+    def _decode_into(self, tag, buf, dst):
+        """
+        Decompress `buf` received in transaction `tag` into `dst`
+        """
+        start = perf_counter()
+        wire_nbytes = self._compressor.decode_into(buf, dst)
+        self._record_compression(
+            tag, memoryview(dst).nbytes, wire_nbytes, perf_counter() - start
+        )
+    def _use_shm(self, buf, mode):
+        """
+        True if `buf` can be sent using the shared memory data path
+        """
+        if mode != OperatorMode.UPPER or self._shm is None:
+            return False
+        return self._shm.fits(buf)
 
-    def _exec_gather_transaction(self, sendbuf, recvbuf, failover, mode):
+    def _exec_gather_transaction(self, sendbuf, recvbuf, failover, mode,
+                                 timeouts=None):
         """
         Gather data from masked ranks -- excluding "dead ranks". If a timemout
-        occurs, assign the `failover` value.
+        occurs, assign the `failover` value. In UPPER mode, data is received
+        in place into `recvbuf[i]` (rows of timed-out and dead ranks are left
+        untouched if `failover` is None), and ranks on the root's node use the
+        shared window (if there is one). Network messages are compressed if the
+        pool has a `compressor`. `timeouts` ({rank: timeout}) overrides the
+        timeout of individual ranks. `failover` can be a factory (see
+        `failover.value`), numpy rows are filled at once (see `failover.fill`).
         """
         # use unique tag
         tag = self.next_tag();
 
-        LOGGER.debug(f"Entering gather transacton, using: {mode=}, {tag=}", comm=self)
+        if __debug__ and self._debug:
+            LOGGER.debug(
+                f"Entering gather transacton, using: {mode=}, {tag=}", comm=self
+            )
+        if self._metrics is not None:
+            self._metrics.begin(Op.GATHER, tag)
+        if self._tracer is not None:
+            self._tracer.record(Event.BEGIN, tag, Op.GATHER.value)
         recv_op, send_op = OperatorMode.get(mode, self.comm)
+        use_shm = self._use_shm(sendbuf, mode)
+        compress = self._compressor is not None
+
+        # compressed UPPER mode messages are received into staging buffers
+        # (large enough for the header byte and uncompressed data): {rank: buf}
+        staging = dict()
+        missed = list()
+        # ranks that get their failover value (once the transaction is done)
+        failed = list()
 
         # initiate communications ----------------------------------------------
         if self.is_root:
-            LOGGER.debug("Root is initializing communications", comm=self)
+            if __debug__ and self._debug:
+                LOGGER.debug("Root is initializing communications", comm=self)
             # Initiate comms with all ranks
             for i in range(self.size):
                 # don't do anything for the root, except updating the data array
@@ -113,42 +530,150 @@ class Pool(TimeoutComm):
                     continue
                 # don't receive mask data from ranks that are set to "DONE"
                 if Status.is_dead(self.mask[i]):
-                    LOGGER.debug(f"Source {i=} is considered DEAD, skipping", comm=self)
+                    if __debug__ and self._debug:
+                        LOGGER.debug(
+                            f"Source {i=} is considered DEAD, skipping", comm=self
+                        )
+                    if mode == OperatorMode.UPPER and failover is not None:
+                        failed.append(i)
+                    missed.append(i)
+                    continue
+                # ranks on the shared window are collected below
+                if use_shm and i in self._shm_slots:
                     continue
                 # receive mask
-                LOGGER.debug("Initiating recv", comm=self)
-                self.push_req(i, recv_op(source=i, tag=tag))
+                if __debug__ and self._debug:
+                    LOGGER.debug("Initiating recv", comm=self)
+                if mode == OperatorMode.UPPER and compress:
+                    staging[i] = bytearray(1 + memoryview(recvbuf[i]).nbytes)
+                    req = recv_op(staging[i], source=i, tag=tag)
+                    self.push_req(i, req, tag=tag)
+                elif mode == OperatorMode.UPPER:
+                    req = recv_op(recvbuf[i], source=i, tag=tag)
+                    self.push_req(i, req, tag=tag)
+                else:
+                    self.push_req(i, recv_op(source=i, tag=tag), tag=tag)
+        elif use_shm and self.rank in self._shm_slots:
+            # write data to the shared window
+            if __debug__ and self._debug:
+                LOGGER.debug("Writing to shared window", comm=self)
+            self._shm.put(self._shm_slots[self.rank], sendbuf, tag)
         else:
             # send data
-            LOGGER.debug("Initiating send", comm=self)
-            self.push_req(0, send_op(sendbuf, dest=self.root, tag=tag))
+            if __debug__ and self._debug:
+                LOGGER.debug("Initiating send", comm=self)
+            payload = sendbuf
+            if compress and mode == OperatorMode.UPPER:
+                payload = self._encode(tag, sendbuf)
+            elif compress:
+                payload = self._encode(tag, dumps(sendbuf, protocol=HIGHEST_PROTOCOL))
+            self.push_req(0, send_op(payload, dest=self.root, tag=tag), tag=tag)
 
         # complete communications ----------------------------------------------
-        # Collect requests with timeout
-        self.safe_collect_deferred_req(failover, tag=tag)
+        # Collect shared window data with timeout
+        if self.is_root and use_shm:
+            if __debug__ and self._debug:
+                LOGGER.debug("Collecting shared window", comm=self)
+            for i, slot in self._shm_slots.items():
+                if i == self.root or Status.is_dead(self.mask[i]):
+                    continue
+                timeout = None if timeouts is None else timeouts.get(i)
+                if not self.safe_shm_wait(
+                    self._shm, slot, recvbuf[i], tag, timeout=timeout, source=i
+                ):
+                    missed.append(i)
+                    if failover is not None:
+                        failed.append(i)
+        # Collect requests with timeout. In UPPER mode the data is already in
+        # place (only timeouts need handling), and receives that timed out are
+        # cancelled, so that late messages don't end up in recvbuf
+        self.safe_collect_deferred_req(
+            Signal.TIMEOUT, tag=tag,
+            cancel=self.is_root and mode == OperatorMode.UPPER, timeouts=timeouts
+        )
         # Assigned collected data to recvbuf
         if self.is_root:
-            LOGGER.debug("Collecting requests", comm=self)
+            if __debug__ and self._debug:
+                LOGGER.debug("Collecting requests", comm=self)
             for i, msg in self.deferred_msg.items():
-                recvbuf[i] = msg
+                if msg is Signal.TIMEOUT:
+                    missed.append(i)
+                    if mode == OperatorMode.LOWER or failover is not None:
+                        failed.append(i)
+                elif mode == OperatorMode.UPPER:
+                    if i in staging:
+                        self._decode_into(tag, staging[i], recvbuf[i])
+                elif compress:
+                    recvbuf[i] = loads(self._decode(tag, msg))
+                else:
+                    recvbuf[i] = msg
+            fill(recvbuf, failed, failover)
+            self._state.gather_missed = sorted(missed)
+
+        if self._metrics is not None:
+            self._metrics.end()
+        if self._tracer is not None:
+            self._tracer.record(Event.END, tag, Op.GATHER.value)
 
-    def _exec_bcast_transaction(self, sendbuf, recvbuf, failover, mode):
+    def _exec_bcast_transaction(self, sendbuf, recvbuf, failover, mode, timeout=None,
+                                view=False):
         """
         Scatter data to masked ranks -- excluding "dead ranks". If a timemout
-        occurs, assign the `failover` value.
+        occurs, assign the `failover` value. Setting `timeout` overrides the
+        pool's timeout for this transaction. In UPPER mode, data is received
+        in place into `recvbuf[0]` (which is left untouched on timeout if
+        `failover` is None), and ranks on the root's node use the shared
+        window (if there is one). If `view` is set, these ranks don't copy the
+        data, but set `recvbuf[0]` to a view of the shared window instead.
+        Large messages are sent in chunks (if `chunk_nbytes` is set), and
+        network messages are compressed if the pool has a `compressor`.
         """
         # use unique tag
         tag = self.next_tag();
 
-        LOGGER.debug(f"Entering scatter transacton, using: {mode=}, {tag=}", comm=self)
+        if __debug__ and self._debug:
+            LOGGER.debug(
+                f"Entering scatter transacton, using: {mode=}, {tag=}", comm=self
+            )
+        if self._metrics is not None:
+            self._metrics.begin(Op.BCAST, tag)
+        if self._tracer is not None:
+            self._tracer.record(Event.BEGIN, tag, Op.BCAST.value)
         recv_op, send_op = OperatorMode.get(mode, self.comm)
+        use_shm = self._use_shm(sendbuf, mode)
+        compress = self._compressor is not None
+
+        # data sent over the network, and whether it is sent in chunks: in
+        # UPPER mode, all ranks know the message size -- so uncompressed chunks
+        # are received in place. Otherwise the root sends a ChunkHeader first
+        payload = sendbuf
+        use_chunks = False
+        if mode == OperatorMode.UPPER:
+            use_chunks = self.use_chunks(memoryview(sendbuf).nbytes)
+            if self.is_root and compress:
+                payload = self._encode(tag, sendbuf)
+        elif self.is_root and (compress or self.chunk_nbytes is not None):
+            data = dumps(sendbuf, protocol=HIGHEST_PROTOCOL)
+            if compress:
+                data = self._encode(tag, data)
+            use_chunks = self.use_chunks(len(data))
+            if compress or use_chunks:
+                payload = data
+        use_header = mode == OperatorMode.LOWER or compress
+        chunk_dests = list()
 
         # index of result in recvbuf
         recvbuf_result_idx = 0
+        # compressed UPPER mode messages are received into a staging buffer
+        staging = None
 
         # initiate communications ----------------------------------------------
         if self.is_root:
-            LOGGER.debug("Root is initializing communications", comm=self)
+            if __debug__ and self._debug:
+                LOGGER.debug("Root is initializing communications", comm=self)
+            # write data once to the shared window
+            if use_shm:
+                self._shm.put(self._shm_slots[self.root], sendbuf, tag)
             # Initiate comms with all ranks
             for i in range(self.size):
                 # don't do anything for the root, except updating the data array
@@ -157,79 +682,495 @@ class Pool(TimeoutComm):
                     continue
                 # don't receive mask data from ranks that are set to "DONE"
                 if Status.is_dead(self.mask[i]):
-                    LOGGER.debug(f"Source {i=} is considered DEAD, skipping", comm=self)
+                    if __debug__ and self._debug:
+                        LOGGER.debug(
+                            f"Source {i=} is considered DEAD, skipping", comm=self
+                        )
+                    continue
+                # ranks on the shared window read it themselves
+                if use_shm and i in self._shm_slots:
+                    continue
+                # chunks are sent below
+                if use_chunks:
+                    chunk_dests.append(i)
+                    if use_header:
+                        header = ChunkHeader(len(payload))
+                        req = self.comm.isend(header, dest=i, tag=tag)
+                        self.push_req(i, req, tag=tag)
                     continue
                 # receive mask
-                LOGGER.debug("Initiating recv", comm=self)
-                self.push_req(i, send_op(sendbuf, dest=i, tag=tag))
-        else:
+                if __debug__ and self._debug:
+                    LOGGER.debug("Initiating recv", comm=self)
+                self.push_req(i, send_op(payload, dest=i, tag=tag), tag=tag)
+            if use_chunks:
+                self.safe_send_chunked(payload, chunk_dests, tag)
+        elif use_shm and self.rank in self._shm_slots:
+            # read data from the shared window
+            if __debug__ and self._debug:
+                LOGGER.debug("Reading from shared window", comm=self)
+            buf = recvbuf[recvbuf_result_idx]
+            slot = self._shm_slots[self.root]
+            if self.safe_shm_wait(
+                self._shm, slot, None if view else buf, tag, timeout=timeout,
+                source=self.root
+            ):
+                if view:
+                    nbytes = memoryview(buf).nbytes
+                    recvbuf[recvbuf_result_idx] = self._shm.view(slot, tag, nbytes)
+            elif failover is not None:
+                buf[:] = value(failover, self.rank)
+        elif mode == OperatorMode.UPPER and use_chunks and not compress:
+            # receive data in chunks
+            if not self.safe_recv_chunked(
+                recvbuf[recvbuf_result_idx], self.root, tag, timeout=timeout
+            ):
+                if failover is not None:
+                    recvbuf[recvbuf_result_idx][:] = value(failover, self.rank)
+        elif mode == OperatorMode.UPPER and use_chunks:
+            # compressed chunks are announced by a ChunkHeader
+            self.push_req(
+                recvbuf_result_idx, self.comm.irecv(source=self.root, tag=tag),
+                tag=tag
+            )
+        elif mode == OperatorMode.UPPER:
             # send data
-            LOGGER.debug("Initiating send", comm=self)
-            self.push_req(recvbuf_result_idx, recv_op(source=self.root, tag=tag))
+            if __debug__ and self._debug:
+                LOGGER.debug("Initiating send", comm=self)
+            buf = recvbuf[recvbuf_result_idx]
+            if compress:
+                staging = buf = bytearray(1 + memoryview(buf).nbytes)
+            self.push_req(
+                recvbuf_result_idx, recv_op(buf, source=self.root, tag=tag),
+                tag=tag
+            )
+        else:
+            self.push_req(
+                recvbuf_result_idx, recv_op(source=self.root, tag=tag), tag=tag
+            )
 
         # complete communications ----------------------------------------------
-        # Collect requests with timeout
-        self.safe_collect_deferred_req(failover, tag=tag)
+        # Collect requests with timeout. In UPPER mode the data is already in
+        # place (only timeouts need handling), and receives that timed out are
+        # cancelled, so that late messages don't end up in recvbuf
+        self.safe_collect_deferred_req(
+            Signal.TIMEOUT, tag=tag, timeout=timeout,
+            cancel=not self.is_root and mode == OperatorMode.UPPER
+        )
         # Assigned collected data to recvbuf
-        if not self.is_root:
-            LOGGER.debug("Collecting requests", comm=self)
-            recvbuf[recvbuf_result_idx] = self.deferred_msg[recvbuf_result_idx]
+        if not self.is_root and recvbuf_result_idx in self.deferred_msg:
+            if __debug__ and self._debug:
+                LOGGER.debug("Collecting requests", comm=self)
+            msg = self.deferred_msg[recvbuf_result_idx]
+            # data as it was sent over the network
+            wire = staging if mode == OperatorMode.UPPER else msg
+            # the message follows in chunks
+            if isinstance(msg, ChunkHeader):
+                wire = bytearray(msg.nbytes)
+                if not self.safe_recv_chunked(wire, self.root, tag):
+                    msg = Signal.TIMEOUT
+            if msg is Signal.TIMEOUT:
+                if mode == OperatorMode.LOWER:
+                    recvbuf[recvbuf_result_idx] = value(failover, self.rank)
+                elif failover is not None:
+                    recvbuf[recvbuf_result_idx][:] = value(failover, self.rank)
+            elif mode == OperatorMode.UPPER:
+                if compress:
+                    self._decode_into(tag, wire, recvbuf[recvbuf_result_idx])
+            elif compress:
+                recvbuf[recvbuf_result_idx] = loads(self._decode(tag, wire))
+            elif isinstance(msg, ChunkHeader):
+                recvbuf[recvbuf_result_idx] = loads(wire)
+            else:
+                recvbuf[recvbuf_result_idx] = msg
+
+        if self._metrics is not None:
+            self._metrics.end()
+        if self._tracer is not None:
+            self._tracer.record(Event.END, tag, Op.BCAST.value)
 
     def Gather(self, sendbuf, recvbuf, failover=None):
         """
         Gather data from masked ranks -- excluding "dead ranks". If a timemout
-        occurs, assign the `failover` value. Executed in UPPER mode
+        occurs, assign the `failover` value. Executed in UPPER mode. The rows
+        of numpy `recvbuf`s are filled with a scalar (or row) `failover` at
+        once. Use `failover.PerRank` or a factory for per-rank values.
+        """
+        if __debug__ and self._debug:
+            LOGGER.debug("Start Gather", comm=self)
+        self._exec_gather_transaction(
+            sendbuf, recvbuf, failover, OperatorMode.UPPER,
+            timeouts=self._rank_timeouts
+        )
+
+    def gather_plan(self, sendbuf, recvbuf, failover=None):
         """
-        LOGGER.debug("Start Gather", comm=self)
-        self._exec_gather_transaction(sendbuf, recvbuf, failover, OperatorMode.UPPER)
+        Plan (`GatherPlan`) for repeated `Gather` calls with the same buffers:
+        `plan.run()` gathers `sendbuf` into `recvbuf` using persistent
+        requests, which are only set up once. All ranks have to create (and
+        run) the plan together. Unlike `Gather`, all ranks share one timeout,
+        and neither the shared window, chunks, nor compression are used. If
+        `failover` is None, rows of ranks that time out might hold late data
+        of an earlier run.
+        """
+        assert self._threads is None, "plans are not thread-safe"
+        return GatherPlan(self, sendbuf, recvbuf, failover)
 
-    def gather(self, data, failover=None):
+    def gather(self, data, failover=None, result=False):
         """
         Gather data from masked ranks -- excluding "dead ranks". If a timemout
-        occurs, assign the `failover` value. Executed in LOWER mode
+        occurs, assign the `failover` value. Executed in LOWER mode. If
+        `result` is set, a `GatherResult` (which knows which ranks responded,
+        and reduces their data in numpy) is returned instead of a list. If
+        `failover` is a factory (see `failover.value`), it is only called on
+        the root -- other ranks get a list of None.
         """
-        LOGGER.debug("Start gather", comm=self)
-        recvbuf = [failover for i in range(self.size)]
-        self._exec_gather_transaction(data, recvbuf, failover, OperatorMode.LOWER)
-        return recvbuf
+        if __debug__ and self._debug:
+            LOGGER.debug("Start gather", comm=self)
+        # results mark missing data by a sentinel (rather than the failover
+        # value, which a rank might send as well) -- and so do factories,
+        # which are called once the transaction is done
+        factory = callable(failover)
+        placeholder = Signal.TIMEOUT if result or factory else failover
+        if self.is_hierarchical:
+            recvbuf = self._node_gather(data, placeholder)
+        else:
+            recvbuf = [placeholder for i in range(self.size)]
+            self._exec_gather_transaction(
+                data, recvbuf, placeholder, OperatorMode.LOWER,
+                timeouts=self._rank_timeouts
+            )
+        if not result:
+            if factory and not self.is_root:
+                return [None]*self.size
+            if factory:
+                self._fill_missing(recvbuf, failover)
+            return recvbuf
+
+        # imported here: results need numpy, which is slow to import
+        from .result import GatherResult
+
+        valid = [i is not Signal.TIMEOUT for i in recvbuf]
+        data = [
+            d if v else value(failover, i)
+            for i, (d, v) in enumerate(zip(recvbuf, valid))
+        ]
+        return GatherResult(data, valid)
+
+    def _fill_missing(self, recvbuf, failover):
+        """
+        Replace the `Signal.TIMEOUT` placeholders in `recvbuf` by the
+        `failover` values of their ranks
+        """
+        missing = [i for i, d in enumerate(recvbuf) if d is Signal.TIMEOUT]
+        fill(recvbuf, missing, failover)
 
     def Bcast(self, buf, failover=None):
         """
         Bcast data accross masked ranks -- excluding "dead ranks", If a timeout
         occurs, assign the `failover` value. Excecuted in UPPER mode
         """
-        LOGGER.debug("Start Barrier", comm=self)
-        self._exec_bcast_transaction(buf, buf, failover, OperatorMode.UPPER)
+        if __debug__ and self._debug:
+            LOGGER.debug("Start Barrier", comm=self)
+        self._exec_bcast_transaction(buf, [buf], failover, OperatorMode.UPPER)
+
+    def Bcast_view(self, buf, failover=None):
+        """
+        Same as `Bcast`, but returns a read-only byte view of the data. Ranks
+        on the root's node read the shared window without copying it into
+        `buf` (if there is one) -- this view is only valid until the next but
+        one `Bcast`. On other ranks, this is a view of `buf`.
+        """
+        if __debug__ and self._debug:
+            LOGGER.debug("Start Bcast_view", comm=self)
+        recvbuf = [buf]
+        self._exec_bcast_transaction(
+            buf, recvbuf, failover, OperatorMode.UPPER, view=True
+        )
+        return memoryview(recvbuf[0]).cast("B").toreadonly()
 
     def bcast(self, obj, failover=None):
         """
         Bcast data accross masked ranks -- excluding "dead ranks", If a timeout
         occurs, assign the `failover` value. Excecuted in LOWER mode
         """
-        LOGGER.debug("Start barrier", comm=self)
+        if __debug__ and self._debug:
+            LOGGER.debug("Start barrier", comm=self)
+        if self.is_hierarchical:
+            return self._node_bcast(obj, failover)
         recvbuf = [failover]
         self._exec_bcast_transaction(obj, recvbuf, failover, OperatorMode.LOWER)
         return recvbuf[0]
 
+    def _exec_exchange_transaction(self, payload, recvbuf, failover, mode, op,
+                                   pickled=False):
+        """
+        Exchange data between all masked ranks -- excluding "dead ranks" (as
+        far as this rank's mask knows, see `share_mask`): this rank sends
+        `payload(i)` to every peer `i`, and receives peer `i`'s data into
+        `recvbuf[i]`. Peers are visited in pairwise order (sending to rank + k
+        while receiving from rank - k), and all receives share one timeout.
+        Peers that time out get the `failover` value -- in UPPER mode, their
+        rows are left untouched if `failover` is None (their receives are
+        cancelled). In LOWER mode, `pickled` payloads are sent as they are.
+        """
+        # use unique tag
+        tag = self.next_tag();
+
+        if __debug__ and self._debug:
+            LOGGER.debug(
+                f"Entering exchange transacton, using: {mode=}, {tag=}", comm=self
+            )
+        if self._metrics is not None:
+            self._metrics.begin(op, tag)
+        if self._tracer is not None:
+            self._tracer.record(Event.BEGIN, tag, op.value)
+        recv_op, send_op = OperatorMode.get(mode, self.comm)
+        if pickled:
+            send_op = self.comm.Isend
+
+        # post all receives before sending
+        recv_reqs = list()
+        for k in range(1, self.size):
+            i = (self.rank - k) % self.size
+            if Status.is_dead(self.mask[i]):
+                continue
+            if mode == OperatorMode.UPPER:
+                recv_reqs.append((i, recv_op(recvbuf[i], source=i, tag=tag)))
+            else:
+                recv_reqs.append((i, recv_op(source=i, tag=tag)))
+        send_reqs = list()
+        for k in range(1, self.size):
+            i = (self.rank + k) % self.size
+            if Status.is_dead(self.mask[i]):
+                continue
+            send_reqs.append((i, send_op(payload(i), dest=i, tag=tag)))
+        recvbuf[self.rank] = payload(self.rank)
+
+        msgs = dict()
+        self.safe_req_waitall(
+            msgs, Signal.TIMEOUT, recv_reqs, tag,
+            cancel=mode == OperatorMode.UPPER
+        )
+        failed = list()
+        for i, msg in msgs.items():
+            if msg is Signal.TIMEOUT:
+                if mode == OperatorMode.LOWER or failover is not None:
+                    failed.append(i)
+            elif mode == OperatorMode.LOWER:
+                recvbuf[i] = msg
+        fill(recvbuf, failed, failover)
+        self.safe_req_waitall(dict(), None, send_reqs, tag)
+
+        if self._metrics is not None:
+            self._metrics.end()
+        if self._tracer is not None:
+            self._tracer.record(Event.END, tag, op.value)
+
+    def Allgather(self, sendbuf, recvbuf, failover=None):
+        """
+        Gather data from all masked ranks on all ranks -- excluding "dead
+        ranks". If a timemout occurs, assign the `failover` value. Executed in
+        UPPER mode
+        """
+        if __debug__ and self._debug:
+            LOGGER.debug("Start Allgather", comm=self)
+        self._exec_exchange_transaction(
+            lambda i: sendbuf, recvbuf, failover, OperatorMode.UPPER,
+            Op.ALLGATHER
+        )
+
+    def allgather(self, data, failover=None):
+        """
+        Gather data from all masked ranks on all ranks -- excluding "dead
+        ranks". If a timemout occurs, assign the `failover` value. Executed in
+        LOWER mode
+        """
+        if __debug__ and self._debug:
+            LOGGER.debug("Start allgather", comm=self)
+        # pickle once (rather than once per peer) -- lowercase receives
+        # unpickle the raw message
+        payload = dumps(data, protocol=HIGHEST_PROTOCOL)
+        # factories are called once the transaction is done
+        placeholder = Signal.TIMEOUT if callable(failover) else failover
+        recvbuf = [placeholder for i in range(self.size)]
+        self._exec_exchange_transaction(
+            lambda i: payload, recvbuf, placeholder, OperatorMode.LOWER,
+            Op.ALLGATHER, pickled=True
+        )
+        recvbuf[self.rank] = data
+        if callable(failover):
+            self._fill_missing(recvbuf, failover)
+        return recvbuf
+
+    def Alltoallv(self, sendbuf, recvbuf, failover=None):
+        """
+        Send `sendbuf[i]` to masked rank `i`, and receive its data into
+        `recvbuf[i]` -- excluding "dead ranks". Buffers may have different
+        sizes for every rank. If a timemout occurs, assign the `failover`
+        value. Executed in UPPER mode
+        """
+        if __debug__ and self._debug:
+            LOGGER.debug("Start Alltoallv", comm=self)
+        self._exec_exchange_transaction(
+            lambda i: sendbuf[i], recvbuf, failover, OperatorMode.UPPER,
+            Op.ALLTOALL
+        )
+
+    def alltoall(self, data, failover=None):
+        """
+        Send `data[i]` to masked rank `i`, and return the list of data
+        received from all ranks -- excluding "dead ranks". If a timemout
+        occurs, assign the `failover` value. Executed in LOWER mode
+        """
+        if __debug__ and self._debug:
+            LOGGER.debug("Start alltoall", comm=self)
+        # factories are called once the transaction is done
+        placeholder = Signal.TIMEOUT if callable(failover) else failover
+        recvbuf = [placeholder for i in range(self.size)]
+        self._exec_exchange_transaction(
+            lambda i: data[i], recvbuf, placeholder, OperatorMode.LOWER,
+            Op.ALLTOALL
+        )
+        if callable(failover):
+            self._fill_missing(recvbuf, failover)
+        return recvbuf
+
     def Barrier(self):
         """
         Barrier on all masked ranks -- exlcuding "dead ranks". Non-dead ranks
-        can still time out. If that occurs, the barrier proceeds.
+        can still time out. If that occurs, the barrier proceeds. Ranks that
+        timed out are listed in `barrier_missed`.
+
+        If masks are shared (`share_mask`), the barrier runs on a binomial tree
+        (rooted at the root) over the ranks that are alive: ceil(log2(P))
+        levels up to the root, and then back down again. Otherwise only the
+        root knows which ranks are dead, so it signals all ranks directly.
+        Messages are zero-byte, unless a rank reports ranks that missed the
+        barrier to its parent.
         """
-        LOGGER.debug("Start Barrier", comm=self)
-        sendbuf = [Signal.OK for i in range(self.size)]
-        recvbuf = [None for i in range(self.size)]
-        self._exec_gather_transaction(
-            sendbuf, recvbuf, Signal.TIMEOUT, OperatorMode.LOWER
+        if __debug__ and self._debug:
+            LOGGER.debug("Start Barrier", comm=self)
+        if self.is_hierarchical:
+            return self._node_barrier()
+
+        # use unique tag -- messages going up and down the tree go between
+        # different pairs of ranks
+        tag = self.next_tag()
+
+        self._state.barrier_missed = list()
+        if Status.is_dead(self.mask[self.rank]):
+            if __debug__ and self._debug:
+                LOGGER.debug("This rank is considered DEAD, skipping", comm=self)
+            return
+
+        if not self.share_mask:
+            if self.is_root:
+                children = [
+                    (i, 1) for i in range(self.size)
+                    if i != self.root and not Status.is_dead(self.mask[i])
+                ]
+                self._exec_barrier_transaction(tag, None, children, 0, 0)
+            else:
+                self._exec_barrier_transaction(tag, self.root, list(), 0, 0)
+            return
+
+        if self._mask_stale:
+            LOGGER.info("Mask is stale, skipping barrier", comm=self)
+            return
+
+        # binomial tree over live ranks (with the root at position 0)
+        live = [i for i, status in enumerate(self.mask) if not Status.is_dead(status)]
+        idx = live.index(self.root)
+        live = live[idx:] + live[:idx]
+        n_live = len(live)
+        vr = live.index(self.rank)
+
+        parent = None
+        children = list()
+        dist = 1
+        while dist < n_live:
+            if vr & dist:
+                parent = live[vr - dist]
+                break
+            if vr + dist < n_live:
+                # (child rank, size of the child's subtree)
+                children.append((live[vr + dist], min(dist, n_live - vr - dist)))
+            dist *= 2
+
+        self._exec_barrier_transaction(
+            tag, parent, children, len(children), (n_live - 1).bit_length()
         )
-        if Signal.TIMEOUT in recvbuf:
-            LOGGER.info("Receiving unexpected timeouts", comm=self)
-        recvbuf = [None]
-        self._exec_bcast_transaction(
-            Signal.OK, recvbuf, Signal.TIMEOUT, OperatorMode.LOWER
+
+    def _exec_barrier_transaction(self, tag, parent, children, height, depth):
+        """
+        Wait for all `children` (a list of (rank, subtree size) tuples), report
+        to `parent`, wait for `parent` to release this rank, and release the
+        children. The root has no parent. `height` is the height of this
+        rank's subtree, and `depth` the height of the whole tree.
+        """
+        if self._metrics is not None:
+            self._metrics.begin(Op.BARRIER, tag)
+        if self._tracer is not None:
+            self._tracer.record(Event.BEGIN, tag, Op.BARRIER.value)
+
+        # slack per tree level: a few polling intervals, so that children can
+        # wait out their own timeout (and report) first
+        slack = 3*self.timeout/self.n_tries
+
+        # wait for children: they all share one timeout
+        bufs = dict()
+        reqs = list()
+        for i, n in children:
+            # reports list up to one rank per rank in the subtree, and are
+            # terminated by -1
+            bufs[i] = bytearray(b"\xff"*4*n)
+            reqs.append((i, self.comm.Irecv(bufs[i], source=i, tag=tag)))
+        msgs = dict()
+        self.safe_req_waitall(
+            msgs, Signal.TIMEOUT, reqs, tag,
+            timeout=self.timeout + height*slack, cancel=True
         )
-        if recvbuf[0] is Signal.TIMEOUT:
-            LOGGER.info("Receiving unexpected timeouts", comm=self)
+
+        missed = list()
+        for i, _ in children:
+            if msgs[i] is Signal.TIMEOUT:
+                missed.append(i)
+            else:
+                missed += takewhile(lambda j: j >= 0, array("i", bufs[i]))
+
+        sends = list()
+        if parent is not None:
+            # report to the parent, and wait for it to release this rank: the
+            # root might have to wait out a timeout (and the slack of all
+            # levels) first
+            report = array("i", missed).tobytes()
+            sends.append((parent, self.comm.Isend(report, dest=parent, tag=tag)))
+            reqs = [(parent, self.comm.Irecv(bytearray(0), source=parent, tag=tag))]
+            self.safe_req_waitall(
+                msgs, Signal.TIMEOUT, reqs, tag,
+                timeout=2*self.timeout + depth*slack, cancel=True
+            )
+            if msgs[parent] is Signal.TIMEOUT:
+                missed.append(parent)
+
+        # release children -- including the late ones, so that they don't
+        # have to wait any longer
+        for i, _ in children:
+            sends.append((i, self.comm.Isend(bytearray(0), dest=i, tag=tag)))
+        self.safe_req_waitall(dict(), None, sends, tag)
+
+        self._state.barrier_missed = sorted(missed)
+        if len(self._state.barrier_missed) > 0:
+            LOGGER.info(
+                "Receiving unexpected timeouts from: %s",
+                self._state.barrier_missed,
+                comm=self
+            )
+
+        if self._metrics is not None:
+            self._metrics.end()
+        if self._tracer is not None:
+            self._tracer.record(Event.END, tag, Op.BARRIER.value)
 
     def barrier(self):
         """
@@ -237,16 +1178,38 @@ class Pool(TimeoutComm):
         can still time out. If that occurs, the barrier proceeds. Same as
         uppercase "Barrier"
         """
-        LOGGER.debug("Start barrier", comm=self)
+        if __debug__ and self._debug:
+            LOGGER.debug("Start barrier", comm=self)
         self.Barrier()
 
     def sync_mask(self):
         """
-        Syncs masks accross all ranks -- excluding "dead ranks"
+        Syncs masks accross all ranks -- excluding "dead ranks". The root
+        gathers the status of every rank. If `share_mask` is set, the root
+        then shares its mask with all ranks that are still alive (this costs a
+        second transaction, during which the other ranks wait for the root).
+        With a status board, ranks post their status to the board instead, and
+        nobody waits (see `_board_sync_mask`).
         """
-        LOGGER.debug("Start sync'ing masks", comm=self)
+        if __debug__ and self._debug:
+            LOGGER.debug("Start sync'ing masks", comm=self)
         # input sanity checking
         assert isinstance(self.status, Status), f"{type(self.status)=}"
+        if self.is_hierarchical:
+            return self._node_sync_mask()
+        if self._board is not None:
+            return self._board_sync_mask()
+
+        self._gather_mask()
+        if self.share_mask:
+            # the root might have had to wait out a timeout during the gather
+            # => give it twice the time to respond
+            self._bcast_mask(2*self.timeout)
+
+    def _gather_mask(self):
+        """
+        Gather the status of all ranks into the root's mask
+        """
         self._exec_gather_transaction(
             self.status, self.mask, Status.TIMEOUT, OperatorMode.LOWER
         )
@@ -254,12 +1217,426 @@ class Pool(TimeoutComm):
         for i in self.mask:
             assert isinstance(i, Status), f"{type(i)=}"
 
+    def _bcast_mask(self, timeout):
+        """
+        Share the root's mask with all ranks that are still alive -- waiting
+        for up to `timeout` seconds
+        """
+        # ranks that are leaving the pool don't need the mask -- but they still
+        # need to use up the transaction's tag
+        if not self.is_root and Status.is_dead(self.status):
+            self.next_tag()
+            return
+
+        recvbuf = [None]
+        self._exec_bcast_transaction(
+            bytes([i.value for i in self.mask]), recvbuf, None, OperatorMode.LOWER,
+            timeout=timeout
+        )
+        if recvbuf[0] is None:
+            LOGGER.info("Mask could not be sync'ed, it is stale", comm=self)
+            self._mask_stale = True
+            return
+        self._mask = [Status(i) for i in recvbuf[0]]
+        self._mask_stale = False
+
+    def _board_sync_mask(self):
+        """
+        Post this rank's status to the status board -- the heartbeat counts the
+        sync_mask calls of every rank. The root reads the board: ranks get
+        their posted status, unless they fell more than one sync_mask behind
+        the root, in which case they are marked as timed out. If `share_mask`
+        is set, the root publishes its mask to the board, and the other ranks
+        read the latest published mask (which can be from the root's previous
+        sync_mask).
+        """
+        self._board.post(self.status.value)
+        if not self.is_root:
+            if self.share_mask:
+                self._mask = [Status(i) for i in self._board.mask()]
+                self._mask_stale = False
+            return
+
+        statuses, heartbeats = self._board.read()
+        for i in range(self.size):
+            if Status.is_dead(self.mask[i]):
+                continue
+            if heartbeats[i] < self._board.heartbeat - 1:
+                if __debug__ and self._debug:
+                    LOGGER.debug(f"Missed heartbeats of {i=}", comm=self)
+                self.mask[i] = Status.TIMEOUT
+            elif heartbeats[i] > 0:
+                self.mask[i] = Status(statuses[i])
+        if self.share_mask:
+            self._board.publish([i.value for i in self.mask])
+
+    def _node_gather(self, data, failover):
+        """
+        Node-aware gather: leaders gather from their node, and the root gathers
+        from the leaders. If a leader times out, all its node's ranks are
+        assigned the `failover` value.
+        """
+        recvbuf = [failover for i in range(self.size)]
+        node_data = self._node_pool.gather(data, failover)
+        if not self.is_leader:
+            return recvbuf
+
+        all_node_data = self._leader_pool.gather(node_data, None)
+        if not self.is_root:
+            return recvbuf
+
+        for node_ranks, node_data in zip(self._all_node_ranks, all_node_data):
+            if node_data is None:
+                continue
+            for i, d in zip(node_ranks, node_data):
+                recvbuf[i] = d
+        return recvbuf
+
+    def _node_bcast(self, obj, failover):
+        """
+        Node-aware bcast: the root sends to the leaders, the leaders relay to
+        their node. Ranks wait for as long as their leader does.
+        """
+        # sub-pools number ranks differently => bind factories to this rank
+        if callable(failover):
+            factory, rank = failover, self.rank
+            failover = lambda i: factory(rank)
+        if self.is_leader:
+            obj = self._leader_pool.bcast(obj, failover)
+        recvbuf = [failover]
+        self._node_pool._exec_bcast_transaction(
+            obj, recvbuf, failover, OperatorMode.LOWER,
+            timeout=2*self.timeout
+        )
+        return recvbuf[0]
+
+    def _node_barrier(self):
+        """
+        Node-aware barrier: barrier within the node, then between leaders, then
+        within the node again. Missing leaders are reported as their entire
+        node.
+        """
+        self._node_pool.Barrier()
+        missed = [self._node_ranks[i] for i in self._node_pool.barrier_missed]
+        if self.is_leader:
+            self._leader_pool.Barrier()
+            for i in self._leader_pool.barrier_missed:
+                missed += self._all_node_ranks[i]
+        self._node_pool.Barrier()
+        missed += [self._node_ranks[i] for i in self._node_pool.barrier_missed]
+        self._state.barrier_missed = sorted(set(missed))
+
+    def _node_sync_mask(self):
+        """
+        Node-aware sync_mask: leaders gather the status of their node, and the
+        root gathers the node masks from the leaders. A leader is alive as long
+        as any rank on its node is -- if a leader times out, all ranks on its
+        node are marked as timed out. The root then shares the leader mask
+        with the leaders, and leaders share their node mask with their node.
+        """
+        self._node_pool._gather_mask()
+        if self.is_leader:
+            self._sync_leader_mask()
+        self._node_pool._bcast_mask(self._node_sync_timeout)
+
+    @property
+    def _node_sync_timeout(self):
+        """
+        Upper bound on how long a node-aware sync_mask keeps the root busy: a
+        timeout for the node gather, and two for the gather of node masks (the
+        leader pool's timeout). As in sync_mask, one extra timeout is allowed
+        for ranks that enter at different times.
+        """
+        return 4*self.timeout
+
+    def _sync_leader_mask(self):
+        """
+        Gather node masks at the root, assemble the mask of all ranks, and share
+        the leader mask with all leaders
+        """
+        if all(Status.is_dead(i) for i in self._node_pool.mask):
+            self._leader_pool.drop()
+        else:
+            self._leader_pool.ready()
+
+        node_mask = bytes([i.value for i in self._node_pool.mask])
+        all_node_masks = self._leader_pool.gather(node_mask, None)
+
+        if self.is_root:
+            leader_mask = self._leader_pool.mask
+            for j, node_mask in enumerate(all_node_masks):
+                # dead leaders were not asked => keep their node as it is
+                if Status.is_dead(leader_mask[j]):
+                    continue
+                node_ranks = self._all_node_ranks[j]
+                if node_mask is None:
+                    leader_mask[j] = Status.TIMEOUT
+                    for i in node_ranks:
+                        if not Status.is_dead(self.mask[i]):
+                            self.mask[i] = Status.TIMEOUT
+                    continue
+                for i, status in zip(node_ranks, node_mask):
+                    self.mask[i] = Status(status)
+                if all(Status.is_dead(self.mask[i]) for i in node_ranks):
+                    leader_mask[j] = Status.DONE
+                else:
+                    leader_mask[j] = Status.READY
+
+        self._leader_pool._bcast_mask(self._node_sync_timeout)
+
+    def stats(self):
+        """
+        Snapshot of this rank's metrics (see `Metrics.snapshot`), and of the
+        counters of the store of rejected messages (under "rejected") -- empty
+        if the pool was created without `metrics`. In node-aware mode, the
+        snapshots of the node and leader pools are under "node" and "leader".
+        """
+        if self._metrics is None:
+            return dict()
+        stats = self._metrics.snapshot()
+        stats["rejected"] = self.rejected.stats()
+        if self.is_hierarchical:
+            stats["node"] = self._node_pool.stats()
+        if self.is_leader:
+            stats["leader"] = self._leader_pool.stats()
+        return stats
+
+    def stragglers(self):
+        """
+        Ranks that persistently respond slower than the rest (as seen by this
+        rank, see `StragglerDetector`) -- only the root waits for all ranks.
+        In node-aware mode, these are the stragglers of this rank's node, and
+        the leaders of nodes that are stragglers in the leader pool.
+        """
+        if self._stragglers is None:
+            return list()
+        if not self.is_hierarchical:
+            return self._stragglers.stragglers()
+
+        stragglers = [self._node_ranks[i] for i in self._node_pool.stragglers()]
+        if self.is_leader:
+            for j in self._leader_pool.stragglers():
+                stragglers.append(self._all_node_ranks[j][0])
+        return sorted(set(stragglers))
+
+    def demote(self, ranks, timeout=None):
+        """
+        Demote (e.g. straggling) `ranks` on the root: if `timeout` is None,
+        they are excluded from the pool (marked as timed out -- for good).
+        Otherwise, the root waits for no more than `timeout` for their
+        gather responses. Their response times are reset.
+        """
+        assert not self.is_hierarchical, "demote is not node-aware"
+        for i in ranks:
+            if i == self.root:
+                continue
+            if timeout is None:
+                LOGGER.info("Excluding rank %s", i, comm=self)
+                self.mask[i] = Status.TIMEOUT
+                self._rank_timeouts.pop(i, None)
+            else:
+                self._rank_timeouts[i] = timeout
+        if self._stragglers is not None:
+            self._stragglers.reset(ranks)
+
+    def promote(self, ranks):
+        """
+        Restore the gather timeout of demoted `ranks` (excluded ranks stay
+        excluded)
+        """
+        for i in ranks:
+            self._rank_timeouts.pop(i, None)
+
+    @property
+    def demoted(self):
+        """
+        Shortened gather timeouts of demoted ranks: {rank: timeout}
+        """
+        return dict(self._rank_timeouts)
+
+    def checkpoint(self, file_name, results=None, sync=False):
+        """
+        Append the root's mask, the transaction counter, and (picklable)
+        `results` to the checkpoint file `file_name` (see `write_checkpoint`) -- only
+        the root writes. This is not a transaction: other ranks return right
+        away. If `sync` is set, the checkpoint is flushed to disk.
+        """
+        if not self.is_root:
+            return
+        mask = bytes([i.value for i in self.mask])
+        write_checkpoint(file_name, self._txn_ct, mask, results, sync=sync)
+
+    def restore(self, file_name):
+        """
+        Restore the latest checkpoint in `file_name` (read by the root): the
+        root shares the transaction counter and mask with all ranks (in one
+        bcast). Ranks that were done are marked as done (`status`), ranks that
+        had timed out get another chance. Returns the checkpoint's results on
+        the root (None on other ranks, or if there is no checkpoint). Ranks
+        that miss the bcast keep their state.
+        """
+        state = None
+        if self.is_root:
+            state = read_checkpoint(file_name)
+        info = None if state is None else state[:2]
+        info = self.bcast(info)
+        if info is None:
+            if self.is_root and state is not None:
+                LOGGER.info("Could not share checkpoint", comm=self)
+            return None
+
+        txn_ct, mask = info
+        self._txn_ct = max(self._txn_ct, txn_ct)
+        restored = [Status(i) for i in mask]
+        # reset timeouts: these ranks might be back
+        restored = [
+            Status.UNINIT if i is Status.TIMEOUT else i for i in restored
+        ]
+        if self.is_root or self.share_mask:
+            self._mask = restored
+        if restored[self.rank] is Status.DONE:
+            self._status = Status.DONE
+        LOGGER.info("Restored checkpoint at transaction %s", txn_ct, comm=self)
+        return state[2] if self.is_root else None
+
+    def split(self, color, key=0, root=0, timeout=None, n_tries=None, **kwargs):
+        """
+        Split the pool into independent child pools (one per `color`, ranks
+        ordered by `key`, see `MPI.Comm.Split`), each with its own `root`
+        (rank in the child pool), transaction counter, mask, and timeouts
+        (`timeout` and `n_tries` default to this pool's). Other arguments are
+        passed to the child pools. Returns None on ranks with color
+        MPI.UNDEFINED. Like creating a pool, this is collective over all
+        ranks of this pool's communicator. Children start out ready if this
+        pool is ready.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        if n_tries is None:
+            n_tries = self.n_tries
+
+        comm = self.comm.Split(color, key=key)
+        child = None
+        ranks = None
+        if comm != MPI.COMM_NULL:
+            child = Pool(comm, root, timeout, n_tries, **kwargs)
+            # the child owns its communicator
+            child._derived_comms.append(comm)
+            ranks = comm.allgather(self.rank)
+            self._children.append(child)
+            if self.status is Status.READY:
+                child.ready()
+
+        # tell this pool's root about the groups (see `report_groups`)
+        is_child_root = child is not None and child.is_root
+        groups = self.comm.allgather(ranks if is_child_root else None)
+        self._groups = {i[root]: i for i in groups if i is not None}
+
+        LOGGER.debug("Split pool into %s groups", len(self._groups), comm=self)
+        return child
+
+    def create_group(self, ranks, root=0, timeout=None, n_tries=None, **kwargs):
+        """
+        Child pool of `ranks` (ordered as listed, `root` is the rank in the
+        child pool) -- see `split`. Returns None on ranks that aren't in
+        `ranks`. Collective over all ranks of this pool's communicator.
+        """
+        ranks = list(ranks)
+        if self.rank in ranks:
+            color, key = 0, ranks.index(self.rank)
+        else:
+            color, key = MPI.UNDEFINED, 0
+        return self.split(
+            color, key=key, root=root, timeout=timeout, n_tries=n_tries, **kwargs
+        )
+
+    @property
+    def groups(self):
+        """
+        Groups of the latest `split`: {root of the child: ranks of the child}
+        (in this pool's ranks)
+        """
+        return self._groups
+
+    def report_groups(self, child):
+        """
+        Report the masks of the child pools of the latest `split` to this
+        pool's root (`child` is this rank's child pool, or None): the root of
+        every child sends its mask, and the root updates the status of the
+        child's ranks in its own mask (ranks that are dead in this pool stay
+        dead). This is lossy: if a child's root does not report in time, only
+        the child's root is marked as timed out. Only the roots of the
+        children talk to this pool's root, but all ranks have to take part
+        (they use up the transaction's tag).
+        """
+        tag = self.next_tag();
+
+        if __debug__ and self._debug:
+            LOGGER.debug(f"Reporting groups, {tag=}", comm=self)
+        is_child_root = child is not None and child.is_root
+        report = None
+        if is_child_root:
+            report = bytes([i.value for i in child.mask])
+
+        if self.is_root:
+            for j in self._groups:
+                if j == self.rank or Status.is_dead(self.mask[j]):
+                    continue
+                self.push_req(j, self.comm.irecv(source=j, tag=tag), tag=tag)
+        elif is_child_root:
+            self.push_req(
+                0, self.comm.isend(report, dest=self.root, tag=tag), tag=tag
+            )
+        self.safe_collect_deferred_req(Signal.TIMEOUT, tag=tag)
+        if not self.is_root:
+            return
+
+        reports = dict(self.deferred_msg)
+        if is_child_root:
+            reports[self.rank] = report
+        for j, ranks in self._groups.items():
+            if Status.is_dead(self.mask[j]):
+                continue
+            report = reports.get(j, Signal.TIMEOUT)
+            if report is Signal.TIMEOUT:
+                self.mask[j] = Status.TIMEOUT
+                continue
+            for i, status in zip(ranks, report):
+                status = Status(status)
+                if status is Status.UNINIT or Status.is_dead(self.mask[i]):
+                    continue
+                self.mask[i] = status
+
+    def free(self):
+        """
+        Free all communicators (and windows) derived from this pool's
+        communicator -- the pool can't be used afterwards. Child pools (see
+        `split`) are freed as well.
+        """
+        for child in self._children:
+            child.free()
+        self._children = list()
+        if self.is_hierarchical:
+            self._node_pool.free()
+        if self.is_leader:
+            self._leader_pool.free()
+        if self._shm is not None:
+            self._shm.free()
+            self._shm = None
+        if self._board is not None:
+            self._board.free()
+            self._board = None
+        for comm in self._derived_comms:
+            comm.Free()
+        self._derived_comms = list()
+
     @property
     def done(self):
         """
         Drop the current rank for the pool
         """
-        LOGGER.debug("Dropping this rank from pool", comm=self)
+        if __debug__ and self._debug:
+            LOGGER.debug("Dropping this rank from pool", comm=self)
         if not self.is_root:
             return False
 
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# numpy is optional (only needed by GatherResult)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class GatherResult(object):
+    def __init__(self, data, valid):
+        """
+        Result of `Pool.gather(..., result=True)`: `data` is the usual list of
+        payloads (with the failover value for ranks that did not respond), and
+        `valid` marks the ranks that did respond. Reductions over the valid
+        payloads run in numpy -- if they are homogeneous, they are stacked into
+        one contiguous array (`values`).
+        """
+        if np is None:
+            raise RuntimeError("GatherResult requires numpy")
+        self._data = data
+        self._valid = np.array(valid, dtype=bool)
+        self._ranks = np.flatnonzero(self._valid)
+        self._values = None
+        self._stacked = False
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getitem__(self, idx):
+        return self._data[idx]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    @property
+    def data(self):
+        return self._data
+
+    @property
+    def valid(self):
+        """
+        Validity mask (one bool per rank)
+        """
+        return self._valid
+
+    @property
+    def ranks(self):
+        """
+        Ranks that responded
+        """
+        return self._ranks
+
+    @property
+    def values(self):
+        """
+        Valid payloads stacked into one array (first axis: `ranks`) -- None if
+        they are not homogeneous (or if there are none)
+        """
+        if not self._stacked:
+            self._stacked = True
+            self._values = self._stack()
+        return self._values
+
+    def _stack(self):
+        if len(self._ranks) == 0:
+            return None
+        data = self._data
+        try:
+            values = np.stack([np.asarray(data[i]) for i in self._ranks])
+        except ValueError:
+            return None
+        if values.dtype == object:
+            return None
+        return values
+
+    def _require_values(self):
+        values = self.values
+        if values is None and len(self._ranks) > 0:
+            raise ValueError("Payloads are not homogeneous")
+        return values
+
+    def count(self):
+        """
+        Number of ranks that responded
+        """
+        return len(self._ranks)
+
+    def sum(self):
+        """
+        Sum over the valid payloads (None if there are none)
+        """
+        values = self._require_values()
+        return None if values is None else values.sum(axis=0)
+
+    def mean(self):
+        """
+        Mean of the valid payloads (None if there are none)
+        """
+        values = self._require_values()
+        return None if values is None else values.mean(axis=0)
+
+    def argmax(self):
+        """
+        Rank with the largest valid payload (elementwise for array payloads)
+        -- None if there are none
+        """
+        values = self._require_values()
+        if values is None:
+            return None
+        return self._ranks[values.argmax(axis=0)]
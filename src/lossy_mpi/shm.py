@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from mpi4py import MPI
+
+from . import getLogger
+
+LOGGER = getLogger(__name__)
+
+# flag value of a slot that is empty, or that is being written to
+EMPTY = -1
+
+
+class SharedWindow(object):
+    def __init__(self, comm, slot_nbytes):
+        """
+        Shared memory window with one slot (of `slot_nbytes` bytes) per rank
+        of `comm` -- all ranks of `comm` need to share a node. Every slot is
+        double-buffered by the parity of the transaction tag, so a writer can
+        start the next transaction while a reader is still copying the last
+        one. Each buffer is guarded by a flag, which is set to the transaction
+        tag once the data has been written (seqlock style: readers check the
+        flag before and after copying the data).
+        """
+        self._comm = comm
+        self._size = comm.Get_size()
+        self._slot_nbytes = slot_nbytes
+
+        # rank 0 allocates the whole window: flags first, then the buffers
+        n_buf = 2*self._size
+        flag_nbytes = 8*n_buf
+        nbytes = 0
+        if comm.Get_rank() == 0:
+            nbytes = flag_nbytes + slot_nbytes*n_buf
+        self._win = MPI.Win.Allocate_shared(nbytes, 1, comm=comm)
+        buf, _ = self._win.Shared_query(0)
+        mem = memoryview(buf)
+
+        self._flags = mem[:flag_nbytes].cast("q")
+        self._bufs = [
+            mem[flag_nbytes + i*slot_nbytes:flag_nbytes + (i + 1)*slot_nbytes]
+            for i in range(n_buf)
+        ]
+
+        # passive target epoch for the lifetime of the window
+        self._win.Lock_all()
+        if comm.Get_rank() == 0:
+            for i in range(n_buf):
+                self._flags[i] = EMPTY
+        self._win.Sync()
+        comm.Barrier()
+
+        LOGGER.debug(
+            "Initialized shared window with slot_nbytes=%s", slot_nbytes, comm=comm
+        )
+
+    @property
+    def comm(self):
+        return self._comm
+
+    @property
+    def slot_nbytes(self):
+        return self._slot_nbytes
+
+    def fits(self, buf):
+        """
+        True if `buf` fits into a slot
+        """
+        return memoryview(buf).nbytes <= self._slot_nbytes
+
+    def put(self, slot, buf, tag):
+        """
+        Write `buf` into `slot`, and mark it as belonging to transaction `tag`
+        """
+        idx = 2*slot + tag % 2
+        src = memoryview(buf).cast("B")
+        self._flags[idx] = EMPTY
+        self._win.Sync()
+        self._bufs[idx][:src.nbytes] = src
+        self._win.Sync()
+        self._flags[idx] = tag
+        self._win.Sync()
+
+    def poll(self, slot, tag):
+        """
+        True if `slot` holds the data of transaction `tag`
+        """
+        self._win.Sync()
+        return self._flags[2*slot + tag % 2] == tag
+
+    def get(self, slot, buf, tag):
+        """
+        Copy the data in `slot` into `buf` -- returns False if the slot does
+        not (or no longer) hold the data of transaction `tag`
+        """
+        if not self.poll(slot, tag):
+            return False
+        dst = memoryview(buf).cast("B")
+        dst[:] = self._bufs[2*slot + tag % 2][:dst.nbytes]
+        return self.poll(slot, tag)
+
+    def view(self, slot, tag, nbytes):
+        """
+        Zero-copy (read-only) view of the first `nbytes` of the data in `slot`
+        for transaction `tag` -- only valid until the slot is written to with
+        a tag of the same parity
+        """
+        return self._bufs[2*slot + tag % 2][:nbytes].toreadonly()
+
+    def free(self):
+        self._win.Unlock_all()
+        self._win.Free()
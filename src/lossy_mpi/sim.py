@@ -0,0 +1,455 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+from bisect import insort
+from collections import defaultdict
+from heapq import heappop, heappush
+from itertools import count
+from pickle import dumps, loads, HIGHEST_PROTOCOL
+from random import Random
+
+from mpi4py import MPI
+
+from . import getLogger
+
+LOGGER = getLogger(__name__)
+
+
+class RankCrashed(Exception):
+    """
+    Raised inside a simulated rank when it crashes
+    """
+
+
+class SimulationAborted(Exception):
+    """
+    Raised inside simulated ranks that are still running when the simulation
+    is aborted (deadlock, or `max_time` exceeded)
+    """
+
+
+class _Message(object):
+    def __init__(self, seq, source, tag, payload, deliver_time, send_req):
+        self.seq = seq
+        self.source = source
+        self.tag = tag
+        self.payload = payload
+        self.deliver_time = deliver_time
+        self.send_req = send_req
+
+    def __lt__(self, other):
+        return (self.deliver_time, self.seq) < (other.deliver_time, other.seq)
+
+
+class _Request(object):
+    def __init__(self, sim, comm):
+        self._sim = sim
+        self._comm = comm
+        self.done = False
+        self.cancelled = False
+
+    def _progress(self):
+        pass
+
+    def _fill_status(self, status):
+        if status is not None:
+            status.Set_source(MPI.ANY_SOURCE)
+            status.Set_tag(MPI.ANY_TAG)
+            status.Set_elements(MPI.BYTE, 0)
+            status.Set_cancelled(self.cancelled)
+
+    def _result(self):
+        return None
+
+    def test(self, status=None):
+        self._comm._check_crash()
+        self._progress()
+        if not self.done:
+            return False, None
+        self._fill_status(status)
+        return True, self._result()
+
+    def Test(self, status=None):
+        flag, _ = self.test(status)
+        return flag
+
+    def Wait(self, status=None):
+        while True:
+            flag, msg = self.test(status)
+            if flag:
+                return msg
+            self._comm.sleep(self._sim.poll_interval)
+
+    def wait(self, status=None):
+        return self.Wait(status)
+
+    def Cancel(self):
+        pass
+
+
+class _SendRequest(_Request):
+    def __init__(self, sim, comm, eager):
+        super().__init__(sim, comm)
+        # eager sends complete right away, others once they are received
+        self.done = eager
+        self.queue = None
+
+    def _progress(self):
+        if not self.done and self.queue is not None:
+            self._sim._match(self.queue)
+
+
+class _RecvRequest(_Request):
+    def __init__(self, sim, comm, source, tag, buf):
+        super().__init__(sim, comm)
+        self.source = source
+        self.tag = tag
+        self.buf = buf
+        self.msg = None
+        self.queue = (comm._context, comm._world[comm.Get_rank()], source)
+
+    def _progress(self):
+        if not self.done:
+            self._sim._match(self.queue)
+
+    def deliver(self, msg):
+        self.msg = msg
+        self.done = True
+        if self.buf is not None:
+            mem = memoryview(self.buf).cast("B")
+            if len(msg.payload) > mem.nbytes:
+                raise RuntimeError(
+                    f"Message truncated: {len(msg.payload)=} > {mem.nbytes=}"
+                )
+            mem[:len(msg.payload)] = msg.payload
+
+    def _fill_status(self, status):
+        if status is None:
+            return
+        if self.cancelled:
+            super()._fill_status(status)
+            return
+        status.Set_source(self._comm._group_rank(self.msg.source))
+        status.Set_tag(self.msg.tag)
+        status.Set_elements(MPI.BYTE, len(self.msg.payload))
+        status.Set_cancelled(False)
+
+    def _result(self):
+        if self.cancelled or self.buf is not None:
+            return None
+        return loads(self.msg.payload)
+
+    def Cancel(self):
+        if not self.done:
+            self._sim._posted[self.queue].remove(self)
+            self.cancelled = True
+            self.done = True
+
+
+class SimComm(object):
+    def __init__(self, sim, context, world, rank):
+        """
+        Simulated communicator: a group of simulated ranks (`world` lists
+        their ranks in the simulator), as seen by `rank`
+        """
+        self._sim = sim
+        self._context = context
+        self._world = world
+        self._rank = rank
+        self._group = {j: i for i, j in enumerate(world)}
+        self._coll_ct = 0
+
+    def Get_size(self):
+        return len(self._world)
+
+    def Get_rank(self):
+        return self._rank
+
+    @property
+    def size(self):
+        return len(self._world)
+
+    @property
+    def rank(self):
+        return self._rank
+
+    def _group_rank(self, world_rank):
+        return self._group[world_rank]
+
+    def _check_crash(self):
+        self._sim._check_crash(self._world[self._rank])
+
+    # virtual clock (used by TimeoutComm in place of time.sleep/monotonic) -----
+    def sleep(self, seconds):
+        self._sim._yield(self._world[self._rank], self._sim.now + seconds)
+
+    def monotonic(self):
+        return self._sim.now
+
+    # point-to-point -----------------------------------------------------------
+    def _send(self, payload, dest, tag):
+        self._check_crash()
+        sim = self._sim
+        source = self._world[self._rank]
+        dest = self._world[dest]
+        req = _SendRequest(sim, self, len(payload) <= sim.eager_nbytes)
+        sim._post_message(self._context, source, dest, tag, payload, req)
+        return req
+
+    def isend(self, obj, dest, tag=0):
+        return self._send(dumps(obj, protocol=HIGHEST_PROTOCOL), dest, tag)
+
+    def Isend(self, buf, dest, tag=0):
+        return self._send(bytes(memoryview(buf).cast("B")), dest, tag)
+
+    def _recv(self, buf, source, tag):
+        self._check_crash()
+        if source == MPI.ANY_SOURCE:
+            raise NotImplementedError("Simulated receives need a source")
+        req = _RecvRequest(self._sim, self, self._world[source], tag, buf)
+        self._sim._posted[req.queue].append(req)
+        return req
+
+    def irecv(self, buf=None, source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG):
+        return self._recv(None, source, tag)
+
+    def Irecv(self, buf, source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG):
+        return self._recv(buf, source, tag)
+
+    # collectives (blocking, only used to set up pools) ------------------------
+    def _exchange(self, value):
+        """
+        Exchange `value` with all ranks of the communicator
+        """
+        self._check_crash()
+        key = (self._context, self._coll_ct)
+        self._coll_ct += 1
+        return self._sim._exchange(key, self._world, self._rank, value)
+
+    def allgather(self, obj):
+        return self._exchange(obj)
+
+    def Barrier(self):
+        self._exchange(None)
+
+    def barrier(self):
+        self._exchange(None)
+
+    def Split(self, color=0, key=0):
+        coll_key = (self._context, self._coll_ct)
+        values = self._exchange((color, key))
+        if color == MPI.UNDEFINED:
+            return MPI.COMM_NULL
+        members = sorted(
+            (k, i) for i, (c, k) in enumerate(values) if c == color
+        )
+        world = [self._world[i] for _, i in members]
+        rank = [i for _, i in members].index(self._rank)
+        context = self._sim._context_for((coll_key, color))
+        return SimComm(self._sim, context, world, rank)
+
+    def Free(self):
+        pass
+
+
+class Simulator(object):
+    def __init__(self, size, latency=0.0, drop=0.0, crash=None,
+                 eager_nbytes=1 << 12, poll_interval=1e-3, seed=0,
+                 max_time=None):
+        """
+        In-process simulation of `size` MPI ranks: each rank runs in its own
+        thread, but only one rank runs at a time (so runs are deterministic),
+        and time is virtual -- sleeping advances a rank's clock without
+        taking any real time. Faults:
+            `latency`: seconds, or a function (source, dest, nbytes) ->
+                       seconds
+            `drop`: probability, or a function (source, dest, tag) -> bool
+            `crash`: {rank: virtual time at which the rank crashes}
+        Messages of up to `eager_nbytes` complete on the sender right away,
+        larger ones once they are received. Randomness comes from `seed`.
+        """
+        self._size = size
+        self._latency = latency
+        self._drop = drop
+        self._crash = dict() if crash is None else dict(crash)
+        self.eager_nbytes = eager_nbytes
+        self.poll_interval = poll_interval
+        self._max_time = max_time
+        self._random = Random(seed)
+
+        self.now = 0.0
+        self._heap = list()
+        self._seq = count()
+        self._contexts = count(1)
+        self._split_contexts = dict()
+
+        # {(context, dest, source): messages ordered by delivery time}
+        self._mailbox = defaultdict(list)
+        # {(context, dest, source): receives in the order they were posted}
+        self._posted = defaultdict(list)
+        # {(context, source, dest): delivery time of the last message}
+        self._channel_time = dict()
+        # {(context, collective count): {rank: value}}
+        self._collectives = dict()
+        self._waiting = defaultdict(list)
+
+        self._events = [threading.Event() for i in range(size)]
+        self._switch = threading.Event()
+        self._finished = set()
+        self._abort = False
+        self.crashed = set()
+
+    @property
+    def size(self):
+        return self._size
+
+    # scheduling ---------------------------------------------------------------
+    def _push(self, time, rank):
+        heappush(self._heap, (time, next(self._seq), rank))
+
+    def _yield(self, rank, wake):
+        """
+        Hand control back to the scheduler -- the rank resumes at virtual time
+        `wake` (or when it is woken up, if `wake` is None)
+        """
+        if wake is not None:
+            self._push(wake, rank)
+        self._events[rank].clear()
+        self._switch.set()
+        self._events[rank].wait()
+        if self._abort:
+            raise SimulationAborted()
+        self._check_crash(rank)
+
+    def _check_crash(self, rank):
+        if rank in self._crash and self.now >= self._crash[rank]:
+            raise RankCrashed(f"{rank=} crashed at {self.now=}")
+
+    def _run_rank(self, rank, target, results, errors):
+        self._events[rank].wait()
+        try:
+            if self._abort:
+                raise SimulationAborted()
+            results[rank] = target(SimComm(self, 0, list(range(self._size)), rank))
+        except RankCrashed:
+            self.crashed.add(rank)
+        except SimulationAborted:
+            pass
+        except BaseException as e:
+            errors[rank] = e
+        finally:
+            self._finished.add(rank)
+            self._switch.set()
+
+    def run(self, target):
+        """
+        Run `target(comm)` on all simulated ranks -- returns the list of
+        their results (None for ranks that crashed)
+        """
+        results = [None for i in range(self._size)]
+        errors = dict()
+        for i in range(self._size):
+            self._push(0.0, i)
+        for rank, time in self._crash.items():
+            self._push(time, rank)
+
+        stack_size = threading.stack_size(1 << 19)
+        threads = [
+            threading.Thread(
+                target=self._run_rank, args=(i, target, results, errors),
+                daemon=True
+            )
+            for i in range(self._size)
+        ]
+        for t in threads:
+            t.start()
+        threading.stack_size(stack_size)
+
+        reason = None
+        while len(self._finished) < self._size:
+            if len(self._heap) == 0:
+                reason = "deadlock: all remaining ranks are blocked"
+                break
+            time, _, rank = heappop(self._heap)
+            if rank in self._finished:
+                continue
+            if self._max_time is not None and time > self._max_time:
+                reason = f"exceeded {self._max_time=}"
+                break
+            self.now = max(self.now, time)
+            self._switch.clear()
+            self._events[rank].set()
+            self._switch.wait()
+
+        if reason is not None:
+            self._abort = True
+            for ev in self._events:
+                ev.set()
+        for t in threads:
+            t.join()
+
+        if len(errors) > 0:
+            raise errors[min(errors)]
+        if reason is not None:
+            raise RuntimeError(f"Simulation aborted, {reason}")
+        return results
+
+    # messages -----------------------------------------------------------------
+    def _post_message(self, context, source, dest, tag, payload, req):
+        if callable(self._drop):
+            dropped = self._drop(source, dest, tag)
+        else:
+            dropped = self._drop > 0 and self._random.random() < self._drop
+        if dropped:
+            LOGGER.debug(f"Dropping message {source=} {dest=} {tag=}")
+            req.done = True
+            return
+
+        if callable(self._latency):
+            latency = self._latency(source, dest, len(payload))
+        else:
+            latency = self._latency
+        # messages between a pair of ranks don't overtake each other
+        channel = (context, source, dest)
+        deliver_time = max(self.now + latency, self._channel_time.get(channel, 0))
+        self._channel_time[channel] = deliver_time
+
+        queue = (context, dest, source)
+        req.queue = queue
+        msg = _Message(next(self._seq), source, tag, payload, deliver_time, req)
+        insort(self._mailbox[queue], msg)
+
+    def _match(self, queue):
+        """
+        Match posted receives with delivered messages (both in order)
+        """
+        posted = self._posted[queue]
+        mailbox = self._mailbox[queue]
+        for req in list(posted):
+            for msg in mailbox:
+                if msg.deliver_time > self.now:
+                    break
+                if req.tag == MPI.ANY_TAG or req.tag == msg.tag:
+                    mailbox.remove(msg)
+                    posted.remove(req)
+                    req.deliver(msg)
+                    msg.send_req.done = True
+                    break
+
+    # collectives --------------------------------------------------------------
+    def _exchange(self, key, world, rank, value):
+        entry = self._collectives.setdefault(key, dict())
+        entry[rank] = value
+        if len(entry) < len(world):
+            self._waiting[key].append(world[rank])
+            self._yield(world[rank], None)
+        else:
+            for i in self._waiting.pop(key, list()):
+                self._push(self.now, i)
+        return [entry[i] for i in range(len(world))]
+
+    def _context_for(self, key):
+        if key not in self._split_contexts:
+            self._split_contexts[key] = next(self._contexts)
+        return self._split_contexts[key]
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import mmap
+from os import fspath, ftruncate, makedirs, path
+
+from . import getLogger
+
+# numpy is optional (only needed by ResultSink)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+LOGGER = getLogger(__name__)
+
+# a sink is a directory of column files, with one record per transaction:
+# data (`size` rows of `shape` and `dtype`), valid (one byte per rank), and
+# tags (transaction IDs, int64). Tags are appended last, so they count the
+# complete records.
+META = "meta.json"
+DATA = "data.bin"
+VALID = "valid.bin"
+TAGS = "tags.bin"
+VERSION = 1
+
+
+def _read_meta(directory):
+    with open(path.join(directory, META)) as f:
+        meta = json.load(f)
+    if meta["version"] != VERSION:
+        raise ValueError(f"Unsupported sink version: {meta['version']}")
+    return meta["size"], tuple(meta["shape"]), np.dtype(meta["dtype"])
+
+
+def _n_records(directory, size, record_nbytes):
+    # records whose tag (and therefore their data and mask) is complete
+    n = path.getsize(path.join(directory, TAGS))//8
+    n = min(n, path.getsize(path.join(directory, VALID))//size)
+    return min(n, path.getsize(path.join(directory, DATA))//record_nbytes)
+
+
+class ResultSink(object):
+    def __init__(self, directory, size, shape=(), dtype="float64", window=64):
+        """
+        Root-side sink for `Pool.Gather`: the data of every transaction is
+        gathered straight into a memory-mapped, append-only file in
+        `directory` (`next` returns the receive buffer), and `commit` appends
+        the transaction's tag and validity mask. Only a window of `window`
+        records is mapped at a time, so the root's memory stays flat. If
+        `directory` holds a sink already, records are appended to it. Use
+        `load` to read the results (without copying them).
+        """
+        if np is None:
+            raise RuntimeError("ResultSink requires numpy")
+        self._directory = fspath(directory)
+        self._size = size
+        self._shape = tuple(shape)
+        self._dtype = np.dtype(dtype)
+        self._window = window
+        self._count = int(np.prod(self._shape, dtype=np.int64))*size
+        self._record_nbytes = self._count*self._dtype.itemsize
+
+        makedirs(self._directory, exist_ok=True)
+        self._n_records = 0
+        if path.exists(path.join(self._directory, META)):
+            meta = _read_meta(self._directory)
+            if meta != (size, self._shape, self._dtype):
+                raise ValueError(f"Sink in {self._directory} holds {meta}")
+            self._n_records = _n_records(
+                self._directory, size, self._record_nbytes
+            )
+        else:
+            with open(path.join(self._directory, META), "w") as f:
+                json.dump({
+                    "version": VERSION, "size": size, "shape": self._shape,
+                    "dtype": self._dtype.str
+                }, f)
+
+        self._data = open(path.join(self._directory, DATA), "a+b")
+        self._valid = open(path.join(self._directory, VALID), "a+b")
+        self._tags = open(path.join(self._directory, TAGS), "a+b")
+        # drop incomplete records (e.g. if the job died while committing)
+        self._valid.truncate(self._n_records*size)
+        self._tags.truncate(self._n_records*8)
+
+        # mapped window: records [_map_start, _map_start + window)
+        self._mmap = None
+        self._map_start = 0
+        self._map_offset = 0
+        self._recvbuf = None
+
+        LOGGER.debug(
+            "Opened result sink in %s with %s records",
+            self._directory, self._n_records
+        )
+
+    def __len__(self):
+        return self._n_records
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def size(self):
+        return self._size
+
+    def _map(self, record):
+        self._unmap()
+        start = record*self._record_nbytes
+        # mmap offsets have to be multiples of the allocation granularity
+        offset = start - start % mmap.ALLOCATIONGRANULARITY
+        stop = (record + self._window)*self._record_nbytes
+        fd = self._data.fileno()
+        if path.getsize(self._data.name) < stop:
+            ftruncate(fd, stop)
+        self._mmap = mmap.mmap(fd, stop - offset, offset=offset)
+        self._map_start = record
+        self._map_offset = offset
+
+    def _unmap(self):
+        self._recvbuf = None
+        if self._mmap is None:
+            return
+        self._mmap.flush()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # views are still in use -- the mapping is released with them
+            pass
+        self._mmap = None
+
+    def next(self):
+        """
+        Receive buffer (`size` rows) for the next transaction -- to be passed
+        to `Pool.Gather`, and committed afterwards. Buffers are only valid
+        until the window moves on (after `window` records).
+        """
+        record = self._n_records
+        if self._mmap is None or record >= self._map_start + self._window:
+            self._map(record)
+        start = record*self._record_nbytes - self._map_offset
+        self._recvbuf = np.frombuffer(
+            self._mmap, dtype=self._dtype, count=self._count, offset=start
+        ).reshape((self._size,) + self._shape)
+        return self._recvbuf
+
+    def commit(self, pool):
+        """
+        Append the record of the latest `Gather` on `pool` (its transaction ID,
+        and which ranks' data was received) to the sink
+        """
+        assert self._recvbuf is not None, "commit without next"
+        assert pool.is_root, "sinks are only used on the root"
+        valid = bytearray(b"\x01"*self._size)
+        for i in pool.gather_missed:
+            valid[i] = 0
+        self._valid.write(valid)
+        self._tags.write(
+            np.array([pool.transaction_counter - 1], dtype=np.int64).tobytes()
+        )
+        self._n_records += 1
+        self._recvbuf = None
+
+    def flush(self):
+        if self._mmap is not None:
+            self._mmap.flush()
+        self._valid.flush()
+        self._tags.flush()
+
+    def close(self):
+        """
+        Flush the sink, and trim the data file to the committed records
+        """
+        self._unmap()
+        self._valid.flush()
+        self._tags.flush()
+        self._data.truncate(self._n_records*self._record_nbytes)
+        for f in (self._data, self._valid, self._tags):
+            f.close()
+
+
+def load(directory):
+    """
+    Records of the sink in `directory`, mapped read-only: (tags, valid, data),
+    where `valid[t]` marks the ranks whose data was received in record `t`,
+    and `data[t]` holds the data of all ranks
+    """
+    if np is None:
+        raise RuntimeError("load requires numpy")
+    directory = fspath(directory)
+    size, shape, dtype = _read_meta(directory)
+    record_nbytes = int(np.prod(shape, dtype=np.int64))*size*dtype.itemsize
+    n = _n_records(directory, size, record_nbytes)
+    if n == 0:
+        return (
+            np.empty(0, dtype=np.int64), np.empty((0, size), dtype=bool),
+            np.empty((0, size) + shape, dtype=dtype)
+        )
+    tags = np.memmap(
+        path.join(directory, TAGS), dtype=np.int64, mode="r", shape=(n,)
+    )
+    valid = np.memmap(
+        path.join(directory, VALID), dtype=bool, mode="r", shape=(n, size)
+    )
+    data = np.memmap(
+        path.join(directory, DATA), dtype=dtype, mode="r",
+        shape=(n, size) + shape
+    )
+    return tags, valid, data
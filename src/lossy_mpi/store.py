@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from . import getLogger
+
+LOGGER = getLogger(__name__)
+
+
+class MessageStore(object):
+    def __init__(self, capacity=1024, window=None):
+        """
+        Out-of-order messages (i.e. messages that completed a request of a
+        different transaction), indexed by tag and source. At most `capacity`
+        messages are kept: when full, messages with the oldest tag are dropped.
+        If tags wrap around (every `window` transactions, see `TagAllocator`),
+        they are compared modulo the window.
+        """
+        self._capacity = capacity
+        self._window = window
+        # {tag: {source: (idx, message)}}
+        self._tags = dict()
+        self._len = 0
+        # tag of the latest transaction (used to find the oldest tag)
+        self._current = None
+
+        # counters
+        self._stored = 0
+        self._delivered = 0
+        self._evicted = 0
+        self._dropped = 0
+
+    def __len__(self):
+        return self._len
+
+    def __contains__(self, key):
+        tag, source = key
+        return source in self._tags.get(tag, ())
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def stored(self):
+        return self._stored
+
+    @property
+    def delivered(self):
+        return self._delivered
+
+    @property
+    def evicted(self):
+        """
+        Number of messages that were evicted because their tag was stale
+        """
+        return self._evicted
+
+    @property
+    def dropped(self):
+        """
+        Number of messages that were dropped because the store was full
+        """
+        return self._dropped
+
+    def _is_before(self, tag, other):
+        if self._window is None:
+            return tag < other
+        age = (other - tag) % self._window
+        return 0 < age < self._window//2
+
+    def _age(self, tag):
+        # transactions since `tag` (negative for later transactions)
+        age = (self._current - tag) % self._window
+        return age if age < self._window//2 else age - self._window
+
+    def put(self, tag, source, idx, message, current=None):
+        """
+        Store `message` of transaction `tag` from `source` (received by the
+        request with key `idx`). A later message replaces an earlier one with
+        the same tag and source. Messages of transactions before the `current`
+        one are discarded right away (and counted as evicted). Returns True if
+        the message was stored.
+        """
+        if current is not None:
+            self._current = current
+            if self._is_before(tag, current):
+                self._evicted += 1
+                return False
+        if self._capacity <= 0:
+            self._dropped += 1
+            return False
+        messages = self._tags.setdefault(tag, dict())
+        if source not in messages:
+            while self._len >= self._capacity:
+                self._drop_oldest()
+            self._len += 1
+        messages[source] = (idx, message)
+        self._stored += 1
+        return True
+
+    def _drop_oldest(self):
+        if self._window is None or self._current is None:
+            tag = min(self._tags)
+        else:
+            tag = max(self._tags, key=self._age)
+        messages = self._tags[tag]
+        messages.pop(next(iter(messages)))
+        if len(messages) == 0:
+            del self._tags[tag]
+        self._len -= 1
+        self._dropped += 1
+
+    def pop(self, tag, idx):
+        """
+        Remove (and return) the message of transaction `tag` that was received
+        by a request with key `idx` -- (found, message)
+        """
+        messages = self._tags.get(tag)
+        if messages is None:
+            return False, None
+        for source, (i, message) in messages.items():
+            if i == idx:
+                break
+        else:
+            return False, None
+        del messages[source]
+        if len(messages) == 0:
+            del self._tags[tag]
+        self._len -= 1
+        self._delivered += 1
+        return True, message
+
+    def evict(self, tag):
+        """
+        Evict messages of transactions before `tag`
+        """
+        self._current = tag
+        stale = [i for i in self._tags if self._is_before(i, tag)]
+        for i in stale:
+            n = len(self._tags.pop(i))
+            self._len -= n
+            self._evicted += n
+        if len(stale) > 0:
+            LOGGER.debug("Evicted stale messages of tags: %s", stale)
+
+    def stats(self):
+        return {
+            "messages": self._len,
+            "stored": self._stored,
+            "delivered": self._delivered,
+            "evicted": self._evicted,
+            "dropped": self._dropped,
+        }
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from array import array
+from math import ceil
+from statistics import median
+
+
+class StragglerDetector(object):
+    def __init__(self, size, window=64, percentile=50, factor=3.0,
+                 min_samples=8, min_delay=0.0):
+        """
+        Response times of a communicator with `size` ranks: the latest `window`
+        response times of each rank are kept in a ring buffer (allocated once
+        the rank responds for the first time -- most ranks only ever hear from
+        a few others). A rank is a straggler once it has `min_samples`
+        responses, and the `percentile` of its response times exceeds both
+        `min_delay`, and `factor` times the median (over all ranks) of that
+        percentile.
+        """
+        self._size = size
+        self._window = window
+        self._percentile = percentile
+        self._factor = factor
+        self._min_samples = min_samples
+        self._min_delay = min_delay
+
+        # {rank: ring buffer}, {rank: number of responses}
+        self._times = dict()
+        self._ct = dict()
+
+    @property
+    def window(self):
+        return self._window
+
+    @property
+    def min_delay(self):
+        return self._min_delay
+
+    def record(self, rank, seconds):
+        """
+        Record that rank `rank` kept this rank waiting for `seconds`
+        """
+        if not 0 <= rank < self._size:
+            return
+        ct = self._ct.get(rank, 0)
+        if ct == 0 and rank not in self._times:
+            self._times[rank] = array("d", bytes(8*self._window))
+        self._times[rank][ct % self._window] = seconds
+        self._ct[rank] = ct + 1
+
+    def samples(self, rank):
+        """
+        Latest response times of `rank` (in no particular order)
+        """
+        n = min(self._ct.get(rank, 0), self._window)
+        if n == 0:
+            return list()
+        return self._times[rank][:n].tolist()
+
+    def percentile(self, rank, q=None):
+        """
+        The `q`-th percentile (nearest rank, defaults to the detector's
+        percentile) of the latest response times of `rank` -- None if there
+        are fewer than `min_samples`
+        """
+        if q is None:
+            q = self._percentile
+        samples = sorted(self.samples(rank))
+        if len(samples) == 0 or len(samples) < self._min_samples:
+            return None
+        idx = min(len(samples), max(1, ceil(q*len(samples)/100))) - 1
+        return samples[idx]
+
+    def stragglers(self):
+        """
+        Ranks whose response times are persistently slower than the rest
+        """
+        p = {i: self.percentile(i) for i in sorted(self._ct)}
+        known = [t for t in p.values() if t is not None]
+        if len(known) == 0:
+            return list()
+        limit = max(self._min_delay, self._factor*median(known))
+        return [i for i, t in p.items() if t is not None and t > limit]
+
+    def reset(self, ranks=None):
+        """
+        Forget the response times of `ranks` (all ranks if None)
+        """
+        if ranks is None:
+            self._ct = dict()
+            return
+        for i in ranks:
+            self._ct.pop(i, None)
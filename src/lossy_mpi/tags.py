@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from mpi4py import MPI
+
+from . import getLogger
+
+LOGGER = getLogger(__name__)
+
+# the tag space of a communicator is split into this many ranges -- pools on
+# the same communicator get consecutive ranges (cycling once all are taken)
+N_RANGES = 16
+# tags at the end of each range that are reserved (e.g. for persistent
+# requests), rather than being used by transactions
+N_RESERVED = 16
+# MPI guarantees at least this upper bound for tags
+MIN_TAG_UB = 32767
+
+# attribute (on the communicator) that counts the ranges handed out so far
+_KEYVAL = None
+
+
+def _next_range(comm):
+    """
+    Index of the next tag range on `comm` -- all ranks get the same index, as
+    long as they create their pools in the same order
+    """
+    global _KEYVAL
+    if isinstance(comm, MPI.Comm):
+        if _KEYVAL is None:
+            _KEYVAL = MPI.Comm.Create_keyval()
+        idx = comm.Get_attr(_KEYVAL) or 0
+        comm.Set_attr(_KEYVAL, idx + 1)
+    else:
+        idx = getattr(comm, "_lossy_mpi_ranges", 0)
+        comm._lossy_mpi_ranges = idx + 1
+    return idx % N_RANGES
+
+
+def _tag_ub(comm):
+    tag_ub = None
+    if isinstance(comm, MPI.Comm):
+        tag_ub = comm.Get_attr(MPI.TAG_UB)
+    return MIN_TAG_UB if tag_ub is None else tag_ub
+
+
+class TagAllocator(object):
+    def __init__(self, comm, window=None, channels=1):
+        """
+        Maps (unbounded) transaction IDs to MPI tags in a range of the tag
+        space of `comm`: transaction `txn` uses tag `base + txn % window`, in
+        epoch `txn // window`. Tags are compared modulo the window (see
+        `is_before`), so that messages of earlier transactions are recognized
+        after the tags wrap around -- as long as they are less than half a
+        window late. By default, the window spans the whole range. The window
+        can be split into `channels` (e.g. one per thread), which count their
+        transactions separately.
+        """
+        span = (_tag_ub(comm) + 1)//N_RANGES
+        span -= span % 2
+        if window is None:
+            window = span - N_RESERVED
+        # an even window keeps the parity of the tag (used to double-buffer
+        # the shared window) in step with the transaction ID
+        assert window > 0 and window % 2 == 0, "window has to be even"
+        assert window + N_RESERVED <= span, f"window does not fit into {span=}"
+
+        self._range = _next_range(comm)
+        self._base = self._range*span
+        self._window = window
+        self._channels = channels
+        self._channel_window = window//channels
+        self._channel_window -= self._channel_window % 2
+        assert self._channel_window > 0, "too many channels"
+        # reserved tags that are in use
+        self._reserved = set()
+
+        LOGGER.debug(
+            "Allocated tags [%s, %s) of range %s",
+            self._base, self._base + window, self._range
+        )
+
+    @property
+    def base(self):
+        return self._base
+
+    @property
+    def window(self):
+        return self._window
+
+    @property
+    def channels(self):
+        return self._channels
+
+    @property
+    def channel_window(self):
+        """
+        Number of tags of each channel
+        """
+        return self._channel_window
+
+    def tag(self, txn, channel=0):
+        """
+        MPI tag of transaction `txn` (of `channel`)
+        """
+        window = self._channel_window
+        return self._base + channel*window + txn % window
+
+    def epoch(self, txn):
+        """
+        Epoch of transaction `txn` (i.e. how often its tags wrapped around)
+        """
+        return txn//self._channel_window
+
+    def is_before(self, tag, other):
+        """
+        True if `tag` belongs to a transaction before `other`'s (of the same
+        channel, i.e. it is less than half a window behind, modulo the window)
+        """
+        age = (other - tag) % self._channel_window
+        return 0 < age < self._channel_window//2
+
+    def __contains__(self, tag):
+        return self._base <= tag < self._base + self._window
+
+    def reserve(self):
+        """
+        Reserve a tag (outside of the window) until it is released
+        """
+        for tag in range(self._base + self._window,
+                         self._base + self._window + N_RESERVED):
+            if tag not in self._reserved:
+                self._reserved.add(tag)
+                return tag
+        raise RuntimeError("All reserved tags are in use")
+
+    def release(self, tag):
+        self._reserved.discard(tag)
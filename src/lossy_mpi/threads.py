@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from threading import Lock
+from time import sleep
+
+from mpi4py import MPI
+
+from . import getLogger
+
+LOGGER = getLogger(__name__)
+
+
+def needs_serialization():
+    """
+    True if MPI was not initialized with MPI_THREAD_MULTIPLE, i.e. threads
+    have to take turns calling MPI
+    """
+    provided = MPI.Query_thread()
+    if provided < MPI.THREAD_SERIALIZED:
+        LOGGER.warning(
+            "MPI provides thread level %s: calling MPI from several threads "
+            "is not supported", provided
+        )
+    return provided < MPI.THREAD_MULTIPLE
+
+
+class _Request(object):
+    def __init__(self, lock, req):
+        """
+        Proxy for an MPI request that is only tested (or cancelled) while
+        holding the progress `lock`
+        """
+        self._lock = lock
+        self._req = req
+
+    def test(self, status=None):
+        with self._lock:
+            return self._req.test(status)
+
+    def Test(self, status=None):
+        with self._lock:
+            return self._req.Test(status)
+
+    def Wait(self, status=None):
+        # poll, so that other threads can make progress in the meantime
+        while True:
+            flag, msg = self.test(status)
+            if flag:
+                return msg
+            sleep(1e-4)
+
+    def wait(self, status=None):
+        return self.Wait(status)
+
+    def Cancel(self):
+        with self._lock:
+            self._req.Cancel()
+
+
+class SerializedComm(object):
+    def __init__(self, comm, lock=None):
+        """
+        Proxy of `comm` for MPI libraries without MPI_THREAD_MULTIPLE: every
+        call into MPI (including testing requests) holds the progress `lock`.
+        The lock is only held for the duration of a call -- so threads can
+        still run their transactions concurrently (e.g. one thread polls for
+        a message while another one waits out its timeout).
+        """
+        self._comm = comm
+        self._lock = Lock() if lock is None else lock
+
+    def __getattr__(self, name):
+        attr = getattr(self._comm, name)
+        if not callable(attr):
+            return attr
+
+        lock = self._lock
+
+        def call(*args, **kwargs):
+            with lock:
+                result = attr(*args, **kwargs)
+            # requests are tested (by any thread) while holding the lock too
+            if hasattr(result, "Test"):
+                return _Request(lock, result)
+            return result
+
+        return call
+
+    @property
+    def comm(self):
+        return self._comm
+
+    @property
+    def lock(self):
+        return self._lock
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import atexit
+import json
+import struct
+from array import array
+from enum import auto, unique
+from itertools import count
+from os import environ, getpid, makedirs, path
+from time import monotonic, time
+
+from . import AutoEnum, getLogger
+
+LOGGER = getLogger(__name__)
+
+# file header: magic, version, rank, wall clock and monotonic clock at the time
+# the tracer was created, number of events
+MAGIC = b"LMPT"
+HEADER = struct.Struct("<4sHqddq")
+VERSION = 1
+
+
+@unique
+class Event(AutoEnum):
+    # transactions: arg is the operation type (metrics.Op)
+    BEGIN = auto()
+    END = auto()
+    # requests: arg is the request's key (e.g. the peer's rank)
+    POST = auto()
+    COMPLETE = auto()
+    TIMEOUT = auto()
+    REJECTED = auto()
+
+
+class Tracer(object):
+    _file_ct = count()
+
+    def __init__(self, rank, capacity=1 << 16, clock=monotonic):
+        """
+        Per-rank trace: the latest `capacity` events (time stamped by the
+        monotonic `clock`) are kept in a ring buffer of preallocated arrays
+        """
+        self._rank = rank
+        self._capacity = capacity
+        self._clock = clock
+        self._ct = 0
+        self._time = array("d", [0]*capacity)
+        self._event = array("b", [0]*capacity)
+        self._tag = array("q", [0]*capacity)
+        self._arg = array("q", [0]*capacity)
+        # anchor monotonic time stamps to the wall clock (so that traces from
+        # different nodes can be merged)
+        self._wall = time()
+        self._mono = clock()
+
+    @classmethod
+    def from_env(cls, rank, clock=monotonic, var="LOSSY_MPI_TRACE"):
+        """
+        If `var` names a directory, return a tracer that is flushed to it at
+        exit -- otherwise None
+        """
+        directory = environ.get(var, "").strip()
+        if directory == "":
+            return None
+        makedirs(directory, exist_ok=True)
+        tracer = cls(rank, clock=clock)
+        file_name = path.join(
+            directory, f"trace-{getpid()}-{next(cls._file_ct)}.bin"
+        )
+        atexit.register(tracer.flush, file_name)
+        return tracer
+
+    @property
+    def rank(self):
+        return self._rank
+
+    def __len__(self):
+        return min(self._ct, self._capacity)
+
+    def record(self, event, tag, arg=-1):
+        idx = self._ct % self._capacity
+        self._time[idx] = self._clock()
+        self._event[idx] = event.value
+        self._tag[idx] = tag
+        self._arg[idx] = arg
+        self._ct += 1
+
+    def _ordered(self, a):
+        """
+        Contents of the ring buffer `a`, oldest first
+        """
+        if self._ct <= self._capacity:
+            return a[:self._ct]
+        idx = self._ct % self._capacity
+        return a[idx:] + a[:idx]
+
+    def flush(self, file_name):
+        """
+        Write the trace to `file_name` (compact binary format)
+        """
+        n = len(self)
+        with open(file_name, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self._rank, self._wall, self._mono, n))
+            for a in (self._time, self._event, self._tag, self._arg):
+                self._ordered(a).tofile(f)
+        LOGGER.debug("Flushed %s trace events to %s", n, file_name)
+
+
+def load(file_name):
+    """
+    Read a trace file -- returns (rank, list of (wall time, event, tag, arg))
+    """
+    with open(file_name, "rb") as f:
+        magic, version, rank, wall, mono, n = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise RuntimeError(f"Not a trace file: {file_name=}")
+        columns = list()
+        for typecode in "dbqq":
+            a = array(typecode)
+            a.fromfile(f, n)
+            columns.append(a)
+    events = [
+        (wall + t - mono, Event(e), tag, arg) for t, e, tag, arg in zip(*columns)
+    ]
+    return rank, events
+
+
+def merge(file_names):
+    """
+    Merge trace files into a Chrome trace (Perfetto) dict: one process per
+    rank (one thread per trace file), transactions as slices, and requests as
+    instant events
+    """
+    from .metrics import Op
+
+    traces = [load(i) for i in file_names]
+    start = min((e[0][0] for _, e in traces if len(e) > 0), default=0)
+
+    threads = dict()
+    trace_events = list()
+    for rank, events in traces:
+        tid = threads.setdefault(rank, count())
+        tid = next(tid)
+        trace_events.append({
+            "ph": "M", "name": "process_name", "pid": rank, "tid": tid,
+            "args": {"name": f"rank {rank}"},
+        })
+        for t, event, tag, arg in events:
+            record = {"pid": rank, "tid": tid, "ts": (t - start)*1e6}
+            if event in (Event.BEGIN, Event.END):
+                record["ph"] = "B" if event == Event.BEGIN else "E"
+                record["name"] = f"{Op(arg).name.lower()} {tag}"
+                record["args"] = {"tag": tag}
+            else:
+                record["ph"] = "i"
+                record["s"] = "t"
+                record["name"] = event.name.lower()
+                record["args"] = {"tag": tag, "key": arg}
+                if event in (Event.TIMEOUT, Event.REJECTED):
+                    record["cname"] = "terrible"
+            trace_events.append(record)
+
+    return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+
+def main():
+    # only needed by the command line tool
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(
+        description="Merge lossy_mpi trace files into a Chrome trace"
+    )
+    parser.add_argument("output", help="Chrome trace (JSON) file")
+    parser.add_argument("traces", nargs="+", help="trace files")
+    args = parser.parse_args()
+
+    with open(args.output, "w") as f:
+        json.dump(merge(args.traces), f)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+def test_sim_allgather_alltoall():
+    from lossy_mpi.sim import Simulator
+    from lossy_mpi.pool import Pool
+
+    size = 8
+    dead = 3
+
+    def body(comm):
+        rank = comm.Get_rank()
+        pool = Pool(comm, 0, timeout=1, n_tries=10, share_mask=True)
+        pool.ready()
+        if rank == dead:
+            pool.drop()
+        pool.sync_mask()
+        if rank == dead:
+            return None
+
+        start = comm.monotonic()
+        data = pool.allgather(rank)
+        exchanged = pool.alltoall([(rank, i) for i in range(size)], failover=-1)
+        # the dead rank is skipped => nobody waits for it
+        elapsed = comm.monotonic() - start
+        return data, exchanged, elapsed
+
+    results = Simulator(size, latency=1e-3).run(body)
+    for rank, result in enumerate(results):
+        if rank == dead:
+            continue
+        data, exchanged, elapsed = result
+        assert data == [i if i != dead else None for i in range(size)]
+        assert exchanged == [(i, rank) if i != dead else -1 for i in range(size)]
+        assert elapsed < 0.5
+
+
+def test_sim_allgather_timeout():
+    from lossy_mpi.sim import Simulator
+    from lossy_mpi.pool import Pool
+
+    size = 6
+
+    def body(comm):
+        rank = comm.Get_rank()
+        pool = Pool(comm, 0, timeout=1, n_tries=10)
+        pool.ready()
+        return pool.allgather(rank, failover=-1)
+
+    results = Simulator(size, latency=1e-3, crash={4: 0.0}).run(body)
+    for rank, data in enumerate(results):
+        if rank != 4:
+            assert data == [0, 1, 2, 3, -1, 5]
+
+
+@pytest.mark.mpi(min_size=4)
+def test_allgather_alltoall():
+    np = pytest.importorskip("numpy")
+    from time import sleep
+
+    from lossy_mpi.pool import Pool
+    from mpi4py import MPI
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    root = 0
+    slow = 3
+
+    pool = Pool(comm, root, timeout=0.5, n_tries=10)
+    pool.advance_transaction_counter(1700)
+    pool.ready()
+
+    sendbuf = np.full(4, rank, dtype=np.float64)
+    recvbuf = np.zeros((size, 4), dtype=np.float64)
+    pool.Allgather(sendbuf, recvbuf)
+    assert np.all(recvbuf == np.arange(size)[:, None])
+
+    # blocks of different sizes: rank i sends i + 1 elements to every rank
+    sendbuf = [np.full(rank + 1, 10*rank + i, dtype=np.int64) for i in range(size)]
+    recvbuf = [np.zeros(i + 1, dtype=np.int64) for i in range(size)]
+    pool.Alltoallv(sendbuf, recvbuf)
+    for i in range(size):
+        assert np.all(recvbuf[i] == 10*i + rank)
+
+    # the slow rank misses the exchange (its receives are cancelled)
+    if rank == slow:
+        sleep(1)
+    sendbuf = np.full(4, rank, dtype=np.float64)
+    recvbuf = np.zeros((size, 4), dtype=np.float64)
+    pool.Allgather(sendbuf, recvbuf, failover=-1)
+    if rank != slow:
+        assert np.all(recvbuf[slow] == -1)
+        assert np.all(recvbuf[1] == 1)
+
+    comm.barrier()
+    # receive the slow rank's late messages
+    if rank != slow:
+        comm.Recv(
+            np.zeros(4), source=slow, tag=pool.tags.tag(pool.transaction_counter - 1)
+        )
+    comm.barrier()
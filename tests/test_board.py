@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+@pytest.mark.mpi(min_size=4)
+def test_board():
+    from lossy_mpi.board import EMPTY
+    from lossy_mpi.pool import Pool, Status
+    from mpi4py import MPI
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    slow = 3
+
+    pool = Pool(
+        comm, 0, timeout=0.5, n_tries=10, share_mask=True, status_board=True
+    )
+    pool.advance_transaction_counter(2000)
+    pool.ready()
+
+    for k in range(4):
+        # rank 3 stops responding after the second transaction
+        if rank == slow and k == 2:
+            break
+        pool.sync_mask()
+        if rank == 0 and k in (1, 2):
+            # every rank posted before sending its data in the last gather
+            assert pool.mask == [Status.READY]*size
+        if rank == 0 and k == 3:
+            # rank 3 missed the last sync_mask
+            assert pool.mask[slow] is Status.TIMEOUT
+        data = pool.gather(rank)
+        if rank == 0:
+            expected = list(range(size))
+            if k >= 2:
+                expected[slow] = None
+            assert data == expected
+
+    comm.Barrier()
+    # any rank can read the board (and the root's latest mask)
+    statuses, heartbeats = pool.board.read()
+    assert heartbeats[slow] == 2 and statuses[slow] == Status.READY.value
+    assert Status(pool.board.mask()[slow]) is Status.TIMEOUT
+    assert pool.board.heartbeat == (2 if rank == slow else 4)
+    assert EMPTY not in statuses
+    pool.free()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+def test_checkpoint_file(tmp_path):
+    from lossy_mpi import checkpoint
+    from lossy_mpi.checkpoint import read_checkpoint, write_checkpoint
+
+    file_name = tmp_path/"pool.ckpt"
+    assert read_checkpoint(file_name) is None
+
+    write_checkpoint(file_name, 3, b"\x00\x01", {"done": [0]})
+    write_checkpoint(file_name, 7, b"\x00\x00", {"done": [0, 1]}, sync=True)
+    assert read_checkpoint(file_name) == (7, b"\x00\x00", {"done": [0, 1]})
+
+    # a torn record (the job died while writing) is ignored
+    with open(file_name, "ab") as f:
+        f.write(b"LMPC\x01\x00garbage")
+    assert read_checkpoint(file_name)[0] == 7
+
+    # the log is compacted once it holds enough records
+    for i in range(4*checkpoint.COMPACT_RECORDS):
+        write_checkpoint(file_name, i, b"\x00\x00", i)
+    assert file_name.stat().st_size < 2*checkpoint.COMPACT_RECORDS*64
+    assert read_checkpoint(file_name)[2] == 4*checkpoint.COMPACT_RECORDS - 1
+
+
+def test_sim_checkpoint(tmp_path):
+    from lossy_mpi.pool import Pool, Status
+    from lossy_mpi.sim import Simulator
+
+    size = 6
+    file_name = tmp_path/"pool.ckpt"
+
+    def run(n_items):
+        def body(comm):
+            rank = comm.Get_rank()
+            pool = Pool(comm, 0, timeout=1, n_tries=10, share_mask=True)
+            pool.ready()
+            results = pool.restore(file_name)
+            if pool.status is Status.DONE:
+                return "skipped", pool.transaction_counter
+            if results is None:
+                results = dict()
+            if rank == size - 1:
+                pool.drop()
+            pool.sync_mask()
+            if pool.status is Status.DONE:
+                return "dropped", pool.transaction_counter
+
+            # skip the work that was done by earlier runs
+            first = pool.bcast(max(results, default=-1) + 1)
+            for item in range(first, n_items):
+                data = pool.gather(rank*item)
+                if rank == 0:
+                    results[item] = sum(i for i in data if i is not None)
+                pool.checkpoint(file_name, results)
+            return results, pool.transaction_counter
+
+        return Simulator(size, latency=1e-3).run(body)
+
+    first = run(3)
+    results, txn_ct = first[0]
+    assert results == {i: sum(range(size - 1))*i for i in range(3)}
+
+    second = run(5)
+    results, restored_ct = second[0]
+    assert results == {i: sum(range(size - 1))*i for i in range(5)}
+    # counters continue where the last run left off
+    assert restored_ct > txn_ct
+    assert all(r[1] == restored_ct for r in second[:size - 1])
+    # the rank that was done in the first run is done after restoring
+    assert second[size - 1][0] == "skipped"
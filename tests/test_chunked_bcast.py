@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+@pytest.mark.mpi(min_size=4)
+def test_chunked_bcast():
+    np = pytest.importorskip("numpy")
+    from lossy_mpi.pool import Pool
+    from mpi4py import MPI
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    root = 0
+
+    pool = Pool(
+        comm, root, timeout=2, n_tries=10,
+        chunk_nbytes=1 << 16, chunk_threshold=1 << 14, chunks_in_flight=2
+    )
+    pool.advance_transaction_counter(1000)
+    pool.ready()
+
+    # lowercase: pickled object (larger than mpi4py's default irecv buffer)
+    obj = {"data": bytes(range(256))*4096} if rank == root else None
+    obj = pool.bcast(obj)
+    assert obj["data"] == bytes(range(256))*4096
+
+    # uppercase: buffer
+    buf = np.zeros(1 << 17, dtype=np.float64)
+    if rank == root:
+        buf[:] = np.arange(buf.size)
+    pool.Bcast(buf, failover=-1)
+    assert np.all(buf == np.arange(buf.size))
+
+    # the last rank skips a bcast => the root drops it after one timeout, and
+    # everyone else still gets the data
+    if rank == size - 1:
+        pool.next_tag()
+    else:
+        buf[:] = 0
+        if rank == root:
+            buf[:] = 1
+        pool.Bcast(buf, failover=-1)
+        assert np.all(buf == 1)
+
+    comm.barrier()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+def test_compressor():
+    from lossy_mpi.compression import Codec, Compressor
+
+    for codec in Codec.available():
+        compressor = Compressor(codec, threshold=16)
+        # small payloads are not compressed
+        assert compressor.encode(b"abc") == bytes([Codec.NONE.value]) + b"abc"
+        data = bytes(4096)
+        encoded = compressor.encode(data)
+        assert compressor.decode(encoded) == data
+        # trailing bytes are ignored
+        out = bytearray(len(data))
+        used = compressor.decode_into(encoded + bytes(len(data)), out)
+        assert out == data
+        assert used == len(encoded)
+
+
+@pytest.mark.mpi(min_size=4)
+@pytest.mark.parametrize("chunk_nbytes", [None, 1 << 12])
+def test_compressed_gather_bcast(chunk_nbytes):
+    np = pytest.importorskip("numpy")
+    from lossy_mpi.compression import Codec, Compressor
+    from lossy_mpi.pool import Pool
+    from mpi4py import MPI
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    root = 0
+
+    pool = Pool(
+        comm, root, timeout=2, n_tries=10, share_mask=True,
+        chunk_nbytes=chunk_nbytes, chunk_threshold=1 << 13,
+        compressor=Compressor(Codec.ZLIB, threshold=1 << 10)
+    )
+    # keep the tags of both parametrizations apart
+    pool.advance_transaction_counter(1100 if chunk_nbytes is None else 1200)
+    pool.ready()
+    pool.sync_mask()
+
+    # uppercase: histograms compress well
+    sendbuf = np.zeros(1 << 12, dtype=np.float64)
+    sendbuf[rank] = rank + 1
+    recvbuf = np.zeros((size, sendbuf.size), dtype=np.float64)
+    pool.Gather(sendbuf, recvbuf, failover=-1)
+    if rank == root:
+        for i in range(size):
+            assert recvbuf[i, i] == i + 1
+            assert recvbuf[i].sum() == i + 1
+        # one entry per gather -- the root decompressed size - 1 messages
+        stats = pool.compression_stats[-1]
+        assert stats.nbytes == (size - 1)*sendbuf.nbytes
+        assert stats.ratio > 10
+    else:
+        assert pool.compression_stats[-1].ratio > 10
+
+    buf = np.zeros(1 << 12, dtype=np.float64)
+    if rank == root:
+        buf[:] = recvbuf.sum(axis=0)
+    pool.Bcast(buf, failover=-1)
+    assert np.all(buf[:size] == np.arange(1, size + 1))
+    assert np.all(buf[size:] == 0)
+
+    # lowercase: pickled objects
+    data = pool.gather({"rank": rank, "hist": [0]*1024})
+    if rank == root:
+        assert [d["rank"] for d in data] == list(range(size))
+    obj = {"hist": [rank]*4096} if rank == root else None
+    obj = pool.bcast(obj)
+    assert obj == {"hist": [root]*4096}
+
+    # the last rank skips a bcast => everyone else still gets the data
+    if rank == size - 1:
+        pool.next_tag()
+    else:
+        buf[:] = 1 if rank == root else 0
+        pool.Bcast(buf, failover=-1)
+        assert np.all(buf == 1)
+
+    comm.barrier()
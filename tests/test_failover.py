@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+@pytest.mark.mpi(min_size=4)
+def test_failover():
+    np = pytest.importorskip("numpy")
+    from time import sleep
+
+    from lossy_mpi.failover import PerRank
+    from lossy_mpi.pool import Pool
+    from mpi4py import MPI
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    slow = 3
+
+    pool = Pool(comm, 0, timeout=0.5, n_tries=10)
+    pool.advance_transaction_counter(2100)
+    pool.ready()
+    comm.Barrier()
+
+    sendbuf = np.full(4, rank, dtype=np.float64)
+    recvbuf = np.zeros((size, 4), dtype=np.float64)
+    expected = np.repeat(np.arange(size, dtype=np.float64)[:, None], 4, axis=1)
+
+    # rank 3 misses the first three transactions
+    if rank == slow:
+        sleep(2.5)
+    pool.Gather(sendbuf, recvbuf, failover=-1)
+    if rank == 0:
+        expected[slow] = -1
+        assert np.all(recvbuf == expected)
+
+    pool.Gather(sendbuf, recvbuf, failover=PerRank(-np.arange(size)))
+    if rank == 0:
+        expected[slow] = -slow
+        assert np.all(recvbuf == expected)
+
+    # every rank gets its own failover object
+    data = pool.gather(rank, failover=lambda i: [i])
+    if rank == 0:
+        assert data[:slow] == list(range(slow)) and data[slow] == [slow]
+    else:
+        assert data == [None]*size
+    pool.barrier()
+
+
+def test_fill():
+    np = pytest.importorskip("numpy")
+    from lossy_mpi.failover import PerRank, fill, value
+
+    recvbuf = np.zeros((4, 2))
+    fill(recvbuf, [1, 3], -1)
+    assert np.all(recvbuf[[1, 3]] == -1) and np.all(recvbuf[[0, 2]] == 0)
+    fill(recvbuf, [0], PerRank(np.arange(4)))
+    fill(recvbuf, [2], lambda i: [i, -i])
+    assert recvbuf[0].tolist() == [0, 0] and recvbuf[2].tolist() == [2, -2]
+
+    recvbuf = [None]*4
+    fill(recvbuf, [1, 2], lambda i: [])
+    assert recvbuf[1] == [] and recvbuf[1] is not recvbuf[2]
+    fill(recvbuf, [3], PerRank("abcd"))
+    assert recvbuf[3] == "d" and value([0], 1) == [0]
+
+
+def test_sim_failover():
+    from lossy_mpi.pool import Pool
+    from lossy_mpi.sim import Simulator
+
+    size = 4
+    slow = 3
+
+    def body(comm):
+        rank = comm.Get_rank()
+        pool = Pool(comm, 0, timeout=1, n_tries=10)
+        pool.ready()
+        if rank == slow:
+            comm.sleep(2.5)
+        gathered = pool.gather(rank, failover=lambda i: {"rank": i})
+        exchanged = pool.allgather(rank, failover=lambda i: {})
+        return gathered, exchanged
+
+    results = Simulator(size, latency=1e-3).run(body)
+    gathered, exchanged = results[0]
+    assert gathered == [0, 1, 2, {"rank": slow}]
+    assert exchanged[:slow] == [0, 1, 2] and exchanged[slow] == {}
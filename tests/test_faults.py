@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+def test_fault_policy(monkeypatch, tmp_path):
+    from lossy_mpi.faults import FaultPolicy
+
+    monkeypatch.delenv("LOSSY_MPI_FAULTS", raising=False)
+    assert FaultPolicy.from_env() is None
+
+    monkeypatch.setenv("LOSSY_MPI_FAULTS", '{"seed": 1, "drop": 0.5, "ranks": [2]}')
+    policy = FaultPolicy.from_env()
+    assert policy.drop == 0.5
+    assert policy.applies_to(2) and not policy.applies_to(1)
+
+    file_name = tmp_path/"faults.json"
+    file_name.write_text('{"delay": 0.1, "crash": [{"rank": 3, "at": 1.0}]}')
+    monkeypatch.setenv("LOSSY_MPI_FAULTS", str(file_name))
+    policy = FaultPolicy.from_env()
+    assert policy.delay == 0.1
+    assert policy.crash == [{"rank": 3, "at": 1.0}]
+
+
+@pytest.mark.mpi(min_size=4)
+def test_faults():
+    np = pytest.importorskip("numpy")
+    from lossy_mpi.faults import FaultPolicy, FaultyComm
+    from lossy_mpi.pool import Pool, Status
+    from mpi4py import MPI
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    root = 0
+
+    # rank 1's messages are late (by more than the timeout), all of rank 2's
+    # messages are lost
+    policy = FaultPolicy(delay=2, ranks=[1], crash=[{"rank": 2, "at": 0}])
+    faulty_comm = FaultyComm(comm, policy)
+    pool = Pool(faulty_comm, root, timeout=0.5, n_tries=10)
+    pool.advance_transaction_counter(1400)
+    pool.ready()
+
+    data = pool.gather(rank)
+    if rank == root:
+        assert data[1] is None
+        assert data[2] is None
+        assert data[3] == 3
+
+    sendbuf = np.full(4, rank, dtype=np.float64)
+    recvbuf = np.zeros((size, 4), dtype=np.float64)
+    pool.Gather(sendbuf, recvbuf, failover=-1)
+    if rank == root:
+        assert np.all(recvbuf[1] == -1)
+        assert np.all(recvbuf[2] == -1)
+        assert np.all(recvbuf[3] == 3)
+
+    pool.sync_mask()
+    if rank == root:
+        assert pool.mask[1] is Status.TIMEOUT
+        assert pool.mask[2] is Status.TIMEOUT
+        assert pool.mask[3] is Status.READY
+
+    # receive rank 1's late Gather message (its receive was cancelled) before
+    # the next test uses COMM_WORLD -- the late gather and sync_mask messages
+    # match the receives that timed out
+    faulty_comm.drain()
+    if rank == root:
+        comm.Recv(bytearray(64), source=1, tag=1401)
+    comm.barrier()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+@pytest.mark.mpi(min_size=4)
+def test_gather_plan():
+    np = pytest.importorskip("numpy")
+    from time import sleep
+
+    from lossy_mpi.pool import Pool, Status
+    from mpi4py import MPI
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    root = 0
+    slow = 3
+
+    pool = Pool(comm, root, timeout=0.5, n_tries=10)
+    pool.advance_transaction_counter(1600)
+    pool.ready()
+
+    sendbuf = np.zeros(16, dtype=np.float64)
+    recvbuf = np.zeros((size, 16), dtype=np.float64)
+    plan = pool.gather_plan(sendbuf, recvbuf, failover=-1)
+
+    for k in range(5):
+        sendbuf[:] = 10*k + rank
+        # rank 3 misses the second run -- its late message must not end up in
+        # the third run's data
+        if rank == slow and k == 1:
+            sleep(0.7)
+        plan.run()
+        if rank == root:
+            expected = 10*k + np.arange(size)
+            if k == 1:
+                expected[slow] = -1
+                assert plan.missed == [slow]
+            else:
+                assert plan.missed == []
+            assert np.all(recvbuf == expected[:, None])
+
+    # dead ranks are skipped
+    if rank == root:
+        pool.mask[1] = Status.DONE
+    sendbuf[:] = rank
+    plan.run()
+    if rank == root:
+        assert plan.missed == []
+        assert np.all(recvbuf[2:] == np.arange(2, size)[:, None])
+
+    # a plan is a transaction like any other
+    data = pool.gather(rank)
+    if rank == root:
+        assert data[2:] == list(range(2, size))
+
+    comm.barrier()
+    plan.free()
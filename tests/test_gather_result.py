@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+def test_gather_result():
+    np = pytest.importorskip("numpy")
+    from lossy_mpi.result import GatherResult
+
+    data = [np.array([1.0, 5.0]), None, np.array([3.0, 2.0]), None]
+    result = GatherResult(data, [True, False, True, False])
+    assert result.count() == 2
+    assert list(result.ranks) == [0, 2]
+    assert result.values.shape == (2, 2)
+    assert np.all(result.sum() == [4, 7])
+    assert np.all(result.mean() == [2, 3.5])
+    assert list(result.argmax()) == [2, 0]
+    assert result[1] is None and len(result) == 4
+
+    # heterogeneous payloads can't be reduced
+    result = GatherResult([[1], [1, 2], None], [True, True, False])
+    assert result.values is None
+    with pytest.raises(ValueError):
+        result.sum()
+
+    # nothing arrived
+    result = GatherResult([None, None], [False, False])
+    assert result.count() == 0
+    assert result.sum() is None and result.argmax() is None
+
+
+def test_sim_gather_result():
+    pytest.importorskip("numpy")
+    from lossy_mpi.pool import Pool
+    from lossy_mpi.sim import Simulator
+
+    size = 8
+
+    def body(comm):
+        rank = comm.Get_rank()
+        pool = Pool(comm, 0, timeout=1, n_tries=10)
+        pool.ready()
+        result = pool.gather(float(rank), result=True)
+        # rank 2 sends the failover value => it still counts as valid
+        mixed = pool.gather(None if rank == 2 else rank, result=True)
+        return result, mixed
+
+    results = Simulator(size, latency=1e-3, crash={5: 0.0}).run(body)
+    result, mixed = results[0]
+    assert list(result.valid) == [True]*5 + [False] + [True]*2
+    assert result[5] is None
+    assert result.count() == 7
+    assert result.sum() == sum(range(size)) - 5
+    assert result.argmax() == 7
+
+    assert list(mixed.valid) == list(result.valid)
+    assert mixed[2] is None
+    # not homogeneous: rank 2's payload is None
+    assert mixed.values is None
+    assert results[1][0].count() == 0
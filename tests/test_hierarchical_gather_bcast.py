@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+def check_vec(a, b):
+    for x, y in zip(a, b):
+        assert x == y
+
+
+@pytest.mark.mpi(min_size=4)
+def test_hierarchical_gather_bcast():
+    from lossy_mpi.pool import Pool, Status
+    from mpi4py import MPI
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    root = 0
+
+    # simulate nodes with two ranks each
+    node_comm = comm.Split(rank // 2, key=rank)
+    pool = Pool(comm, root, timeout=2, n_tries=10, node_comm=node_comm)
+    pool.ready()
+
+    assert pool.is_hierarchical
+    assert pool.is_leader == (rank % 2 == 0)
+
+    # high-numbered ranks will "drop out" first => the last node's leader times
+    # out after the rest of its node
+    n_data = size - rank
+    n_iter = 0
+    mask_ref = [Status.READY]*size
+
+    while True:
+        # simulate unexpected failure: if no more work, then stop responding
+        # assume that rank 0 does not fail
+        if n_data <= 0 and rank != root:
+            break
+
+        pool.sync_mask()
+
+        if rank == root:
+            check_vec(pool.mask, mask_ref)
+
+            if pool.done:
+                break
+
+        n_iter += 1
+        mask_ref[-n_iter] = Status.TIMEOUT
+
+        data_ref = [i + n_iter for i in range(size)]
+        for i, m in zip(range(size), pool.mask):
+            if m != Status.READY:
+                data_ref[i] = None
+
+        all_data = pool.gather(rank + n_iter)
+        if rank == root:
+            check_vec(all_data, data_ref)
+            sum_data = sum([d for d in all_data if d is not None])
+        else:
+            sum_data = None
+
+        # only the root holds the full mask => just check that bcast arrived
+        sum_data = pool.bcast(sum_data)
+        assert sum_data is not None
+
+        pool.barrier()
+        assert pool.barrier_missed == []
+
+        if n_data > 0:
+            n_data -= 1
+
+    comm.barrier()
+    pool.free()
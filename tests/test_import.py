@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import subprocess
+import sys
+
+
+def test_lazy_import():
+    # importing the package neither initializes MPI, nor sets up logging
+    code = (
+        "import logging, sys, lossy_mpi\n"
+        "assert 'mpi4py' not in sys.modules\n"
+        "assert 'lossy_mpi.log' not in sys.modules\n"
+        "assert logging.getLogger().handlers == []\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_lazy_pool():
+    import lossy_mpi
+    from lossy_mpi import pool
+
+    assert lossy_mpi.Pool is pool.Pool
+    assert lossy_mpi.Status is pool.Status
+
+
+def test_sim_lazy_mask():
+    from lossy_mpi.pool import Pool, Status
+    from lossy_mpi.sim import Simulator
+
+    size = 4
+
+    def body(comm):
+        pool = Pool(comm, 0, timeout=1, n_tries=10, share_mask=True)
+        # only the root allocates its mask up front
+        allocated = pool._mask is not None
+        pool.ready()
+        pool.sync_mask()
+        return allocated, pool.mask
+
+    results = Simulator(size, latency=1e-3).run(body)
+    assert [r[0] for r in results] == [True, False, False, False]
+    for _, mask in results:
+        assert mask == [Status.READY]*size
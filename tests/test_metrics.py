@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+@pytest.mark.mpi(min_size=4)
+def test_metrics():
+    np = pytest.importorskip("numpy")
+    from lossy_mpi.pool import Pool
+    from mpi4py import MPI
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    root = 0
+
+    pool = Pool(comm, root, timeout=1, n_tries=10, metrics=True)
+    pool.advance_transaction_counter(1300)
+    pool.ready()
+    pool.sync_mask()
+
+    sendbuf = np.full(8, rank, dtype=np.float64)
+    recvbuf = np.zeros((size, 8), dtype=np.float64)
+    pool.Gather(sendbuf, recvbuf, failover=-1)
+
+    # the last rank skips a gather => the root times out once
+    if rank == size - 1:
+        pool.next_tag()
+    else:
+        pool.Gather(sendbuf, recvbuf, failover=-1)
+
+    stats = pool.stats()
+    gather = stats["ops"]["gather"]
+    if rank == root:
+        # sync_mask and two Gathers
+        assert gather["transactions"] == 3
+        assert gather["timeouts"] == 1
+        assert gather["nbytes"] >= 2*(size - 2)*sendbuf.nbytes
+        assert sum(gather["latency_histogram"]) == 3*(size - 1) - 1
+        assert stats["ranks"]["responses"][size - 1] == 2
+        assert stats["ranks"]["responses"][1] == 3
+        last = stats["transactions"][-1]
+        assert last["op"] == "gather"
+        assert last["timeouts"] == 1
+        assert last["wall_time"] >= 1
+    else:
+        # senders don't receive anything
+        assert gather["nbytes"] == 0
+        assert gather["timeouts"] == 0
+
+    comm.barrier()
+
+    # metrics are off by default
+    pool = Pool(comm, root, timeout=1, n_tries=10)
+    assert pool.metrics is None
+    assert pool.stats() == dict()
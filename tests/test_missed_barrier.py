@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+@pytest.mark.mpi(min_size=4)
+@pytest.mark.parametrize("share_mask", [False, True])
+def test_missed_barrier(share_mask):
+    from lossy_mpi.pool import Pool
+    from mpi4py import MPI
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    root = 0
+
+    pool = Pool(comm, root, timeout=2, n_tries=10, share_mask=share_mask)
+    # keep the tags of both parametrizations apart
+    pool.advance_transaction_counter(700 + 10*share_mask)
+    pool.ready()
+
+    pool.sync_mask()
+
+    # the last rank skips the barrier (but keeps its transaction counter in
+    # sync with the other ranks)
+    if rank == size - 1:
+        pool.next_tag()
+    else:
+        pool.barrier()
+        # only the last rank can be reported as missing -- and the root knows
+        # about it
+        for i in pool.barrier_missed:
+            assert i == size - 1
+        if rank == root:
+            assert pool.barrier_missed == [size - 1]
+
+    # ranks that timed out are late => resync before the next barrier
+    comm.barrier()
+
+    pool.barrier()
+    assert pool.barrier_missed == []
+
+    comm.barrier()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+def test_message_store():
+    from lossy_mpi.store import MessageStore
+
+    store = MessageStore(capacity=3)
+    store.put(5, 1, 1, "a")
+    store.put(6, 1, 1, "b")
+    store.put(6, 2, 2, "c")
+    assert len(store) == 3
+    assert (6, 2) in store
+
+    # full => the oldest tag is dropped
+    store.put(7, 1, 1, "d")
+    assert (5, 1) not in store
+    assert store.dropped == 1
+
+    assert store.pop(6, 2) == (True, "c")
+    assert store.pop(6, 2) == (False, None)
+    store.evict(7)
+    assert store.stats() == {
+        "messages": 1, "stored": 4, "delivered": 1, "evicted": 1, "dropped": 1
+    }
+
+
+def test_sim_rejected():
+    from lossy_mpi.comms import TimeoutComm
+    from lossy_mpi.sim import Simulator
+    from mpi4py import MPI
+
+    def body(comm):
+        tcomm = TimeoutComm(comm, timeout=1, n_tries=10)
+        if comm.Get_rank() == 1:
+            # transaction 2's message overtakes transaction 1's
+            comm.isend("b", dest=0, tag=2)
+            comm.sleep(0.5)
+            comm.isend("a", dest=0, tag=1)
+            comm.isend("z", dest=0, tag=0)
+            return
+        if comm.Get_rank() > 1:
+            return
+
+        # receive any tag: transaction 1 receives transaction 2's message
+        data = list()
+        for tag in (1, 2):
+            tcomm.push_req(1, comm.irecv(source=1, tag=MPI.ANY_TAG))
+            tcomm.safe_collect_deferred_req(None, tag, cancel=True)
+            data.append(tcomm.deferred_msg[1])
+            stored = len(tcomm.rejected)
+        # the message of transaction 0 is stale
+        tcomm.push_req(1, comm.irecv(source=1, tag=MPI.ANY_TAG))
+        tcomm.safe_collect_deferred_req(None, 3)
+        tcomm.safe_collect_deferred_req(None, 4)
+        return data, stored, tcomm.rejected.stats()
+
+    results = Simulator(3, latency=1e-3).run(body)
+    data, stored, stats = results[0]
+    # transaction 2's message was kept for it: its own request was cancelled
+    assert data == [None, "b"]
+    assert stored == 0
+    assert stats["delivered"] == 1
+    assert stats["evicted"] == 1
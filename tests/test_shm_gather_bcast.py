@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+@pytest.mark.mpi(min_size=4)
+@pytest.mark.parametrize("shm_nbytes", [None, 1024])
+def test_shm_gather_bcast(shm_nbytes):
+    np = pytest.importorskip("numpy")
+    from lossy_mpi.pool import Pool, Status
+    from mpi4py import MPI
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    root = 0
+
+    # share_mask keeps ranks waiting for the root while it times out dead
+    # ranks during sync_mask => the following Bcast doesn't time out
+    pool = Pool(
+        comm, root, timeout=2, n_tries=10, share_mask=True, shm_nbytes=shm_nbytes
+    )
+    # keep the tags of both parametrizations apart
+    pool.advance_transaction_counter(800 if shm_nbytes is None else 900)
+    pool.ready()
+
+    # high-numbered ranks will "drop out" first
+    n_data = size - rank
+    n_iter = 0
+    mask_ref = [Status.READY]*size
+
+    sendbuf = np.zeros(16, dtype=np.float64)
+    recvbuf = np.zeros((size, 16), dtype=np.float64)
+    sumbuf = np.zeros(16, dtype=np.float64)
+
+    while True:
+        # simulate unexpected failure: if no more work, then stop responding
+        # assume that rank 0 does not fail
+        if n_data <= 0 and rank != root:
+            break
+
+        pool.sync_mask()
+
+        if rank == root:
+            assert pool.mask == mask_ref
+
+            if pool.done:
+                break
+
+        n_iter += 1
+        mask_ref[-n_iter] = Status.TIMEOUT
+
+        sendbuf[:] = rank + n_iter
+        pool.Gather(sendbuf, recvbuf, failover=-1)
+        if rank == root:
+            for i, m in enumerate(pool.mask):
+                if m is Status.READY:
+                    assert np.all(recvbuf[i] == i + n_iter)
+                else:
+                    assert np.all(recvbuf[i] == -1)
+            sumbuf[:] = recvbuf[recvbuf >= 0].sum()
+        else:
+            sumbuf[:] = 0
+
+        pool.Bcast(sumbuf, failover=-1)
+        assert np.all(sumbuf > 0)
+
+        # zero-copy variant (ranks on the root's node read the shared window)
+        if rank != root:
+            sumbuf[:] = 0
+        view = pool.Bcast_view(sumbuf, failover=-1)
+        assert np.all(np.frombuffer(view, dtype=np.float64) > 0)
+
+        if n_data > 0:
+            n_data -= 1
+
+    comm.barrier()
+    pool.free()
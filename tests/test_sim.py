@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+def run_gather_bcast(size, **kwargs):
+    from lossy_mpi.pool import Pool
+    from lossy_mpi.sim import Simulator
+
+    def body(comm):
+        rank = comm.Get_rank()
+        pool = Pool(comm, 0, timeout=2, n_tries=10, share_mask=True)
+        pool.ready()
+        pool.sync_mask()
+        data = pool.gather(rank)
+        pool.sync_mask()
+        obj = pool.bcast("data" if rank == 0 else None)
+        pool.barrier()
+        return data, obj, list(pool.mask)
+
+    sim = Simulator(size, **kwargs)
+    return sim, sim.run(body)
+
+
+def test_sim_gather_bcast():
+    from lossy_mpi.pool import Status
+
+    size = 16
+    sim, results = run_gather_bcast(size, latency=1e-4, crash={size - 1: 0.0})
+    assert sim.crashed == {size - 1}
+    # the root waited out (virtual) timeouts
+    assert sim.now >= 2
+
+    data, obj, mask = results[0]
+    assert data == list(range(size - 1)) + [None]
+    assert mask == [Status.READY]*(size - 1) + [Status.TIMEOUT]
+    for rank in range(size - 1):
+        _, obj, mask = results[rank]
+        assert obj == "data"
+        assert mask[-1] is Status.TIMEOUT
+    assert results[size - 1] is None
+
+
+def test_sim_deterministic():
+    from random import Random
+
+    rng = Random(1)
+    latency = {(i, j): rng.uniform(0, 1e-2) for i in range(8) for j in range(8)}
+    runs = [
+        run_gather_bcast(
+            8, latency=lambda i, j, n: latency[(i, j)], drop=0.05, seed=3
+        )
+        for k in range(2)
+    ]
+    assert runs[0][0].now == runs[1][0].now
+    assert runs[0][1] == runs[1][1]
+
+
+def test_sim_drop():
+    from lossy_mpi.pool import Status
+
+    # all messages from rank 3 are lost
+    sim, results = run_gather_bcast(8, drop=lambda i, j, tag: i == 3)
+    data, _, mask = results[0]
+    assert data[3] is None
+    assert mask[3] is Status.TIMEOUT
+
+
+def test_sim_many_ranks():
+    from lossy_mpi.pool import Status
+
+    size = 256
+    sim, results = run_gather_bcast(size, crash={7: 0.0, 100: 0.0})
+    data, obj, mask = results[0]
+    assert [i for i, d in enumerate(data) if d is None] == [7, 100]
+    assert [i for i, m in enumerate(mask) if m is Status.TIMEOUT] == [7, 100]
+    assert all(r[1] == "data" for i, r in enumerate(results) if i not in (7, 100))
+
+
+def test_sim_buffers():
+    np = pytest.importorskip("numpy")
+    from lossy_mpi.pool import Pool
+    from lossy_mpi.sim import Simulator
+
+    size = 8
+
+    def body(comm):
+        rank = comm.Get_rank()
+        pool = Pool(
+            comm, 0, timeout=1, n_tries=10, chunk_nbytes=1 << 12,
+            chunk_threshold=1 << 12
+        )
+        pool.ready()
+        sendbuf = np.full(16, rank, dtype=np.float64)
+        recvbuf = np.zeros((size, 16), dtype=np.float64)
+        pool.Gather(sendbuf, recvbuf, failover=-1)
+        # chunked
+        buf = np.zeros(1 << 12, dtype=np.float64)
+        if rank == 0:
+            buf[:] = np.arange(buf.size)
+        pool.Bcast(buf, failover=-1)
+        return recvbuf, buf
+
+    results = Simulator(size, latency=1e-3).run(body)
+    recvbuf, _ = results[0]
+    assert np.all(recvbuf == np.arange(size)[:, None])
+    for _, buf in results:
+        assert np.all(buf == np.arange(1 << 12))
+
+
+def test_sim_deadlock():
+    from lossy_mpi.sim import Simulator
+
+    def body(comm):
+        # rank 0 never joins the barrier
+        if comm.Get_rank() > 0:
+            comm.Barrier()
+
+    with pytest.raises(RuntimeError, match="deadlock"):
+        Simulator(4).run(body)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+@pytest.mark.mpi(min_size=4)
+def test_sink(tmp_path):
+    np = pytest.importorskip("numpy")
+    from time import sleep
+
+    from lossy_mpi.pool import Pool
+    from lossy_mpi.sink import ResultSink, load
+    from mpi4py import MPI
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    root = 0
+    slow = 3
+
+    pool = Pool(comm, root, timeout=0.5, n_tries=10)
+    pool.advance_transaction_counter(1900)
+    pool.ready()
+
+    sink = None
+    if rank == root:
+        sink = ResultSink(tmp_path/"sink", size, shape=(16,), window=2)
+    sendbuf = np.zeros(16, dtype=np.float64)
+    for k in range(5):
+        sendbuf[:] = 10*k + rank
+        # rank 3 misses the second transaction
+        if rank == slow and k == 1:
+            sleep(0.7)
+        if sink is None:
+            pool.Gather(sendbuf, None)
+        else:
+            pool.Gather(sendbuf, sink.next(), failover=-1)
+            sink.commit(pool)
+    if sink is None:
+        return
+    sink.close()
+
+    tags, valid, data = load(tmp_path/"sink")
+    assert len(tags) == 5 and tags[0] == 1900
+    assert list(np.argwhere(~valid)[0]) == [1, slow]
+    for k in range(5):
+        expected = 10*k + np.arange(size)
+        if k == 1:
+            expected[slow] = -1
+        assert np.all(data[k] == expected[:, None])
+
+
+def test_sink_file(tmp_path):
+    np = pytest.importorskip("numpy")
+    from lossy_mpi.sink import ResultSink, load
+
+    class FakePool(object):
+        is_root = True
+        transaction_counter = 0
+        gather_missed = [2]
+
+    pool = FakePool()
+    sink = ResultSink(tmp_path/"sink", 3, shape=(2,), dtype="int32", window=2)
+    for t in range(5):
+        buf = sink.next()
+        buf[:] = t
+        pool.transaction_counter = 10 + t
+        sink.commit(pool)
+    # an uncommitted record is dropped
+    sink.next()[:] = -1
+    sink.close()
+
+    tags, valid, data = load(tmp_path/"sink")
+    assert list(tags) == [9, 10, 11, 12, 13]
+    assert valid.shape == (5, 3) and not valid[:, 2].any()
+    assert data.shape == (5, 3, 2)
+    assert np.all(data == np.arange(5)[:, None, None])
+
+    # records are appended to an existing sink
+    sink = ResultSink(tmp_path/"sink", 3, shape=(2,), dtype="int32", window=2)
+    assert len(sink) == 5
+    sink.next()[:] = 7
+    sink.commit(pool)
+    sink.close()
+    tags, valid, data = load(tmp_path/"sink")
+    assert len(tags) == 6 and np.all(data[5] == 7)
+
+    with pytest.raises(ValueError):
+        ResultSink(tmp_path/"sink", 4, shape=(2,), dtype="int32")
+
+
+def test_sim_sink(tmp_path):
+    np = pytest.importorskip("numpy")
+    from lossy_mpi.pool import Pool
+    from lossy_mpi.sim import Simulator
+    from lossy_mpi.sink import ResultSink, load
+
+    size = 6
+    n_items = 5
+
+    def body(comm):
+        rank = comm.Get_rank()
+        pool = Pool(comm, 0, timeout=1, n_tries=10)
+        pool.ready()
+        sink = None
+        if rank == 0:
+            sink = ResultSink(tmp_path/"sink", size, shape=(4,), window=2)
+        sendbuf = np.zeros(4)
+        for item in range(n_items):
+            sendbuf[:] = rank*item
+            if sink is None:
+                pool.Gather(sendbuf, None)
+            else:
+                pool.Gather(sendbuf, sink.next(), failover=-1)
+                sink.commit(pool)
+        if sink is not None:
+            sink.close()
+
+    Simulator(size, latency=1e-3, crash={3: 0.0}).run(body)
+    tags, valid, data = load(tmp_path/"sink")
+    assert len(tags) == n_items and np.all(np.diff(tags) == 1)
+    assert not valid[:, 3].any() and valid[:, [0, 1, 2, 4, 5]].all()
+    for item in range(n_items):
+        expected = np.arange(size)[:, None]*item*np.ones(4)
+        expected[3] = -1
+        assert np.all(data[item] == expected)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+def test_sim_split():
+    from lossy_mpi.pool import Pool, Status
+    from lossy_mpi.sim import Simulator
+
+    size = 8
+    crashed = 5
+
+    def body(comm):
+        rank = comm.Get_rank()
+        # children wait out their lost ranks before reporting => the parent
+        # pool waits longer
+        pool = Pool(comm, 0, timeout=5, n_tries=50)
+        pool.ready()
+        pool.sync_mask()
+
+        # splitting is collective => before anything crashes
+        group = pool.create_group([6, 2, 4])
+        group_data = None if group is None else group.gather(rank)
+
+        # two ensembles (even and odd ranks), progressing independently
+        child = pool.split(rank % 2, key=rank, timeout=1)
+        tags = [child.transaction_counter]
+        if rank == crashed:
+            comm.sleep(5)
+        data = child.gather(rank)
+        child.sync_mask()
+        tags.append(child.transaction_counter)
+
+        # the odd ensemble reports its lost rank
+        pool.report_groups(child)
+        return data, tags, list(pool.mask), pool.groups, group_data
+
+    results = Simulator(size, latency=1e-3, crash={crashed: 4.0}).run(body)
+    data, tags, mask, groups, group_data = results[0]
+    assert data == [0, 2, 4, 6]
+    assert tags == [0, 2]
+    assert mask[crashed] is Status.TIMEOUT
+    assert all(m is Status.READY for i, m in enumerate(mask) if i != crashed)
+    assert groups == {0: [0, 2, 4, 6], 1: [1, 3, 5, 7]}
+    assert group_data is None
+
+    data, _, _, _, _ = results[1]
+    assert data == [1, 3, None, 7]
+    # rank 6 is the group's root
+    assert results[6][4] == [6, 2, 4]
+    assert results[2][4] == [None]*3
+
+
+@pytest.mark.mpi(min_size=4)
+def test_split_pool():
+    from lossy_mpi.pool import Pool, Status
+    from mpi4py import MPI
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    root = 0
+
+    pool = Pool(comm, root, timeout=1, n_tries=10)
+    pool.advance_transaction_counter(1800)
+    pool.ready()
+    pool.sync_mask()
+
+    child = pool.split(rank % 2, key=rank, timeout=0.5)
+    assert child.timeout == 0.5
+    assert child.size == len(range(rank % 2, size, 2))
+    child.advance_transaction_counter(1800)
+    data = child.gather(rank)
+    if child.is_root:
+        assert data == list(range(rank % 2, size, 2))
+
+    # the odd ensemble's root marks its last rank as timed out
+    child.sync_mask()
+    if rank == 1:
+        child.mask[-1] = Status.TIMEOUT
+    pool.report_groups(child)
+    if rank == root:
+        last_odd = max(range(1, size, 2))
+        assert pool.mask[last_odd] is Status.TIMEOUT
+        assert pool.mask[1] is Status.READY
+
+    pool.free()
+    comm.barrier()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+def test_straggler_detector():
+    from lossy_mpi.stragglers import StragglerDetector
+
+    detector = StragglerDetector(4, window=8, min_samples=4, min_delay=0.01)
+    for k in range(10):
+        detector.record(0, 0.0)
+        detector.record(1, 0.002)
+        detector.record(2, 0.1)
+    # not enough samples from rank 3 (and out of range ranks are ignored)
+    detector.record(3, 1.0)
+    detector.record(4, 1.0)
+    assert detector.percentile(3) is None
+    assert len(detector.samples(2)) == 8
+    assert detector.percentile(1, 90) == 0.002
+    assert detector.stragglers() == [2]
+
+    detector.reset([2])
+    assert detector.stragglers() == []
+
+
+def test_sim_stragglers():
+    from lossy_mpi.pool import Pool, Status
+    from lossy_mpi.sim import Simulator
+
+    size = 8
+    slow = 5
+
+    def body(comm):
+        rank = comm.Get_rank()
+        pool = Pool(comm, 0, timeout=1, n_tries=20)
+        pool.ready()
+        for k in range(16):
+            if rank == slow:
+                comm.sleep(0.2)
+            pool.gather(rank)
+        stragglers = pool.stragglers()
+
+        # shorten the straggler's deadline: its data is dropped
+        if rank == 0:
+            pool.demote(stragglers, timeout=0.1)
+        if rank == slow:
+            comm.sleep(0.2)
+        data = pool.gather(rank)
+        demoted = pool.demoted
+
+        # exclude the straggler
+        if rank == 0:
+            pool.demote(stragglers)
+        pool.sync_mask()
+        return stragglers, data, demoted, list(pool.mask)
+
+    results = Simulator(size, latency=1e-3).run(body)
+    stragglers, data, demoted, mask = results[0]
+    assert stragglers == [slow]
+    assert data[slow] is None
+    assert data[:slow] == list(range(slow))
+    assert demoted == {slow: 0.1}
+    assert mask[slow] is Status.TIMEOUT
+    assert all(m is Status.READY for i, m in enumerate(mask) if i != slow)
+    # only the root waits for everyone
+    assert results[1][0] == []
+
+
+@pytest.mark.mpi(min_size=4)
+def test_stragglers():
+    from time import sleep
+
+    from lossy_mpi.pool import Pool
+    from mpi4py import MPI
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    root = 0
+    slow = 3
+
+    pool = Pool(comm, root, timeout=1, n_tries=20)
+    pool.advance_transaction_counter(1500)
+    pool.ready()
+
+    for k in range(10):
+        if rank == slow:
+            sleep(0.2)
+        pool.gather(rank)
+
+    if rank == root:
+        assert pool.stragglers() == [slow]
+        pool.demote([slow], timeout=0.05)
+    if rank == slow:
+        sleep(0.5)
+    data = pool.gather(rank)
+    if rank == root:
+        assert data[slow] is None
+        assert data[1] == 1
+
+    # the late message matches the receive that timed out
+    comm.barrier()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+@pytest.mark.mpi(min_size=4)
+def test_tags():
+    from time import sleep
+
+    from lossy_mpi.pool import Pool
+    from mpi4py import MPI
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    slow = 3
+
+    # pools on the same communicator use separate tag ranges
+    pool = Pool(comm, 0, timeout=0.5, n_tries=10, tag_window=4)
+    other = Pool(comm, 0, timeout=0.5, n_tries=10)
+    pool.ready()
+    other.ready()
+    assert pool.tags.base != other.tags.base
+
+    for k in range(10):
+        # rank 3 misses the fourth transaction
+        if rank == slow and k == 3:
+            sleep(0.7)
+        data = pool.gather(10*k + rank)
+        if rank == 0:
+            expected = [10*k + i for i in range(size)]
+            if k == 3:
+                expected[slow] = None
+            assert data == expected
+        data = other.gather(k + rank)
+        if rank == 0:
+            assert data == [k + i for i in range(size)]
+    assert pool.epoch == 2
+    pool.barrier()
+
+
+def test_tag_allocator():
+    from lossy_mpi import tags
+    from lossy_mpi.tags import TagAllocator
+
+    class Comm(object):
+        pass
+
+    comm = Comm()
+    first = TagAllocator(comm, window=8)
+    second = TagAllocator(comm)
+    assert second.base == first.base + (tags.MIN_TAG_UB + 1)//tags.N_RANGES
+    assert first.tag(3) == first.base + 3
+    assert first.tag(11) == first.tag(3) and first.epoch(11) == 1
+    assert second.window + tags.N_RESERVED <= second.base - first.base
+
+    # tags are compared modulo the window
+    assert first.is_before(first.tag(7), first.tag(9))
+    assert not first.is_before(first.tag(9), first.tag(7))
+    assert not first.is_before(first.tag(1), first.tag(9))
+
+    # reserved tags are outside of the window
+    reserved = first.reserve()
+    assert reserved not in first and reserved == first.base + 8
+    assert first.reserve() == reserved + 1
+    first.release(reserved)
+    assert first.reserve() == reserved
+
+
+def test_message_store_window():
+    from lossy_mpi.store import MessageStore
+
+    store = MessageStore(capacity=2, window=8)
+    # tags wrapped around: 7 is older than 1
+    store.put(7, 1, 1, "a", current=6)
+    store.put(1, 1, 1, "b", current=7)
+    assert store.put(6, 2, 2, "c", current=0) is False
+    store.put(2, 1, 1, "d")
+    assert (7, 1) not in store and (1, 1) in store
+    store.evict(2)
+    assert (1, 1) not in store and (2, 1) in store
+    assert store.stats()["evicted"] == 2
+
+
+def test_sim_tags():
+    from lossy_mpi.pool import Pool
+    from lossy_mpi.sim import Simulator
+
+    size = 4
+    slow = 3
+
+    def body(comm):
+        rank = comm.Get_rank()
+        pool = Pool(comm, 0, timeout=1, n_tries=10, tag_window=4)
+        other = Pool(comm, 0, timeout=1, n_tries=10)
+        pool.ready()
+        other.ready()
+        results = list()
+        for k in range(10):
+            if rank == slow and k in (3, 6):
+                comm.sleep(1.5)
+            results.append(pool.gather(10*k + rank))
+            results.append(other.gather(k))
+        return results, pool.epoch, other.tags.base - pool.tags.base
+
+    results = Simulator(size, latency=1e-3).run(body)
+    data, epoch, offset = results[0]
+    assert epoch == 2 and offset > 0
+    for k in range(10):
+        expected = [10*k + i for i in range(size)]
+        if k in (3, 6):
+            expected[slow] = None
+        assert data[2*k] == expected
+        assert data[2*k + 1] == [k]*size
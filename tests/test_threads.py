@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+@pytest.mark.mpi(min_size=4)
+@pytest.mark.parametrize("serialize", [None, True])
+def test_threads(serialize):
+    from threading import Thread
+    from time import sleep
+
+    from lossy_mpi.pool import Pool
+    from mpi4py import MPI
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    slow = 3
+    n_threads = 4
+
+    pool = Pool(
+        comm, 0, timeout=0.5, n_tries=10, threads=n_threads, serialize=serialize
+    )
+    pool.ready()
+
+    results = dict()
+    errors = list()
+
+    def work(channel):
+        try:
+            with pool.context(channel):
+                data = list()
+                for k in range(5):
+                    # rank 3 misses a transaction of the second channel => the
+                    # other channels don't have to wait for it
+                    if rank == slow and channel == 1 and k == 2:
+                        sleep(0.7)
+                    data.append(pool.gather((channel, k, rank)))
+                    data.append(pool.bcast((channel, k) if rank == 0 else None))
+                results[channel] = (data, pool.transaction_counter)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [Thread(target=work, args=(i,)) for i in range(n_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+
+    for channel, (data, txn_ct) in results.items():
+        assert txn_ct == 10
+        for k in range(5):
+            gathered, bcast = data[2*k], data[2*k + 1]
+            # while the root waits for rank 3, the other ranks time out
+            if (channel, k) != (1, 2):
+                assert bcast == (channel, k)
+            if rank != 0:
+                continue
+            expected = [(channel, k, i) for i in range(size)]
+            if channel == 1 and k == 2:
+                expected[slow] = None
+            assert gathered == expected
+    pool.barrier()
+
+
+def test_serialized_comm():
+    from threading import Lock
+
+    from lossy_mpi.threads import SerializedComm
+
+    lock = Lock()
+
+    class Request(object):
+        def Test(self, status=None):
+            return lock.locked()
+
+        def test(self, status=None):
+            return lock.locked(), None
+
+    class Comm(object):
+        size = 4
+
+        def Get_rank(self):
+            return lock.locked()
+
+        def Isend(self, buf, dest, tag=0):
+            return Request()
+
+    comm = SerializedComm(Comm(), lock)
+    # calls (and tests of their requests) hold the lock
+    assert comm.Get_rank() and comm.size == 4
+    req = comm.Isend(b"", dest=0)
+    assert req.Test() and req.wait() is None
+    assert not lock.locked()
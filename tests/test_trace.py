@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+
+import pytest
+
+
+def test_tracer_ring_buffer(tmp_path):
+    from lossy_mpi.trace import Event, Tracer, load
+
+    tracer = Tracer(3, capacity=4)
+    for i in range(6):
+        tracer.record(Event.POST, i, 0)
+    assert len(tracer) == 4
+
+    file_name = tmp_path/"trace.bin"
+    tracer.flush(file_name)
+    rank, events = load(file_name)
+    assert rank == 3
+    # the oldest events were overwritten
+    assert [tag for _, _, tag, _ in events] == [2, 3, 4, 5]
+    assert all(e is Event.POST for _, e, _, _ in events)
+
+
+def test_trace_sim(tmp_path):
+    from lossy_mpi.metrics import Op
+    from lossy_mpi.pool import Pool
+    from lossy_mpi.sim import Simulator
+    from lossy_mpi.trace import Tracer, merge
+
+    size = 4
+
+    def body(comm):
+        rank = comm.Get_rank()
+        tracer = Tracer(rank, clock=comm.monotonic)
+        pool = Pool(comm, 0, timeout=1, n_tries=10, trace=tracer)
+        pool.ready()
+        tag = pool.transaction_counter
+        pool.gather(rank)
+        file_name = tmp_path/f"trace-{rank}.bin"
+        tracer.flush(file_name)
+        return tag, file_name
+
+    results = Simulator(size, latency=1e-3, crash={3: 0.0}).run(body)
+    tag, _ = results[0]
+    trace = merge([r[1] for r in results if r is not None])
+    # merged traces are valid JSON
+    trace = json.loads(json.dumps(trace))
+
+    events = [e for e in trace["traceEvents"] if e["ph"] != "M"]
+    gather = f"{Op.GATHER.name.lower()} {tag}"
+    assert {e["pid"] for e in events if e["name"] == gather} == {0, 1, 2}
+    timeouts = [e for e in events if e["name"] == "timeout"]
+    assert [(e["pid"], e["args"]["key"]) for e in timeouts] == [(0, 3)]
+    completed = {e["args"]["key"] for e in events if e["name"] == "complete"}
+    assert completed == {1, 2}
+    assert min(e["ts"] for e in events) == 0
+
+
+def test_trace_env(monkeypatch, tmp_path):
+    from lossy_mpi.trace import Tracer
+
+    monkeypatch.delenv("LOSSY_MPI_TRACE", raising=False)
+    assert Tracer.from_env(0) is None